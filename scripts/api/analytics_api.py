@@ -0,0 +1,418 @@
+import io
+import os
+import re
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+from datetime import date
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import psycopg2
+import pyarrow as pa
+import yaml
+
+# --------------------------------------------------
+# PATHS / CONFIG
+# --------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(BASE_DIR, "scripts", "transformation"))
+
+import generate_analytics as ga  # noqa: E402
+from pipeline_metrics import CONTENT_TYPE, REGISTRY, Registry, collect, record_load_lag  # noqa: E402
+from result_cache import cache_key  # noqa: E402
+from sql_params import FULL_HISTORY, NAMED_PARAM, statement_body  # noqa: E402
+from table_dag import get_pool  # noqa: E402
+
+with open(os.path.join(BASE_DIR, "config", "config.yaml")) as f:
+    config = yaml.safe_load(f)
+
+db = config["database"]
+api_cfg = config.get("api", {})
+HOST = api_cfg.get("host", "127.0.0.1")
+PORT = api_cfg.get("port", 8080)
+MAX_CONCURRENT_QUERIES = api_cfg.get("max_concurrent_queries", 4)
+QUEUE_TIMEOUT_SECONDS = api_cfg.get("queue_timeout_seconds", 5)
+CACHE_MAX_BYTES = api_cfg.get("cache_max_mb", 64) * 1024 * 1024
+VERSION_POLL_SECONDS = api_cfg.get("version_poll_seconds", 1)
+WARM_ON_START = api_cfg.get("warm_on_start", True)
+STATEMENT_TIMEOUT_SECONDS = config.get("pipeline", {}).get("timeout_seconds")
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+
+# --------------------------------------------------
+# ANALYTICS QUERY SERVICE
+# --------------------------------------------------
+# Serves every query of analytical_queries.sql (plus the sketch rollups)
+# as JSON, CSV or Arrow:
+#
+#   GET /queries                                  registry
+#   GET /queries/<name>?format=json|csv|arrow     one result
+#       [&start_date=YYYY-MM-DD&end_date=...]     for queries with a window
+#   GET /health
+#   GET /metrics                                  Prometheus text format
+#
+# A response's ETag is the result cache key: normalized SQL, parameters
+# and the warehouse.table_versions of the tables it reads. It changes
+# only when a load changed one of those tables, so If-None-Match is
+# answered with 304 without touching the query. Results are serialized
+# once into all formats and kept in an in-memory LRU; concurrent misses
+# for the same key wait for one computation. At most
+# MAX_CONCURRENT_QUERIES run against the pool at once; a request that
+# cannot get a slot within QUEUE_TIMEOUT_SECONDS gets 503.
+
+FORMATS = {
+    "json": "application/json",
+    "csv": "text/csv; charset=utf-8",
+    "arrow": "application/vnd.apache.arrow.stream"
+}
+
+
+class ServiceBusy(Exception):
+    pass
+
+
+def build_registry():
+    """name -> (sql used for versioning, fn(conn, params) -> DataFrame, parameter names)."""
+    registry = {}
+
+    for name, (period, by_segment) in ga.SKETCH_ROLLUPS.items():
+        sql = ga.rollup_sql(period, by_segment)
+        registry[name] = (sql, partial(rollup_result, period=period, by_segment=by_segment), ["start_date", "end_date"])
+
+    for name, sql in ga.load_queries().items():
+        key_sql = sql
+        if name in ga.SKETCH_COLUMNS:
+            key_sql += ga.rollup_sql(*ga.SKETCH_ROLLUPS[ga.SKETCH_COLUMNS[name][1]])
+        params = sorted(set(NAMED_PARAM.findall(statement_body(sql))))
+        registry[name] = (key_sql, partial(query_result, name=name, sql=sql), params)
+
+    return registry
+
+
+def rollup_result(conn, params, period, by_segment):
+    return ga.sketch_rollup(conn, period, by_segment, params)
+
+
+def query_result(conn, params, name, sql):
+    df, _ = ga.execute_query(conn, sql, params)
+    if name in ga.SKETCH_COLUMNS:
+        rollup = ga.SKETCH_COLUMNS[name][1]
+        period, by_segment = ga.SKETCH_ROLLUPS[rollup]
+        df = ga.add_sketch_columns(name, df, {rollup: ga.sketch_rollup(conn, period, by_segment, params)})
+    return df
+
+
+def serialize(df):
+    """Every representation up front, so a cached result is served as bytes."""
+    arrow = io.BytesIO()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.ipc.new_stream(arrow, table.schema) as writer:
+        writer.write_table(table)
+
+    return {
+        "json": df.to_json(orient="records", date_format="iso").encode("utf-8"),
+        "csv": df.to_csv(index=False).encode("utf-8"),
+        "arrow": arrow.getvalue()
+    }
+
+
+def parse_params(names, query):
+    params = dict(FULL_HISTORY)
+    for name in names:
+        if name in query:
+            params[name] = date.fromisoformat(query[name][0])
+    return {name: params[name] for name in names}
+
+
+class AnalyticsService:
+    def __init__(self, pg_pool, registry, max_concurrent=MAX_CONCURRENT_QUERIES,
+                 queue_timeout=QUEUE_TIMEOUT_SECONDS, cache_max_bytes=CACHE_MAX_BYTES,
+                 version_poll_seconds=VERSION_POLL_SECONDS):
+        self.pg_pool = pg_pool
+        self.registry = registry
+        self.slots = threading.BoundedSemaphore(max_concurrent)
+        self.queue_timeout = queue_timeout
+        self.cache_max_bytes = cache_max_bytes
+        self.version_poll_seconds = version_poll_seconds
+
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.cache = OrderedDict()
+        self.cache_bytes = 0
+        self.inflight = {}
+        self.versions, self.versions_at = None, 0
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0, "busy": 0}
+
+    def count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    # ---------- warehouse load version ----------
+    def fresh_versions(self):
+        with self.lock:
+            if self.versions is not None and time.time() - self.versions_at < self.version_poll_seconds:
+                return self.versions
+        return None
+
+    def table_versions(self):
+        versions = self.fresh_versions()
+        if versions is not None:
+            return versions
+
+        # One poller at a time; it uses the pool's spare connection
+        with self.refresh_lock:
+            versions = self.fresh_versions()
+            if versions is not None:
+                return versions
+
+            conn = self.pg_pool.getconn()
+            try:
+                versions = ga.get_table_versions(conn)
+            finally:
+                self.pg_pool.putconn(conn)
+
+            with self.lock:
+                changed = self.versions is not None and versions != self.versions
+                self.versions, self.versions_at = versions, time.time()
+
+        if changed:
+            logging.info("Warehouse load detected; precomputing results")
+            threading.Thread(target=self.warm, daemon=True).start()
+        return versions
+
+    def etag(self, name, params):
+        sql = self.registry[name][0]
+        return cache_key(sql, self.table_versions(), params)[:32]
+
+    # ---------- results ----------
+    def cached(self, key):
+        with self.lock:
+            bodies = self.cache.get(key)
+            if bodies is not None:
+                self.cache.move_to_end(key)
+            return bodies
+
+    def store(self, key, bodies):
+        with self.lock:
+            self.cache[key] = bodies
+            self.cache_bytes += sum(len(b) for b in bodies.values())
+            while self.cache_bytes > self.cache_max_bytes and len(self.cache) > 1:
+                _, evicted = self.cache.popitem(last=False)
+                self.cache_bytes -= sum(len(b) for b in evicted.values())
+
+    def compute(self, name, params):
+        if not self.slots.acquire(timeout=self.queue_timeout):
+            raise ServiceBusy(name)
+        try:
+            conn = self.pg_pool.getconn()
+            try:
+                return serialize(self.registry[name][1](conn, params))
+            finally:
+                conn.rollback()
+                self.pg_pool.putconn(conn)
+        finally:
+            self.slots.release()
+
+    def result(self, name, params, key):
+        """Bodies for key; one request computes a missing key, the others wait for it."""
+        bodies = self.cached(key)
+        if bodies is not None:
+            self.count("hits")
+            return bodies, "hit"
+
+        with self.lock:
+            event = self.inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self.inflight[key] = threading.Event()
+
+        if not leader:
+            event.wait()
+            bodies = self.cached(key)
+            if bodies is not None:
+                self.count("hits")
+                return bodies, "hit"
+            # The computation failed; try it ourselves
+            return self.result(name, params, key)
+
+        try:
+            self.count("misses")
+            bodies = self.compute(name, params)
+            self.store(key, bodies)
+            return bodies, "miss"
+        finally:
+            with self.lock:
+                del self.inflight[key]
+            event.set()
+
+    def metrics(self):
+        """Persisted step metrics, this process's and scrape-time load lag."""
+        scrape = Registry()
+        for stat, value in self.stats.items():
+            scrape.set("analytics_api_requests_total", value, result=stat)
+
+        with self.refresh_lock:
+            conn = self.pg_pool.getconn()
+            try:
+                record_load_lag(conn, scrape)
+            except psycopg2.Error as e:
+                conn.rollback()
+                logging.warning(f"Could not read load lag: {e}")
+            finally:
+                self.pg_pool.putconn(conn)
+
+        return collect(REGISTRY, scrape)
+
+    def warm(self):
+        for name, (_, _, names) in self.registry.items():
+            params = {p: FULL_HISTORY[p] for p in names}
+            try:
+                self.result(name, params, self.etag(name, params))
+            except Exception as e:
+                logging.warning(f"Could not precompute {name}: {e}")
+
+
+# --------------------------------------------------
+# HTTP
+# --------------------------------------------------
+def etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return any(re.sub(r'^W/', "", tag) == etag for tag in candidates)
+
+
+class AnalyticsHandler(BaseHTTPRequestHandler):
+    service = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        logging.debug(fmt % args)
+
+    def send_body(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for header, value in (headers or {}).items():
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status, payload, headers=None):
+        self.send_body(status, json.dumps(payload, default=str).encode("utf-8"), FORMATS["json"], headers)
+
+    def do_GET(self):
+        try:
+            self.route()
+        except Exception:
+            # Still answer in JSON instead of dropping the connection
+            logging.exception(f"GET {self.path} failed")
+            self.send_json(500, {"error": "internal server error"})
+
+    def route(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        if url.path == "/health":
+            return self.send_json(200, {
+                "status": "ok",
+                "table_versions": self.service.table_versions(),
+                "cached_results": len(self.service.cache),
+                "stats": self.service.stats
+            })
+
+        if url.path == "/metrics":
+            return self.send_body(200, self.service.metrics().encode("utf-8"), CONTENT_TYPE)
+
+        if url.path == "/queries":
+            return self.send_json(200, {
+                name: {"parameters": names} for name, (_, _, names) in self.service.registry.items()
+            })
+
+        match = re.fullmatch(r"/queries/(\w+)", url.path)
+        if not match or match.group(1) not in self.service.registry:
+            return self.send_json(404, {"error": "unknown query"})
+        name = match.group(1)
+
+        fmt = query.get("format", [None])[0] or self.negotiate()
+        if fmt not in FORMATS:
+            return self.send_json(400, {"error": f"format must be one of {', '.join(FORMATS)}"})
+
+        try:
+            params = parse_params(self.service.registry[name][2], query)
+        except ValueError as e:
+            return self.send_json(400, {"error": f"bad date parameter: {e}"})
+
+        key = self.service.etag(name, params)
+        etag = f'"{key}-{fmt}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+        if etag_matches(self.headers.get("If-None-Match"), etag):
+            self.service.count("not_modified")
+            self.send_response(304)
+            for header, value in headers.items():
+                self.send_header(header, value)
+            self.end_headers()
+            return
+
+        try:
+            bodies, cache_status = self.service.result(name, params, key)
+        except ServiceBusy:
+            self.service.count("busy")
+            return self.send_json(503, {"error": "too many concurrent queries"}, {"Retry-After": "1"})
+        except psycopg2.errors.QueryCanceled:
+            return self.send_json(504, {"error": "query timed out"})
+
+        self.send_body(200, bodies[fmt], FORMATS[fmt], {**headers, "X-Cache": cache_status})
+
+    def negotiate(self):
+        accept = self.headers.get("Accept", "")
+        for fmt, content_type in FORMATS.items():
+            if content_type.split(";")[0] in accept:
+                return fmt
+        return "json"
+
+
+class AnalyticsServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # socketserver's default listen backlog of 5 drops connections under load
+    request_queue_size = 128
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve analytics queries over HTTP")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--no-warm", dest="warm", action="store_false", default=WARM_ON_START)
+    args = parser.parse_args()
+    REGISTRY.step = "analytics_api"
+
+    # One extra connection for the table version lookups
+    pg_pool = get_pool(db, MAX_CONCURRENT_QUERIES + 1, statement_timeout=STATEMENT_TIMEOUT_SECONDS)
+    AnalyticsHandler.service = AnalyticsService(pg_pool, build_registry())
+
+    if args.warm:
+        threading.Thread(target=AnalyticsHandler.service.warm, daemon=True).start()
+
+    server = AnalyticsServer((args.host, args.port), AnalyticsHandler)
+    logging.info(f"Analytics API listening on http://{args.host}:{args.port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pg_pool.closeall()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import os
+import json
+import time
+import random
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from collections import Counter
+from datetime import datetime
+
+# --------------------------------------------------
+# PATHS
+# --------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+REPORT_DIR = os.path.join(BASE_DIR, "data", "benchmarks")
+
+# --------------------------------------------------
+# ANALYTICS API LOAD TEST
+# --------------------------------------------------
+# Drives a running analytics_api.py with --concurrency client threads for
+# --duration seconds. Each request picks a random query and format; with
+# --revalidate-ratio a share of requests resend the ETag they last saw
+# (If-None-Match), as a polling dashboard would. Reports p50/p90/p99
+# latency overall and per status, and throughput.
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return round(sorted_values[index], 2)
+
+
+def summarize(latencies):
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "p50_ms": percentile(values, 50),
+        "p90_ms": percentile(values, 90),
+        "p99_ms": percentile(values, 99),
+        "max_ms": round(values[-1], 2) if values else None
+    }
+
+
+def worker(base_url, names, formats, deadline, revalidate_ratio, results, lock, seed):
+    rng = random.Random(seed)
+    etags = {}
+
+    while time.time() < deadline:
+        name, fmt = rng.choice(names), rng.choice(formats)
+        request = urllib.request.Request(f"{base_url}/queries/{name}?format={fmt}")
+        if (name, fmt) in etags and rng.random() < revalidate_ratio:
+            request.add_header("If-None-Match", etags[(name, fmt)])
+
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                response.read()
+                status = response.status
+                etags[(name, fmt)] = response.headers.get("ETag")
+        except urllib.error.HTTPError as e:
+            e.read()
+            status = e.code
+        except OSError:
+            status = "error"
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        with lock:
+            results.append((status, elapsed_ms))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the analytics API")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--formats", default="json,csv,arrow")
+    parser.add_argument("--revalidate-ratio", type=float, default=0.5)
+    args = parser.parse_args()
+
+    with urllib.request.urlopen(f"{args.url}/queries", timeout=30) as response:
+        names = sorted(json.load(response))
+    formats = args.formats.split(",")
+
+    results, lock = [], threading.Lock()
+    deadline = time.time() + args.duration
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(args.url, names, formats, deadline, args.revalidate_ratio, results, lock, seed)
+        )
+        for seed in range(args.concurrency)
+    ]
+
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.time() - start
+
+    by_status = {}
+    for status, ms in results:
+        by_status.setdefault(str(status), []).append(ms)
+
+    report = {
+        "benchmark": "analytics_api_load_test",
+        "run_timestamp": datetime.now().isoformat(),
+        "url": args.url,
+        "concurrency": args.concurrency,
+        "duration_seconds": round(elapsed, 2),
+        "throughput_rps": round(len(results) / elapsed, 2) if elapsed else None,
+        "status_counts": dict(Counter(str(status) for status, _ in results)),
+        "overall": summarize([ms for _, ms in results]),
+        "by_status": {status: summarize(values) for status, values in by_status.items()}
+    }
+
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    report_path = os.path.join(REPORT_DIR, "api_load_test.json")
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=4)
+
+    overall = report["overall"]
+    print(
+        f"⏱ {overall['requests']} requests, {report['throughput_rps']} req/s, "
+        f"p50 {overall['p50_ms']} ms, p99 {overall['p99_ms']} ms"
+    )
+    print(f" Report saved at: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
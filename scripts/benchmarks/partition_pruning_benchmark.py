@@ -0,0 +1,160 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+
+# --------------------------------------------------
+# PATHS
+# --------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+REPORT_DIR = os.path.join(BASE_DIR, "data", "benchmarks")
+SQL_FILE = os.path.join(BASE_DIR, "sql", "queries", "analytical_queries.sql")
+sys.path.insert(0, os.path.join(BASE_DIR, "scripts", "transformation"))
+
+from load_warehouse import get_connection  # noqa: E402
+from sql_params import FULL_HISTORY, bind_named  # noqa: E402
+
+# --------------------------------------------------
+# PARTITION PRUNING BENCHMARK
+# --------------------------------------------------
+# Runs every query in analytical_queries.sql twice under
+# EXPLAIN (ANALYZE, FORMAT JSON): as written (all history) and bounded to
+# a trailing window of months by replacing "warehouse.fact_sales f" with
+# a date_key-filtered subquery. For each run it records how many
+# fact_sales partitions the plan actually scanned, so pruning is visible
+# per query next to the runtime.
+
+FACT_REFERENCE = re.compile(r"warehouse\.fact_sales\s+(\w+)")
+
+
+def load_queries():
+    queries, name, lines = {}, None, []
+    with open(SQL_FILE) as f:
+        for line in f:
+            if line.strip().startswith("-- QUERY"):
+                if name:
+                    queries[name] = "".join(lines).strip().rstrip(";")
+                name = "query" + line.split(":")[0].replace("-- QUERY", "").strip()
+                lines = []
+            elif name:
+                lines.append(line)
+    if name:
+        queries[name] = "".join(lines).strip().rstrip(";")
+    return queries
+
+
+def bounded(sql, from_key, to_key):
+    return FACT_REFERENCE.sub(
+        lambda m: (
+            f"(SELECT * FROM warehouse.fact_sales "
+            f"WHERE date_key >= {from_key} AND date_key < {to_key}) {m.group(1)}"
+        ),
+        sql
+    )
+
+
+def scanned_partitions(plan):
+    found = set()
+
+    def walk(node):
+        relation = node.get("Relation Name", "")
+        if relation.startswith("fact_sales") and node.get("Actual Loops", 0) > 0:
+            found.add(relation)
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan)
+    return sorted(found)
+
+
+def explain(cur, sql):
+    start = time.time()
+    sql, params = bind_named(sql, FULL_HISTORY)
+    cur.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}", params)
+    elapsed_ms = round((time.time() - start) * 1000, 2)
+    plan = cur.fetchone()[0][0]
+    partitions = scanned_partitions(plan["Plan"])
+    return {
+        "partitions_scanned": len(partitions),
+        "partitions": partitions,
+        "execution_time_ms": round(plan["Execution Time"], 2),
+        "wall_time_ms": elapsed_ms
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show fact_sales partition pruning")
+    parser.add_argument(
+        "--months", type=int, default=1,
+        help="size of the bounded window, counted back from the latest fact month"
+    )
+    args = parser.parse_args()
+
+    conn = get_connection()
+    cur = conn.cursor()
+
+    cur.execute("""
+        SELECT COUNT(*)
+        FROM pg_inherits
+        WHERE inhparent = 'warehouse.fact_sales'::REGCLASS
+    """)
+    total_partitions = cur.fetchone()[0]
+
+    cur.execute("""
+        SELECT
+            TO_CHAR(
+                DATE_TRUNC('month', TO_DATE(MAX(date_key)::TEXT, 'YYYYMMDD'))
+                    - (%s - 1) * INTERVAL '1 month',
+                'YYYYMMDD'
+            )::INTEGER,
+            TO_CHAR(
+                DATE_TRUNC('month', TO_DATE(MAX(date_key)::TEXT, 'YYYYMMDD'))
+                    + INTERVAL '1 month',
+                'YYYYMMDD'
+            )::INTEGER
+        FROM warehouse.fact_sales
+    """, (args.months,))
+    from_key, to_key = cur.fetchone()
+
+    results = {}
+    try:
+        for name, sql in load_queries().items():
+            entry = {"full_history": explain(cur, sql)}
+            if FACT_REFERENCE.search(sql):
+                entry["bounded"] = explain(cur, bounded(sql, from_key, to_key))
+            else:
+                entry["bounded"] = None
+                entry["note"] = "does not read fact_sales"
+            results[name] = entry
+
+            bounded_scan = entry["bounded"]["partitions_scanned"] if entry["bounded"] else "-"
+            print(
+                f"⏱ {name}: {entry['full_history']['partitions_scanned']} -> "
+                f"{bounded_scan} of {total_partitions} partitions"
+            )
+    finally:
+        conn.rollback()
+        cur.close()
+        conn.close()
+
+    report = {
+        "benchmark": "fact_sales_partition_pruning",
+        "run_timestamp": datetime.now().isoformat(),
+        "total_partitions": total_partitions,
+        "bounded_window": {"months": args.months, "from_date_key": from_key, "to_date_key": to_key},
+        "results": results
+    }
+
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    report_path = os.path.join(REPORT_DIR, "partition_pruning_benchmark.json")
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=4)
+
+    print(f" Report saved at: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+
+# --------------------------------------------------
+# PATHS
+# --------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+REPORT_DIR = os.path.join(BASE_DIR, "data", "benchmarks")
+sys.path.insert(0, os.path.join(BASE_DIR, "scripts", "transformation"))
+
+from load_warehouse import get_connection, apply_scd2  # noqa: E402
+
+# --------------------------------------------------
+# SCD2 BENCHMARK
+# --------------------------------------------------
+# Loads N synthetic customers into production.customers, then times the
+# SCD2 statement for the initial load, a run where a fraction of the
+# customers changed, and a no-change run. Everything happens in one
+# transaction that is rolled back, so the database is left untouched.
+
+
+def timed(cur, label, results):
+    start = time.time()
+    stats = apply_scd2(cur, "dim_customers")
+    elapsed = time.time() - start
+    results[label] = {**stats, "duration_seconds": round(elapsed, 2)}
+    print(f"⏱ {label}: {elapsed:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the dim_customers SCD2 load")
+    parser.add_argument("--customers", type=int, default=10_000_000)
+    parser.add_argument("--change-rate", type=float, default=0.01)
+    args = parser.parse_args()
+
+    conn = get_connection()
+    cur = conn.cursor()
+    results = {}
+
+    try:
+        print(f"➡ Generating {args.customers} synthetic customers")
+        start = time.time()
+        cur.execute("""
+            INSERT INTO production.customers (
+                customer_id, first_name, last_name, email, phone,
+                registration_date, city, state
+            )
+            SELECT
+                'BENCH' || LPAD(g::TEXT, 10, '0'),
+                'First' || g,
+                'Last' || g,
+                'bench' || g || '@example.com',
+                '5550000000',
+                DATE '2020-01-01' + (g %% 1500),
+                'City' || (g %% 5000),
+                'State' || (g %% 50)
+            FROM generate_series(1, %s) g
+        """, (args.customers,))
+        cur.execute("ANALYZE production.customers")
+        results["generate_seconds"] = round(time.time() - start, 2)
+
+        timed(cur, "initial_load", results)
+
+        cur.execute("""
+            UPDATE production.customers
+            SET city = city || ' (moved)'
+            WHERE customer_id LIKE 'BENCH%%'
+              AND random() < %s
+        """, (args.change_rate,))
+        cur.execute("ANALYZE production.customers")
+        cur.execute("ANALYZE warehouse.dim_customers")
+
+        timed(cur, "incremental_changes", results)
+        timed(cur, "no_changes", results)
+
+    finally:
+        conn.rollback()
+        cur.close()
+        conn.close()
+
+    report = {
+        "benchmark": "scd2_dim_customers",
+        "run_timestamp": datetime.now().isoformat(),
+        "customers": args.customers,
+        "change_rate": args.change_rate,
+        "results": results
+    }
+
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    report_path = os.path.join(REPORT_DIR, "scd2_benchmark.json")
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=4)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 import os
+import sys
 import json
+import time
 import yaml
 import random
 from datetime import datetime, timedelta, timezone
@@ -7,7 +9,13 @@ from datetime import datetime, timedelta, timezone
 import pandas as pd
 from faker import Faker
 
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(BASE_DIR, "scripts", "transformation"))
+
+from pipeline_metrics import REGISTRY, record_step  # noqa: E402
+
 fake = Faker()
+GENERATION_START = time.perf_counter()
 
 # ================= CONFIG =================
 
@@ -217,3 +225,10 @@ with open(os.path.join(RAW_DATA_DIR, "generation_metadata.json"), "w") as f:
     json.dump(metadata, f, indent=4)
 
 print("generation_metadata.json created")
+
+# ================= METRICS =================
+
+for table, count in metadata["record_counts"].items():
+    REGISTRY.inc("pipeline_rows_processed_total", count, layer="raw", table=table)
+
+record_step("data_generation", time.perf_counter() - GENERATION_START)
@@ -1,4 +1,5 @@
 import os
+import sys
 import json
 import time
 import logging
@@ -10,6 +11,10 @@ from datetime import datetime
 # Base paths
 # -------------------------------------------------
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(BASE_DIR, "scripts", "transformation"))
+
+from load_audit import record_load  # noqa: E402
+from pipeline_metrics import TimedCursor, step_metrics  # noqa: E402
 
 RAW_DIR = os.path.join(BASE_DIR, "data", "raw")
 STAGING_DIR = os.path.join(BASE_DIR, "data", "staging")
@@ -51,6 +56,7 @@ def get_connection():
         dbname=os.getenv("DB_NAME", db["name"]),
         user=os.getenv("DB_USER", db["user"]),
         password=os.getenv("DB_PASSWORD", db["password"]),
+        cursor_factory=TimedCursor
     )
 
 # -------------------------------------------------
@@ -144,6 +150,8 @@ def main():
                     f"Row count mismatch for {table} (db={db_rows}, csv={csv_rows})"
                 )
 
+            record_load(cursor, "staging", table.split(".")[1], db_rows)
+
             summary["tables_loaded"][table] = {
                 "rows_loaded": db_rows,
                 "status": "success"
@@ -176,4 +184,5 @@ def main():
 
 # -------------------------------------------------
 if __name__ == "__main__":
-    main()
+    with step_metrics("data_ingestion"):
+        main()
@@ -0,0 +1,93 @@
+import os
+import sys
+import logging
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import psycopg2
+import yaml
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(BASE_DIR, "scripts", "transformation"))
+
+from pipeline_metrics import CONTENT_TYPE, Registry, collect, record_load_lag  # noqa: E402
+
+with open(os.path.join(BASE_DIR, "config", "config.yaml")) as f:
+    config = yaml.safe_load(f)
+
+db = config["database"]
+metrics_cfg = config.get("metrics", {})
+HOST = metrics_cfg.get("exporter_host", "127.0.0.1")
+PORT = metrics_cfg.get("exporter_port", 9108)
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+
+# ----------------------------------
+# METRICS EXPORTER
+# ----------------------------------
+# GET /metrics serves what every pipeline step persisted under
+# data/metrics (rows per table, step / statement / COPY durations, pool
+# usage) plus the load lag of each audited table, read from
+# audit.load_audit at scrape time. For when the analytics API, which
+# serves the same endpoint, is not running.
+
+
+def scrape():
+    registry = Registry()
+    try:
+        conn = psycopg2.connect(
+            host=db["host"],
+            port=db["port"],
+            dbname=db["name"],
+            user=db["user"],
+            password=db["password"]
+        )
+    except psycopg2.Error as e:
+        logging.warning(f"Could not read load lag: {e}")
+        return collect()
+
+    try:
+        record_load_lag(conn, registry)
+    except psycopg2.Error as e:
+        logging.warning(f"Could not read load lag: {e}")
+    finally:
+        conn.close()
+    return collect(registry)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, fmt, *args):
+        logging.debug(fmt % args)
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+
+        body = scrape().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve pipeline metrics for Prometheus")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), MetricsHandler)
+    logging.info(f"Metrics on http://{args.host}:{args.port}/metrics")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
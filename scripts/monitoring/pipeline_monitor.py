@@ -1,11 +1,25 @@
+import os
+import sys
 import json
 import time
-import statistics
+import signal
+import asyncio
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
 
-import pandas as pd
+import yaml
+from psycopg2.errors import QueryCanceled
 from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BASE_DIR / "scripts" / "transformation"))
+
+from pipeline_metrics import REGISTRY, TimedCursor, flush, step_metrics  # noqa: E402
+from volume_baselines import Baseline  # noqa: E402
 
 # ----------------------------------
 # DB CONFIG
@@ -26,7 +40,7 @@ ENGINE_URL = (
     f"{DB_CONFIG['name']}"
 )
 
-engine = create_engine(ENGINE_URL)
+engine = create_engine(ENGINE_URL, connect_args={"cursor_factory": TimedCursor})
 
 # ----------------------------------
 # PATHS
@@ -36,6 +50,12 @@ REPORT_DIR.mkdir(parents=True, exist_ok=True)
 
 REPORT_FILE = REPORT_DIR / "monitoring_report.json"
 
+with open(BASE_DIR / "config" / "config.yaml") as f:
+    monitoring_cfg = yaml.safe_load(f).get("monitoring", {})
+
+VOLUME_MIN_OBSERVATIONS = monitoring_cfg.get("volume_min_observations", 4)
+VOLUME_Z_THRESHOLD = monitoring_cfg.get("volume_z_threshold", 3)
+
 # ----------------------------------
 # HELPERS
 # ----------------------------------
@@ -56,182 +76,338 @@ def hours_diff(t1, t2):
 
 
 # ----------------------------------
-# MAIN MONITORING LOGIC
+# LOAD AUDIT
 # ----------------------------------
-def run_monitoring():
-    alerts = []
-
-    report = {
-        "monitoring_timestamp": now_utc().isoformat(),
-        "pipeline_health": "healthy",
-        "checks": {},
-        "alerts": [],
-        "overall_health_score": 100
-    }
+# Freshness comes from audit.load_audit, which every load step writes
+# when it commits: one index probe per table instead of MAX() scans over
+# the loaded tables. --deep-verify additionally runs the scans and checks
+# the audit against them.
+FRESHNESS_TABLES = {
+    "staging": ("customers", "MAX(loaded_at)"),
+    "production": ("transactions", "MAX(created_at)"),
+    "warehouse": ("fact_sales", "MAX(created_at)")
+}
 
-    with engine.connect() as conn:
-        # ==============================
-        # 1️⃣ PIPELINE EXECUTION HEALTH
-        # ==============================
-        pipeline_report_path = REPORT_DIR / "pipeline_execution_report.json"
-
-        if pipeline_report_path.exists():
-            with open(pipeline_report_path) as f:
-                pipeline_report = json.load(f)
-
-            last_run_time = make_utc(
-                datetime.fromisoformat(pipeline_report["end_time"])
-            )
-
-            hours_since = hours_diff(now_utc(), last_run_time)
-            status = "ok" if hours_since <= 25 else "critical"
-
-            if status == "critical":
-                alerts.append({
-                    "severity": "critical",
-                    "check": "last_execution",
-                    "message": f"No pipeline run in last {hours_since:.1f} hours",
-                    "timestamp": now_utc().isoformat()
-                })
-
-            report["checks"]["last_execution"] = {
-                "status": status,
-                "last_run": last_run_time.isoformat(),
-                "hours_since_last_run": round(hours_since, 2),
-                "threshold_hours": 25
-            }
-        else:
-            report["pipeline_health"] = "critical"
-
-        # ==============================
-        # 2️⃣ DATA FRESHNESS
-        # ==============================
-        freshness_df = pd.read_sql(
-            text("""
-                SELECT 'staging' AS layer, MAX(loaded_at) ts FROM staging.customers
-                UNION ALL
-                SELECT 'production', MAX(created_at) FROM production.transactions
-                UNION ALL
-                SELECT 'warehouse', MAX(created_at) FROM warehouse.fact_sales
-            """),
-            conn
-        )
 
-        latest_times = {
-            row["layer"]: make_utc(row["ts"])
-            for _, row in freshness_df.iterrows()
+def latest_loads(conn):
+    rows = conn.execute(
+        text("""
+            SELECT t.layer, a.batch_id, a.max_timestamp, a.committed_at
+            FROM UNNEST(CAST(:layers AS TEXT[]), CAST(:tables AS TEXT[])) AS t(layer, table_name)
+            LEFT JOIN LATERAL (
+                SELECT batch_id, max_timestamp, committed_at
+                FROM audit.load_audit a
+                WHERE a.layer = t.layer
+                  AND a.table_name = t.table_name
+                ORDER BY a.audit_id DESC
+                LIMIT 1
+            ) a ON TRUE
+        """),
+        {
+            "layers": list(FRESHNESS_TABLES),
+            "tables": [table for table, _ in FRESHNESS_TABLES.values()]
         }
+    )
+    return {row.layer: row for row in rows}
 
-        lag_stg_prod = hours_diff(
-            latest_times["staging"], latest_times["production"]
-        )
-        lag_prod_wh = hours_diff(
-            latest_times["production"], latest_times["warehouse"]
+
+# ----------------------------------
+# VOLUME ANOMALIES
+# ----------------------------------
+# The warehouse load keeps daily fact volumes per series (overall, per
+# category, per payment method) and a baseline per series and weekday
+# in the audit schema. A check scores the newest closed day of every
+# series against its weekday baseline: one row per series, whatever the
+# history length. The newest metric_date is still filling up and would
+# read as a drop; the volume_baselines watermark is the last day the
+# load closed and folded into the baselines.
+def latest_volumes(conn):
+    return conn.execute(text("""
+        WITH latest AS (
+            SELECT watermark_ts::DATE AS metric_date
+            FROM warehouse.load_watermarks
+            WHERE table_name = 'volume_baselines'
         )
+        SELECT
+            b.dimension,
+            b.member,
+            l.metric_date,
+            COALESCE(m.row_count, 0) AS row_count,
+            b.observations,
+            b.mean,
+            b.variance
+        FROM latest l
+        JOIN audit.volume_baselines b
+            ON b.day_of_week = EXTRACT(ISODOW FROM l.metric_date)
+        LEFT JOIN audit.daily_volume_metrics m
+            ON m.dimension = b.dimension
+           AND m.member = b.member
+           AND m.metric_date = l.metric_date
+        ORDER BY b.dimension DESC, b.member
+    """)).fetchall()
+
+
+def score_volume(row):
+    baseline = Baseline(row.observations, row.mean, row.variance)
+    zscore = baseline.zscore(row.row_count)
+    lower, upper = baseline.expected_range(VOLUME_Z_THRESHOLD)
+    anomaly = row.observations >= VOLUME_MIN_OBSERVATIONS and abs(zscore) > VOLUME_Z_THRESHOLD
+
+    return {
+        "dimension": row.dimension,
+        "member": row.member,
+        "actual_count": int(row.row_count),
+        "expected_range": f"{lower:.1f} - {upper:.1f}",
+        "zscore": round(zscore, 2),
+        "observations": int(row.observations),
+        "anomaly_detected": anomaly,
+        "anomaly_type": ("spike" if zscore > 0 else "drop") if anomaly else None
+    }
+
 
-        freshness_status = "ok"
-        if lag_stg_prod > 1 or lag_prod_wh > 1:
-            freshness_status = "warning"
+def verify_load_audit(conn, latest_times):
+    """Deep verify: scan each table's newest timestamp and compare it with the audit."""
+    scans = " UNION ALL ".join(
+        f"SELECT '{layer}' AS layer, {expr} AS ts FROM {layer}.{table}"
+        for layer, (table, expr) in FRESHNESS_TABLES.items()
+    )
+    scanned = {
+        row.layer: make_utc(row.ts)
+        for row in conn.execute(text(scans))
+    }
 
-        report["checks"]["data_freshness"] = {
-            "status": freshness_status,
-            "staging_latest_record": latest_times["staging"].isoformat(),
-            "production_latest_record": latest_times["production"].isoformat(),
-            "warehouse_latest_record": latest_times["warehouse"].isoformat(),
-            "max_lag_hours": round(max(lag_stg_prod, lag_prod_wh), 2)
+    mismatches = {
+        layer: {
+            "scanned": scanned[layer].isoformat() if scanned[layer] else None,
+            "audited": latest_times[layer].isoformat() if latest_times[layer] else None
         }
+        for layer in FRESHNESS_TABLES
+        if scanned[layer] != latest_times[layer]
+    }
 
-        # ==============================
-        # 3️⃣ DATA VOLUME ANOMALY (FIXED)
-        # ==============================
-        volumes = pd.read_sql(
-            text("""
-                SELECT d.full_date, COUNT(*) cnt
-                FROM warehouse.fact_sales f
-                JOIN warehouse.dim_date d
-                  ON f.date_key = d.date_key
-                WHERE d.full_date >= CURRENT_DATE - INTERVAL '30 days'
-                GROUP BY d.full_date
-                ORDER BY d.full_date
-            """),
-            conn
-        )
+    return {
+        "status": "ok" if not mismatches else "mismatch",
+        "scanned_latest_records": {
+            layer: ts.isoformat() if ts else None for layer, ts in scanned.items()
+        },
+        "mismatches": mismatches
+    }
 
-        if volumes.empty:
-            report["checks"]["data_volume_anomalies"] = {
-                "status": "ok",
-                "note": "No data available for anomaly detection",
-                "actual_count": 0,
-                "anomaly_detected": False,
-                "anomaly_type": None
-            }
-        else:
-            counts = volumes["cnt"].tolist()
-            today_count = counts[-1]
 
-            mean = statistics.mean(counts)
-            std = statistics.stdev(counts) if len(counts) > 1 else 0
+# ----------------------------------
+# CHECKS
+# ----------------------------------
+# Each check gets a connection (None if it reads no tables) and returns
+# its report entry and the alerts it raises, so checks can run together
+# on one connection (run_monitoring) or independently (--watch).
+def alert(severity, check, message):
+    return {
+        "severity": severity,
+        "check": check,
+        "message": message,
+        "timestamp": now_utc().isoformat()
+    }
 
-            upper = mean + 3 * std
-            lower = mean - 3 * std
 
-            anomaly = today_count > upper or today_count < lower
+# ==============================
+# 1️⃣ PIPELINE EXECUTION HEALTH
+# ==============================
+def check_last_execution(conn):
+    pipeline_report_path = REPORT_DIR / "pipeline_execution_report.json"
 
-            report["checks"]["data_volume_anomalies"] = {
-                "status": "anomaly_detected" if anomaly else "ok",
-                "expected_range": f"{int(lower)} - {int(upper)}",
-                "actual_count": int(today_count),
-                "anomaly_detected": anomaly,
-                "anomaly_type": "spike" if today_count > upper else "drop" if anomaly else None
-            }
+    if not pipeline_report_path.exists():
+        return (
+            {"status": "critical", "note": "No pipeline execution report found"},
+            [alert("critical", "last_execution", "No pipeline execution report found")]
+        )
 
-            if anomaly:
-                alerts.append({
-                    "severity": "warning",
-                    "check": "data_volume",
-                    "message": f"Transaction volume anomaly detected: {today_count}",
-                    "timestamp": now_utc().isoformat()
-                })
-
-        # ==============================
-        # 4️⃣ DATA QUALITY
-        # ==============================
-        orphan_txn = conn.execute(text("""
-            SELECT COUNT(*)
-            FROM production.transactions t
-            LEFT JOIN production.customers c
-              ON t.customer_id = c.customer_id
-            WHERE c.customer_id IS NULL
-        """)).scalar()
-
-        report["checks"]["data_quality"] = {
-            "status": "ok" if orphan_txn == 0 else "degraded",
-            "quality_score": 100 if orphan_txn == 0 else 90,
-            "orphan_records": orphan_txn,
-            "null_violations": 0
-        }
+    with open(pipeline_report_path) as f:
+        pipeline_report = json.load(f)
+
+    last_run_time = make_utc(
+        datetime.fromisoformat(pipeline_report["end_time"])
+    )
 
-        # ==============================
-        # 5️⃣ DATABASE HEALTH
-        # ==============================
-        start = time.time()
-        conn.execute(text("SELECT 1"))
-        response_ms = (time.time() - start) * 1000
+    hours_since = hours_diff(now_utc(), last_run_time)
+    status = "ok" if hours_since <= 25 else "critical"
+
+    alerts = []
+    if status == "critical":
+        alerts.append(alert(
+            "critical", "last_execution", f"No pipeline run in last {hours_since:.1f} hours"
+        ))
+
+    return {
+        "status": status,
+        "last_run": last_run_time.isoformat(),
+        "hours_since_last_run": round(hours_since, 2),
+        "threshold_hours": 25
+    }, alerts
+
+
+# ==============================
+# 2️⃣ DATA FRESHNESS
+# ==============================
+def audited_times(conn):
+    latest = latest_loads(conn)
+    return latest, {
+        layer: make_utc(row.max_timestamp)
+        for layer, row in latest.items()
+    }
 
-        active_conn = conn.execute(
-            text("SELECT COUNT(*) FROM pg_stat_activity")
-        ).scalar()
 
-        report["checks"]["database_connectivity"] = {
+def check_data_freshness(conn):
+    latest, latest_times = audited_times(conn)
+    unaudited = [layer for layer, ts in latest_times.items() if ts is None]
+
+    if unaudited:
+        message = f"No load audit entries for: {', '.join(unaudited)}"
+        return (
+            {"status": "warning", "note": message},
+            [alert("warning", "data_freshness", message)]
+        )
+
+    lag_stg_prod = hours_diff(
+        latest_times["staging"], latest_times["production"]
+    )
+    lag_prod_wh = hours_diff(
+        latest_times["production"], latest_times["warehouse"]
+    )
+
+    freshness_status = "ok"
+    if lag_stg_prod > 1 or lag_prod_wh > 1:
+        freshness_status = "warning"
+
+    return {
+        "status": freshness_status,
+        "staging_latest_record": latest_times["staging"].isoformat(),
+        "production_latest_record": latest_times["production"].isoformat(),
+        "warehouse_latest_record": latest_times["warehouse"].isoformat(),
+        "max_lag_hours": round(max(lag_stg_prod, lag_prod_wh), 2),
+        "source": "load_audit",
+        "batch_ids": {layer: row.batch_id for layer, row in latest.items()}
+    }, []
+
+
+# ==============================
+# 3️⃣ DATA VOLUME ANOMALY
+# ==============================
+def check_data_volume(conn):
+    volumes = latest_volumes(conn)
+
+    if not volumes:
+        return {
             "status": "ok",
-            "response_time_ms": round(response_ms, 2),
-            "connections_active": active_conn
-        }
+            "note": "No volume baselines available for anomaly detection",
+            "actual_count": 0,
+            "anomaly_detected": False,
+            "anomaly_type": None
+        }, []
+
+    scores = [score_volume(row) for row in volumes]
+    overall = next(
+        (score for score in scores if score["dimension"] == "table"), scores[0]
+    )
+    anomalies = [score for score in scores if score["anomaly_detected"]]
+
+    alerts = [
+        alert(
+            "warning", "data_volume",
+            f"Volume {a['anomaly_type']} for {a['dimension']} {a['member']}: "
+            f"{a['actual_count']} rows (expected {a['expected_range']})"
+        )
+        for a in anomalies
+    ]
+
+    return {
+        "status": "anomaly_detected" if anomalies else "ok",
+        "metric_date": volumes[0].metric_date.isoformat(),
+        "day_of_week": volumes[0].metric_date.strftime("%A"),
+        "expected_range": overall["expected_range"],
+        "actual_count": overall["actual_count"],
+        "anomaly_detected": bool(anomalies),
+        "anomaly_type": overall["anomaly_type"],
+        "series_checked": len(scores),
+        "anomalies": anomalies
+    }, alerts
+
+
+def check_load_audit(conn):
+    _, latest_times = audited_times(conn)
+    verification = verify_load_audit(conn, latest_times)
 
-    # ----------------------------------
-    # FINALIZE REPORT
-    # ----------------------------------
+    alerts = []
+    if verification["status"] != "ok":
+        alerts.append(alert(
+            "warning", "load_audit_verification",
+            f"Load audit disagrees with table scans for: {', '.join(verification['mismatches'])}"
+        ))
+    return verification, alerts
+
+
+# ==============================
+# 4️⃣ DATA QUALITY
+# ==============================
+def check_data_quality(conn):
+    orphan_txn = conn.execute(text("""
+        SELECT COUNT(*)
+        FROM production.transactions t
+        LEFT JOIN production.customers c
+          ON t.customer_id = c.customer_id
+        WHERE c.customer_id IS NULL
+    """)).scalar()
+
+    return {
+        "status": "ok" if orphan_txn == 0 else "degraded",
+        "quality_score": 100 if orphan_txn == 0 else 90,
+        "orphan_records": orphan_txn,
+        "null_violations": 0
+    }, []
+
+
+# ==============================
+# 5️⃣ DATABASE HEALTH
+# ==============================
+def check_database(conn):
+    start = time.time()
+    conn.execute(text("SELECT 1"))
+    response_ms = (time.time() - start) * 1000
+
+    active_conn = conn.execute(
+        text("SELECT COUNT(*) FROM pg_stat_activity")
+    ).scalar()
+
+    return {
+        "status": "ok",
+        "response_time_ms": round(response_ms, 2),
+        "connections_active": active_conn
+    }, []
+
+
+# name -> (check, reads tables); report order
+CHECKS = {
+    "last_execution": (check_last_execution, False),
+    "data_freshness": (check_data_freshness, True),
+    "data_volume_anomalies": (check_data_volume, True),
+    "load_audit_verification": (check_load_audit, True),
+    "data_quality": (check_data_quality, True),
+    "database_connectivity": (check_database, True)
+}
+# Scans the loaded tables; only with --deep-verify
+DEEP_CHECKS = {"load_audit_verification"}
+
+
+def selected_checks(deep_verify):
+    return [name for name in CHECKS if deep_verify or name not in DEEP_CHECKS]
+
+
+# ----------------------------------
+# REPORT
+# ----------------------------------
+def finalize(report, alerts):
     report["alerts"] = alerts
+    report["pipeline_health"] = "healthy"
+    report["overall_health_score"] = 100
 
     if any(a["severity"] == "critical" for a in alerts):
         report["pipeline_health"] = "critical"
@@ -239,12 +415,222 @@ def run_monitoring():
     elif alerts:
         report["pipeline_health"] = "degraded"
         report["overall_health_score"] = 85
+    return report
+
 
-    with open(REPORT_FILE, "w") as f:
+def write_report(report, path=REPORT_FILE):
+    # Readers never see a half-written report
+    tmp_path = path.with_suffix(".json.tmp")
+    with open(tmp_path, "w") as f:
         json.dump(report, f, indent=4)
+    os.replace(tmp_path, path)
+
+
+# ----------------------------------
+# MAIN MONITORING LOGIC
+# ----------------------------------
+def run_monitoring(deep_verify=False):
+    alerts = []
+
+    report = {
+        "monitoring_timestamp": now_utc().isoformat(),
+        "pipeline_health": "healthy",
+        "checks": {},
+        "alerts": [],
+        "overall_health_score": 100
+    }
+
+    with engine.connect() as conn:
+        for name in selected_checks(deep_verify):
+            check, _ = CHECKS[name]
+            report["checks"][name], check_alerts = check(conn)
+            alerts.extend(check_alerts)
+
+    write_report(finalize(report, alerts))
 
     print("🩺 Monitoring completed successfully")
 
 
+# ----------------------------------
+# CONTINUOUS MONITORING (--watch)
+# ----------------------------------
+# Every check runs in its own asyncio task on its own interval, so cheap
+# checks (connectivity, freshness) can run every few seconds while the
+# heavier ones run rarely. At most WATCH_POOL_SIZE checks hold a
+# connection at once; the rest wait for a slot. Each check's queries run
+# with statement_timeout set to the check's timeout, so the server
+# cancels a slow query instead of letting runs pile up, and a check whose
+# previous run is still in flight is skipped. The latest result and a
+# rolling window of runs per check are kept in memory, and the report is
+# rewritten atomically after every run.
+watch_cfg = monitoring_cfg.get("watch", {})
+WATCH_POOL_SIZE = watch_cfg.get("pool_size", 3)
+WATCH_HISTORY = watch_cfg.get("history", 20)
+WATCH_SCHEDULE = {
+    name: {"interval_seconds": 60, "timeout_seconds": 10, **watch_cfg.get("checks", {}).get(name, {})}
+    for name in CHECKS
+}
+
+
+def execute_check(watch_engine, name, timeout):
+    check, reads_tables = CHECKS[name]
+    if not reads_tables:
+        return check(None)
+
+    with watch_engine.connect() as conn:
+        # Transaction-local: the pooled connection is reset on return
+        conn.execute(
+            text("SELECT set_config('statement_timeout', :ms, true)"),
+            {"ms": str(int(timeout * 1000))}
+        )
+        return check(conn)
+
+
+class MonitorState:
+    def __init__(self, names, history=WATCH_HISTORY):
+        self.started = now_utc()
+        self.results = {}
+        self.alerts = {name: [] for name in names}
+        self.runs = {name: deque(maxlen=history) for name in names}
+        self.consecutive_failures = {name: 0 for name in names}
+
+    def record(self, name, status, duration, result=None, alerts=None, error=None):
+        self.runs[name].append({
+            "timestamp": now_utc().isoformat(),
+            "status": status,
+            "duration_ms": round(duration * 1000, 2)
+        })
+
+        if status == "ok":
+            self.results[name] = result
+            self.alerts[name] = alerts
+            self.consecutive_failures[name] = 0
+        else:
+            # Keep the last good result; the failure itself is the alert
+            self.consecutive_failures[name] += 1
+            self.alerts[name] = [alert("warning", name, f"Check {status}: {error}")]
+
+    def report(self):
+        report = {
+            "monitoring_timestamp": now_utc().isoformat(),
+            "mode": "watch",
+            "watch_started": self.started.isoformat(),
+            "checks": {name: self.results[name] for name in self.runs if name in self.results},
+            "check_runs": {}
+        }
+
+        for name, runs in self.runs.items():
+            durations = sorted(run["duration_ms"] for run in runs)
+            report["check_runs"][name] = {
+                "interval_seconds": WATCH_SCHEDULE[name]["interval_seconds"],
+                "last_run": runs[-1] if runs else None,
+                "median_duration_ms": durations[len(durations) // 2] if durations else None,
+                "failures": sum(run["status"] != "ok" for run in runs),
+                "consecutive_failures": self.consecutive_failures[name],
+                "window": len(runs)
+            }
+
+        alerts = [a for name in self.runs for a in self.alerts[name]]
+        return finalize(report, alerts)
+
+
+async def watch_check(name, state, watch_engine, executor, slots, stop):
+    loop = asyncio.get_running_loop()
+    interval = WATCH_SCHEDULE[name]["interval_seconds"]
+    timeout = WATCH_SCHEDULE[name]["timeout_seconds"]
+    in_flight = None
+
+    while not stop.is_set():
+        started = loop.time()
+
+        if in_flight and not in_flight.done():
+            state.record(name, "skipped", 0, error="previous run still in flight")
+        else:
+            await slots.acquire()
+            in_flight = loop.run_in_executor(executor, execute_check, watch_engine, name, timeout)
+            # The slot frees when the thread does, not when we stop waiting
+            in_flight.add_done_callback(lambda _: slots.release())
+
+            try:
+                # Grace second: statement_timeout should fire first
+                result, alerts = await asyncio.wait_for(asyncio.shield(in_flight), timeout + 1)
+                state.record(name, "ok", loop.time() - started, result, alerts)
+            except asyncio.TimeoutError:
+                state.record(name, "timed out", loop.time() - started, error=f"no result after {timeout}s")
+            except OperationalError as e:
+                status = "timed out" if isinstance(e.orig, QueryCanceled) else "failed"
+                state.record(name, status, loop.time() - started, error=str(e.orig).strip())
+            except Exception as e:
+                state.record(name, "failed", loop.time() - started, error=str(e))
+
+        write_report(state.report())
+        REGISTRY.set("pipeline_db_pool_connections", watch_engine.pool.checkedout(), state="in_use")
+        REGISTRY.set("pipeline_db_pool_connections", WATCH_POOL_SIZE, state="max")
+        # Long-running: persist as we go rather than only on exit
+        flush()
+
+        try:
+            await asyncio.wait_for(stop.wait(), max(interval - (loop.time() - started), 0))
+        except asyncio.TimeoutError:
+            pass
+
+
+async def watch(deep_verify=False, duration=None):
+    names = selected_checks(deep_verify)
+    state = MonitorState(names)
+    stop = asyncio.Event()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    if duration:
+        loop.call_later(duration, stop.set)
+
+    watch_engine = create_engine(
+        ENGINE_URL,
+        pool_size=WATCH_POOL_SIZE,
+        max_overflow=0,
+        pool_pre_ping=True,
+        connect_args={"cursor_factory": TimedCursor}
+    )
+    executor = ThreadPoolExecutor(max_workers=WATCH_POOL_SIZE)
+    slots = asyncio.Semaphore(WATCH_POOL_SIZE)
+
+    print(f"🩺 Watching {len(names)} checks (pool of {WATCH_POOL_SIZE}), Ctrl+C to stop")
+    try:
+        await asyncio.gather(*(
+            watch_check(name, state, watch_engine, executor, slots, stop)
+            for name in names
+        ))
+    finally:
+        executor.shutdown(wait=True)
+        watch_engine.dispose()
+        write_report(state.report())
+
+    print("🩺 Monitoring stopped")
+
+
 if __name__ == "__main__":
-    run_monitoring()
+    parser = argparse.ArgumentParser(description="Pipeline health monitoring")
+    parser.add_argument(
+        "--deep-verify",
+        action="store_true",
+        help="Also scan the loaded tables and check the load audit against them"
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running, each check on its own interval (monitoring.watch)"
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        help="With --watch: stop after this many seconds"
+    )
+    args = parser.parse_args()
+
+    with step_metrics("monitoring"):
+        if args.watch:
+            asyncio.run(watch(deep_verify=args.deep_verify, duration=args.duration))
+        else:
+            run_monitoring(deep_verify=args.deep_verify)
@@ -3,10 +3,20 @@ import time
 import json
 import logging
 import traceback
+import os
+import signal
 import sys
 from datetime import datetime, timezone
 from pathlib import Path
 
+import psycopg2
+import yaml
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "transformation"))
+
+# Steps exit with this when one of their own queries or tasks timed out
+from table_dag import TIMEOUT_EXIT_CODE  # noqa: E402
+
 # =========================
 # PATH CONFIG
 # =========================
@@ -19,6 +29,14 @@ PIPELINE_ID = f"PIPE_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}"
 
 PYTHON_EXEC = sys.executable  
 
+with open("config/config.yaml") as f:
+    config = yaml.safe_load(f)
+
+db = config["database"]
+pipeline_cfg = config.get("pipeline", {})
+STEP_TIMEOUT_SECONDS = pipeline_cfg.get("step_timeout_seconds", 900)
+PIPELINE_TIMEOUT_SECONDS = pipeline_cfg.get("pipeline_timeout_seconds", 3600)
+
 # =========================
 # LOGGING CONFIG
 # =========================
@@ -48,23 +66,132 @@ PIPELINE_STEPS = [
     ("data_quality", f"{PYTHON_EXEC} scripts/quality_checks/validate_data.py"),
     ("staging_to_production", f"{PYTHON_EXEC} scripts/transformation/staging_to_production.py"),
     ("warehouse_load", f"{PYTHON_EXEC} scripts/transformation/load_warehouse.py"),
-    ("analytics_generation", f"{PYTHON_EXEC} scripts/transformation/generate_analytics.py")
+    ("analytics_generation", f"{PYTHON_EXEC} scripts/transformation/generate_analytics.py"),
+    ("bi_snapshot_export", f"{PYTHON_EXEC} scripts/transformation/parquet_export.py")
 ]
 
 MAX_RETRIES = 3
 BACKOFF_SECONDS = [1, 2, 4]
 
+# =========================
+# TIMEOUTS
+# =========================
+# Each step runs with PGAPPNAME set to "<pipeline id>:<step>", so every
+# connection it opens is tagged in pg_stat_activity. When the step runs
+# past min(step timeout, time left in the pipeline) its in-flight queries
+# are cancelled with pg_cancel_backend before the process is stopped;
+# killing the client alone would leave them running on the server.
+def application_name(step_name):
+    return f"{PIPELINE_ID}:{step_name}"
+
+
+def cancel_step_queries(step_name):
+    try:
+        conn = psycopg2.connect(
+            host=db["host"],
+            port=db["port"],
+            dbname=db["name"],
+            user=db["user"],
+            password=db["password"]
+        )
+    except psycopg2.Error as e:
+        logging.warning(f"Could not connect to cancel queries of {step_name}: {e}")
+        return None
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT COUNT(*) FILTER (WHERE pg_cancel_backend(pid))
+                FROM pg_stat_activity
+                WHERE application_name = %s
+                  AND state = 'active'
+                  AND pid <> pg_backend_pid()
+            """, (application_name(step_name),))
+            return cur.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def stop_process(proc):
+    # The step runs in its own session: signal the shell and its children
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        os.killpg(proc.pid, signal.SIGKILL)
+        proc.wait()
+    except ProcessLookupError:
+        pass
+
+
+def timeout_result(start_time, retries, scope, message, **extra):
+    return {
+        "status": "timeout",
+        "timeout_scope": scope,
+        "duration_seconds": round(time.time() - start_time, 2),
+        "records_processed": 0,
+        "error_message": message,
+        "retry_attempts": retries,
+        **extra
+    }
+
 # =========================
 # EXECUTION HELPERS
 # =========================
-def run_step(step_name, command):
+def run_step(step_name, command, deadline):
     start_time = time.time()
     retries = 0
 
     for attempt in range(1, MAX_RETRIES + 1):
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return timeout_result(
+                start_time, retries, "pipeline",
+                f"pipeline timeout of {PIPELINE_TIMEOUT_SECONDS}s reached"
+            )
+        budget = min(STEP_TIMEOUT_SECONDS, remaining)
+        scope = "step" if budget == STEP_TIMEOUT_SECONDS else "pipeline"
+
         try:
             logging.info(f"➡ Starting step: {step_name} (Attempt {attempt})")
-            subprocess.run(command, shell=True, check=True)
+            proc = subprocess.Popen(
+                command,
+                shell=True,
+                start_new_session=True,
+                env={
+                    **os.environ,
+                    "PGAPPNAME": application_name(step_name),
+                    # batch ID of the step's audit.load_audit entries
+                    "PIPELINE_ID": PIPELINE_ID
+                }
+            )
+
+            try:
+                returncode = proc.wait(timeout=budget)
+            except subprocess.TimeoutExpired:
+                cancelled = cancel_step_queries(step_name)
+                stop_process(proc)
+                logging.error(
+                    f"⏱ Step timed out: {step_name} after {budget:.0f}s "
+                    f"({scope} limit, {cancelled} queries cancelled)"
+                )
+                return timeout_result(
+                    start_time, retries, scope,
+                    f"{scope} timeout after {budget:.0f}s",
+                    queries_cancelled=cancelled
+                )
+
+            # A statement or task inside the step hit its own limit;
+            # retrying would hit it again
+            if returncode == TIMEOUT_EXIT_CODE:
+                logging.error(f"⏱ Step timed out: {step_name} (statement/task limit)")
+                return timeout_result(
+                    start_time, retries, "statement",
+                    "a query or task inside the step timed out; see the step report"
+                )
+
+            if returncode != 0:
+                raise subprocess.CalledProcessError(returncode, command)
 
             duration = time.time() - start_time
             logging.info(f"Completed step: {step_name} in {duration:.2f}s")
@@ -111,10 +238,18 @@ def main():
         "warnings": []
     }
 
+    deadline = pipeline_start + PIPELINE_TIMEOUT_SECONDS
+
     for step_name, command in PIPELINE_STEPS:
-        result = run_step(step_name, command)
+        result = run_step(step_name, command, deadline)
         report["steps_executed"][step_name] = result
 
+        if result["status"] == "timeout":
+            report["status"] = "timeout"
+            report["errors"].append(f"{step_name} timed out ({result['timeout_scope']})")
+            logging.error(f" Pipeline stopped at step: {step_name}")
+            break
+
         if result["status"] == "failed":
             report["status"] = "failed"
             report["errors"].append(f"{step_name} failed")
@@ -133,6 +268,8 @@ def main():
 
     if report["status"] == "success":
         logging.info(" PIPELINE COMPLETED SUCCESSFULLY")
+    elif report["status"] == "timeout":
+        logging.error(" PIPELINE TIMED OUT")
     else:
         logging.error(" PIPELINE FAILED")
 
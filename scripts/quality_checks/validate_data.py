@@ -1,4 +1,6 @@
 import os
+import re
+import sys
 import json
 import logging
 import psycopg2
@@ -12,6 +14,10 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__fil
 SQL_PATH = os.path.join(BASE_DIR, "sql", "queries", "data_quality_checks.sql")
 LOG_DIR = os.path.join(BASE_DIR, "logs")
 REPORT_DIR = os.path.join(BASE_DIR, "data", "quality_reports")
+sys.path.insert(0, os.path.join(BASE_DIR, "scripts", "transformation"))
+
+from pipeline_metrics import TimedCursor, step_metrics  # noqa: E402
+from table_dag import TIMEOUT_EXIT_CODE  # noqa: E402
 
 os.makedirs(LOG_DIR, exist_ok=True)
 os.makedirs(REPORT_DIR, exist_ok=True)
@@ -37,6 +43,7 @@ with open(os.path.join(BASE_DIR, "config", "config.yaml")) as f:
     config = yaml.safe_load(f)
 
 db = config["database"]
+STATEMENT_TIMEOUT_SECONDS = config.get("pipeline", {}).get("timeout_seconds")
 
 # -------------------------------------------------
 # DB connection
@@ -48,6 +55,9 @@ def get_connection():
         dbname=db["name"],
         user=db["user"],
         password=db["password"],
+        options=f"-c statement_timeout={int(STATEMENT_TIMEOUT_SECONDS * 1000)}"
+        if STATEMENT_TIMEOUT_SECONDS else None,
+        cursor_factory=TimedCursor
     )
 
 # -------------------------------------------------
@@ -64,9 +74,18 @@ def run_quality_checks(cursor):
 
     queries = [q.strip() for q in sql.split(";") if q.strip()]
     results = {}
+    timed_out = []
 
     for q in queries:
-        cursor.execute(q)
+        try:
+            cursor.execute(q)
+        except psycopg2.errors.QueryCanceled:
+            # statement_timeout; the remaining checks still run
+            cursor.connection.rollback()
+            match = re.search(r"'([^']+)'\s+AS\s+check_name", q, re.IGNORECASE)
+            timed_out.append(match.group(1) if match else q[:80])
+            logging.error(f"Quality check timed out: {timed_out[-1]}")
+            continue
         rows = cursor.fetchall()
 
         for row in rows:
@@ -180,6 +199,12 @@ def run_quality_checks(cursor):
 
     report["overall_quality_score"] = round(overall_score, 2)
 
+    # A check that timed out counts as 0 violations above; flag the
+    # report so the score is not read as a clean pass
+    if timed_out:
+        report["status"] = "timeout"
+        report["timed_out_checks"] = timed_out
+
     if overall_score >= 90:
         report["quality_grade"] = "A"
     elif overall_score >= 80:
@@ -219,5 +244,9 @@ def main():
     cursor.close()
     conn.close()
 
+    if report.get("status") == "timeout":
+        sys.exit(TIMEOUT_EXIT_CODE)
+
 if __name__ == "__main__":
-    main()
+    with step_metrics("data_quality"):
+        main()
@@ -2,24 +2,52 @@ import psycopg2
 import pandas as pd
 import json
 import time
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from pathlib import Path
 import os 
+import sys
+import csv
+import argparse
 import yaml
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+
+from hll import merge_all
+from pipeline_metrics import REGISTRY, TimedCursor, step_metrics
+from parquet_export import analytics_dir, analytics_path, stream_to_parquet, write_dataframe
+from query_profiler import run_profiling
+from result_cache import ResultCache, cache_key
+from sql_params import FULL_HISTORY, bind_named, statement_body
+from table_dag import TIMEOUT_EXIT_CODE, get_pool
 
 # --------------------------------------------------
 # CONFIG
 # --------------------------------------------------
-OUTPUT_DIR = Path("data/processed/analytics")
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-
-
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+OUTPUT_DIR = Path(BASE_DIR) / "data" / "processed" / "analytics"
+OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+
 with open(os.path.join(BASE_DIR, "config", "config.yaml")) as f:
     config = yaml.safe_load(f)
 
 db = config["database"]
+PARALLEL_WORKERS = config.get("pipeline", {}).get("parallel_workers", 4)
+# Every analytics statement is cancelled by the server past this limit
+STATEMENT_TIMEOUT_SECONDS = config.get("pipeline", {}).get("timeout_seconds")
+
+analytics_cfg = config.get("analytics", {})
+STREAMING_EXPORT = analytics_cfg.get("streaming_export", True)
+PROFILING_ENABLED = analytics_cfg.get("profiling", {}).get("enabled", False)
+CACHE_ENABLED = analytics_cfg.get("result_cache", True)
+CACHE_DIR = OUTPUT_DIR / ".cache"
+CACHE_MAX_BYTES = analytics_cfg.get("cache_max_mb", 256) * 1024 * 1024
+# Typed Parquet copies of every result for BI, next to the CSVs
+PARQUET_EXPORT = config.get("bi", {}).get("parquet_export", False)
+incremental_cfg = analytics_cfg.get("incremental", {})
+INCREMENTAL_ENABLED = incremental_cfg.get("enabled", False)
+INCREMENTAL_TRAILING = incremental_cfg.get("trailing", 3)
+INCREMENTAL_UNIT = incremental_cfg.get("unit", "months")
 
 def get_connection():
     return psycopg2.connect(
@@ -27,9 +55,10 @@ def get_connection():
         port=db["port"],
         dbname=db["name"],
         user=db["user"],
-        password=db["password"]
+        password=db["password"],
+        cursor_factory=TimedCursor
     )
-SQL_FILE = "sql/queries/analytical_queries.sql"
+SQL_FILE = os.path.join(BASE_DIR, "sql", "queries", "analytical_queries.sql")
 
 
 
@@ -64,56 +93,542 @@ def load_queries():
 # --------------------------------------------------
 # EXECUTE QUERY
 # --------------------------------------------------
-def execute_query(conn, sql):
+# Queries may use named parameters (:start_date, :end_date); they are
+# bound by psycopg2, never formatted into the SQL text.
+def execute_query(conn, sql, params=None):
     start = time.time()
-    df = pd.read_sql_query(sql, conn)
+    body, bound = bind_named(statement_body(sql), params)
+    df = pd.read_sql_query(body, conn, params=bound)
     exec_time = round((time.time() - start) * 1000, 2)
     return df, exec_time
 
 
+# --------------------------------------------------
+# STREAMING EXPORT
+# --------------------------------------------------
+# COPY (<query>) TO STDOUT WITH CSV HEADER writes the result straight to
+# the CSV in fixed-size chunks, so memory stays flat however many rows a
+# drill-down returns and nothing is serialized twice. The row count comes
+# from the COPY command tag; the column count from the header line.
+class HeaderCapturingWriter:
+    # psycopg2 hands raw bytes to file objects that are not text files
+    def __init__(self, f):
+        self.f = f
+        self.header = None
+        self.pending = b""
+
+    def write(self, data):
+        if self.header is None:
+            self.pending += data
+            if b"\n" in self.pending:
+                line = self.pending.split(b"\n", 1)[0].decode("utf-8")
+                self.header = next(csv.reader([line]))
+                self.pending = b""
+        return self.f.write(data)
+
+def stream_query_to_csv(conn, sql, filename, params=None):
+    path = OUTPUT_DIR / filename
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    body, bound = bind_named(statement_body(sql), params)
+
+    try:
+        with conn.cursor() as cur, open(tmp_path, "wb") as f:
+            writer = HeaderCapturingWriter(f)
+            copy_sql = f"COPY ({body}) TO STDOUT WITH CSV HEADER"
+            # COPY takes no server-side parameters: bind them client-side
+            if bound:
+                copy_sql = cur.mogrify(copy_sql, bound).decode("utf-8")
+            cur.copy_expert(copy_sql, writer)
+            rows = cur.rowcount
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+    # Readers never see a half-written file
+    os.replace(tmp_path, path)
+    return {"rows": rows, "columns": len(writer.header or []), "streamed": True}
+
+# --------------------------------------------------
+# SKETCH ROLLUPS
+# --------------------------------------------------
+# Distinct counts over months/quarters/years/segments come from unions
+# of the daily HLL sketches instead of COUNT(DISTINCT) over fact_sales.
+PERIODS = {
+    "month": "CONCAT(d.year, '-', LPAD(d.month::TEXT, 2, '0'))",
+    "quarter": "CONCAT(d.year, '-Q', d.quarter)",
+    "year": "d.year::TEXT"
+}
+
+SKETCH_ROLLUPS = {
+    "distinct_by_month": ("month", False),
+    "distinct_by_quarter": ("quarter", False),
+    "distinct_by_year": ("year", False),
+    "distinct_by_segment_month": ("month", True)
+}
+
+# query name -> (period column, rollup, {output column: sketch})
+SKETCH_COLUMNS = {
+    "query2": ("year_month", "distinct_by_month", {"unique_customers": "customers_est"})
+}
+
+def rollup_sql(period, by_segment=False):
+    if by_segment:
+        return f"""
+            SELECT {PERIODS[period]} AS period, s.customer_segment, s.customers_hll
+            FROM warehouse.agg_daily_segment_customers s
+            JOIN warehouse.dim_date d ON s.date_key = d.date_key
+            WHERE d.full_date BETWEEN :start_date AND :end_date
+        """
+    return f"""
+        SELECT {PERIODS[period]} AS period, a.customers_hll, a.transactions_hll
+        FROM warehouse.agg_daily_sales a
+        JOIN warehouse.dim_date d ON a.date_key = d.date_key
+        WHERE d.full_date BETWEEN :start_date AND :end_date
+    """
+
+def sketch_rollup(conn, period, by_segment=False, params=FULL_HISTORY):
+    groups = {}
+    with conn.cursor() as cur:
+        cur.execute(*bind_named(rollup_sql(period, by_segment), params))
+        for row in cur.fetchall():
+            if by_segment:
+                groups.setdefault((row[0], row[1]), [[]])[0].append(row[2])
+            else:
+                sketches = groups.setdefault((row[0],), [[], []])
+                sketches[0].append(row[1])
+                sketches[1].append(row[2])
+
+    rows = []
+    for key in sorted(groups):
+        estimates = [merge_all(sketches).count() for sketches in groups[key]]
+        rows.append([*key, *estimates])
+
+    columns = (
+        [period, "customer_segment", "customers_est"] if by_segment
+        else [period, "customers_est", "transactions_est"]
+    )
+    return pd.DataFrame(rows, columns=columns)
+
+def add_sketch_columns(name, df, rollups):
+    if name not in SKETCH_COLUMNS:
+        return df
+
+    period_column, rollup, columns = SKETCH_COLUMNS[name]
+    estimates = rollups[rollup].set_index(rollups[rollup].columns[0])
+
+    for column, sketch in columns.items():
+        df[column] = df[period_column].map(estimates[sketch]).fillna(0).astype(int)
+
+    return df
+
+# --------------------------------------------------
+# INCREMENTAL RUNS
+# --------------------------------------------------
+# Results keyed by period can be refreshed for a trailing window only.
+# The job reruns with :start_date at the window start, aligned down to
+# the result's own period so a quarter or year is never half recomputed,
+# and its rows replace the same periods in the previous CSV. Results
+# without a period key are totals over all history and always run in
+# full (from the aggregate tables, not fact_sales). The window trails the
+# latest loaded day, which is today for a live warehouse.
+
+# result name -> (period, key columns)
+INCREMENTAL_RESULTS = {
+    "query2": ("month", ["year_month"]),
+    "distinct_by_month": ("month", ["month"]),
+    "distinct_by_quarter": ("quarter", ["quarter"]),
+    "distinct_by_year": ("year", ["year"]),
+    "distinct_by_segment_month": ("month", ["month", "customer_segment"])
+}
+
+def latest_data_date(conn):
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT TO_DATE(MAX(date_key)::TEXT, 'YYYYMMDD')
+            FROM warehouse.agg_daily_sales
+        """)
+        latest = cur.fetchone()[0]
+    conn.rollback()
+    return latest
+
+def window_start(anchor, trailing, unit):
+    if unit == "days":
+        return anchor - timedelta(days=trailing - 1)
+    months = anchor.year * 12 + anchor.month - 1 - (trailing - 1)
+    return date(months // 12, months % 12 + 1, 1)
+
+def period_start(day, period):
+    if period == "year":
+        return date(day.year, 1, 1)
+    if period == "quarter":
+        return date(day.year, 3 * ((day.month - 1) // 3) + 1, 1)
+    return day.replace(day=1)
+
+def period_label(day, period):
+    # Same text as PERIODS / query2's year_month
+    if period == "year":
+        return str(day.year)
+    if period == "quarter":
+        return f"{day.year}-Q{(day.month - 1) // 3 + 1}"
+    return f"{day.year}-{day.month:02d}"
+
+def merge_window(name, df, start):
+    """Replace the periods from `start` on in the previous result file with df."""
+    period, keys = INCREMENTAL_RESULTS[name]
+    previous = pd.read_csv(output_path(name), dtype={keys[0]: str})
+    kept = previous[previous[keys[0]] < period_label(start, period)]
+
+    merged = pd.concat([kept, df], ignore_index=True)
+    return merged.sort_values(keys, kind="stable", ignore_index=True)
+
+def incremental_job(conn, job, name, start):
+    return merge_window(name, job(conn), start)
+
 # --------------------------------------------------
 # EXPORT CSV
 # --------------------------------------------------
 def export_to_csv(df, filename):
     df.to_csv(OUTPUT_DIR / filename, index=False)
 
+def export_parquet(df, name):
+    write_dataframe(df, analytics_path(name))
+
+
+# --------------------------------------------------
+# CONCURRENT RUNNER
+# --------------------------------------------------
+# Every query and sketch rollup is a job fn(conn) -> DataFrame run on a
+# pooled connection by PARALLEL_WORKERS threads. Finished results are
+# handed to a separate export thread, so CSV writing overlaps with the
+# queries still running and total wall time tracks the slowest query.
+def run_job(pg_pool, fn, submitted_at):
+    started_at = time.time()
+    conn = pg_pool.getconn()
+    status, error = "success", None
+
+    try:
+        df = fn(conn)
+    except psycopg2.errors.QueryCanceled as e:
+        # statement_timeout: report it and let the other queries finish
+        df, status, error = None, "timeout", str(e).strip()
+    except psycopg2.Error as e:
+        # Any other database error fails this query only
+        df, status, error = None, "failed", str(e).strip()
+    finally:
+        # read-only: end the transaction before the connection is reused
+        conn.rollback()
+        pg_pool.putconn(conn)
+
+    timing = {
+        "status": status,
+        "queue_wait_ms": round((started_at - submitted_at) * 1000, 2),
+        "execution_time_ms": round((time.time() - started_at) * 1000, 2)
+    }
+    if error:
+        timing["error"] = error
+    return df, timing
+
+def query_job(conn, sql, params=FULL_HISTORY):
+    df, _ = execute_query(conn, sql, params)
+    return df
+
+def streamed_query_job(conn, sql, name, params=FULL_HISTORY):
+    result = stream_query_to_csv(conn, sql, f"{name}.csv", params)
+    if PARQUET_EXPORT:
+        body, bound = bind_named(statement_body(sql), params)
+        stream_to_parquet(conn, body, analytics_path(name), bound)
+    return result
+
+def result_shape(result):
+    if isinstance(result, pd.DataFrame):
+        return len(result), len(result.columns)
+    return result["rows"], result["columns"]
+
+def timed_export(df, name):
+    start = time.time()
+    export_to_csv(df, f"{name}.csv")
+    if PARQUET_EXPORT:
+        export_parquet(df, name)
+    return round((time.time() - start) * 1000, 2)
+
+def run_queries(pg_pool, jobs, max_workers, results=None):
+    """Run jobs; `results` may hold already-available rollups (e.g. cache hits)."""
+    results = dict(results or {})
+    timings, exports = {}, {}
+    ready = []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as query_executor, \
+            ThreadPoolExecutor(max_workers=1) as export_executor:
+        futures = {
+            query_executor.submit(run_job, pg_pool, fn, time.time()): name
+            for name, fn in jobs.items()
+        }
+
+        for future in as_completed(futures):
+            name = futures[future]
+            result, timings[name] = future.result()
+
+            if timings[name]["status"] == "timeout":
+                print(f"⏱ Timed out {name} ({timings[name]['execution_time_ms']} ms)")
+            elif timings[name]["status"] == "failed":
+                print(f"❌ Failed {name}: {timings[name]['error']}")
+            else:
+                results[name] = result
+                print(f"➡ Finished {name} ({timings[name]['execution_time_ms']} ms)")
+
+                if isinstance(result, pd.DataFrame):
+                    ready.append(name)
+                else:
+                    # Streamed jobs wrote their CSV while querying
+                    timings[name]["export_time_ms"] = 0
+                    timings[name]["streamed"] = True
+
+            # Queries enriched from a sketch rollup wait for that rollup
+            for pending in list(ready):
+                rollup = SKETCH_COLUMNS.get(pending, (None, None))[1]
+                rollup_status = timings.get(rollup, {}).get("status")
+                if rollup_status in ("timeout", "failed"):
+                    # Exporting without the sketch columns would change the CSV shape
+                    ready.remove(pending)
+                    del results[pending]
+                    timings[pending].update(
+                        status=rollup_status,
+                        error=f"{rollup} {'timed out' if rollup_status == 'timeout' else 'failed'}"
+                    )
+                    continue
+                if rollup and rollup not in results:
+                    continue
+                ready.remove(pending)
+
+                df = add_sketch_columns(pending, results[pending], results)
+                results[pending] = df
+                exports[pending] = export_executor.submit(timed_export, df, pending)
+
+        for name, export in exports.items():
+            timings[name]["export_time_ms"] = export.result()
+
+    return results, timings
+
+# --------------------------------------------------
+# RESULT CACHE
+# --------------------------------------------------
+def get_table_versions(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT table_name, version FROM warehouse.table_versions")
+        versions = dict(cur.fetchall())
+    conn.rollback()
+    return versions
+
+def output_path(name):
+    return str(OUTPUT_DIR / f"{name}.csv")
+
+def output_paths(name):
+    paths = [output_path(name)]
+    if PARQUET_EXPORT:
+        paths.append(analytics_path(name))
+    return paths
+
+def serve_cached(cache, keys, jobs):
+    """Serve every job whose key is cached; returns (hits, rollups needed by misses)."""
+    hits, rollups = {}, {}
+
+    for name, key in keys.items():
+        paths = output_paths(name)
+        # A hit needs every format; the CSV entry carries rows/columns
+        if all(cache.get(key, os.path.splitext(path)[1]) for path in paths):
+            hits[name] = [cache.serve(key, path) for path in paths][0]
+
+    for name in jobs:
+        if name in hits:
+            continue
+        rollup = SKETCH_COLUMNS.get(name, (None, None))[1]
+        if rollup in hits:
+            rollups[rollup] = pd.read_csv(output_path(rollup))
+
+    return hits, rollups
 
 # --------------------------------------------------
 # MAIN DRIVER
 # --------------------------------------------------
 def main():
-    conn = get_connection()
+    parser = argparse.ArgumentParser(description="Generate analytics results")
+    parser.add_argument(
+        "--profile", action="store_true", default=PROFILING_ENABLED,
+        help="EXPLAIN ANALYZE every analytical and data quality query and flag plan regressions"
+    )
+    parser.add_argument(
+        "--update-baseline", action="store_true",
+        help="with --profile: store this run's plans and timings as the baseline"
+    )
+    parser.add_argument(
+        "--incremental", action="store_true", default=INCREMENTAL_ENABLED,
+        help="recompute only the trailing window of period-keyed results and merge it into the previous files"
+    )
+    parser.add_argument(
+        "--trailing", type=int, default=INCREMENTAL_TRAILING,
+        help="with --incremental: size of the window"
+    )
+    parser.add_argument(
+        "--unit", choices=["days", "months"], default=INCREMENTAL_UNIT,
+        help="with --incremental: unit of --trailing"
+    )
+    args = parser.parse_args()
+
     queries = load_queries()
+    pg_pool = get_pool(db, PARALLEL_WORKERS, statement_timeout=STATEMENT_TIMEOUT_SECONDS)
+
+    # result name -> window start; results without a previous file run in full
+    windows = {}
+    if args.incremental:
+        conn = pg_pool.getconn()
+        try:
+            anchor = latest_data_date(conn)
+        finally:
+            pg_pool.putconn(conn)
+
+        if anchor:
+            start = window_start(anchor, args.trailing, args.unit)
+            windows = {
+                name: period_start(start, period)
+                for name, (period, _) in INCREMENTAL_RESULTS.items()
+                if os.path.exists(output_path(name))
+            }
+
+    def job_params(name):
+        if name in windows:
+            return {"start_date": windows[name], "end_date": date.max}
+        return FULL_HISTORY
 
     summary = {
         "generation_timestamp": datetime.utcnow().isoformat(),
         "queries_executed": 0,
+        "parallel_workers": PARALLEL_WORKERS,
         "query_results": {},
         "total_execution_time_seconds": 0
     }
 
+    # Rollups first: query results that need them can then export sooner
+    jobs = {
+        name: partial(sketch_rollup, period=period, by_segment=by_segment, params=job_params(name))
+        for name, (period, by_segment) in SKETCH_ROLLUPS.items()
+    }
+    # Results enriched or merged in Python need a DataFrame; everything else streams
+    jobs.update({
+        name: (
+            partial(streamed_query_job, sql=sql, name=name, params=job_params(name))
+            if STREAMING_EXPORT and name not in SKETCH_COLUMNS and name not in windows
+            else partial(query_job, sql=sql, params=job_params(name))
+        )
+        for name, sql in queries.items()
+    })
+    for name, window in windows.items():
+        jobs[name] = partial(incremental_job, job=jobs[name], name=name, start=window)
+    job_sql = {
+        **{name: rollup_sql(*spec) for name, spec in SKETCH_ROLLUPS.items()},
+        **queries
+    }
+
     total_start = time.time()
 
-    for name, sql in queries.items():
-        print(f"➡ Executing {name}")
-        df, exec_time = execute_query(conn, sql)
+    cache, keys, hits, rollups = None, {}, {}, {}
+    if CACHE_ENABLED:
+        cache = ResultCache(str(CACHE_DIR), CACHE_MAX_BYTES)
+        conn = pg_pool.getconn()
+        try:
+            versions = get_table_versions(conn)
+        finally:
+            pg_pool.putconn(conn)
+        # A merged result depends on the previous file too: never cache it
+        keys = {
+            name: cache_key(sql, versions, job_params(name))
+            for name, sql in job_sql.items() if name not in windows
+        }
+        hits, rollups = serve_cached(cache, keys, jobs)
+
+    misses = {name: fn for name, fn in jobs.items() if name not in hits}
 
-        export_to_csv(df, f"{name}.csv")
+    try:
+        results, timings = run_queries(pg_pool, misses, PARALLEL_WORKERS, results=rollups)
+    finally:
+        pg_pool.closeall()
 
+    for name in jobs:
+        if name in hits:
+            summary["query_results"][name] = {
+                "rows": hits[name]["rows"],
+                "columns": hits[name]["columns"],
+                "status": "success",
+                "cache": "hit"
+            }
+            continue
+
+        if timings[name]["status"] in ("timeout", "failed"):
+            summary["query_results"][name] = {**timings[name], "cache": "miss" if cache else "disabled"}
+            continue
+
+        rows, columns = result_shape(results[name])
+        REGISTRY.inc("pipeline_rows_processed_total", rows, layer="analytics", table=name)
         summary["query_results"][name] = {
-            "rows": len(df),
-            "columns": len(df.columns),
-            "execution_time_ms": exec_time
+            "rows": rows,
+            "columns": columns,
+            **timings[name],
+            "cache": "miss" if cache and name in keys else "disabled"
         }
+        if name in windows:
+            summary["query_results"][name]["window_start"] = windows[name].isoformat()
+        if cache and name in keys:
+            for path in output_paths(name):
+                cache.put(keys[name], path, rows=rows, columns=columns)
 
-        summary["queries_executed"] += 1
+    if cache:
+        cache.save()
+        summary["cache_hits"] = len(hits)
+        summary["cache_misses"] = len(misses)
 
+    summary["queries_executed"] = len([name for name in queries if name not in hits])
+    summary["mode"] = "incremental" if windows else "full"
+    if PARQUET_EXPORT:
+        summary["parquet_dir"] = analytics_dir()
+    if windows:
+        summary["incremental_window"] = {
+            "trailing": args.trailing,
+            "unit": args.unit,
+            "anchor_date": anchor.isoformat(),
+            "window_start": start.isoformat()
+        }
+    summary["timed_out_queries"] = sorted(
+        name for name, t in timings.items() if t["status"] == "timeout"
+    )
+    summary["failed_queries"] = sorted(
+        name for name, t in timings.items() if t["status"] == "failed"
+    )
     summary["total_execution_time_seconds"] = round(time.time() - total_start, 2)
+    summary["slowest_query_ms"] = max(
+        (t["execution_time_ms"] for t in timings.values()), default=0
+    )
+    summary["sum_execution_time_ms"] = round(
+        sum(t["execution_time_ms"] for t in timings.values()), 2
+    )
+
+    if args.profile:
+        print("➡ Profiling query plans")
+        profiles = run_profiling(queries, update_baseline=args.update_baseline)
+        summary["profiling"] = {
+            "report": "query_profiles.json",
+            "regressed_queries": profiles["regressed_queries"]
+        }
 
     with open(OUTPUT_DIR / "analytics_summary.json", "w") as f:
         json.dump(summary, f, indent=4)
 
-    conn.close()
+    if summary["failed_queries"]:
+        print(f"❌ Analytics failed: {', '.join(summary['failed_queries'])}")
+        sys.exit(1)
+
+    if summary["timed_out_queries"]:
+        print(f"⏱ Analytics timed out: {', '.join(summary['timed_out_queries'])}")
+        sys.exit(TIMEOUT_EXIT_CODE)
+
     print("Analytics generation completed successfully")
 
 
@@ -121,4 +636,5 @@ def main():
 # ENTRY POINT
 # --------------------------------------------------
 if __name__ == "__main__":
-    main()
+    with step_metrics("analytics_generation"):
+        main()
@@ -0,0 +1,127 @@
+import hashlib
+import math
+
+import numpy as np
+
+# --------------------------------------------------
+# HYPERLOGLOG SKETCHES
+# --------------------------------------------------
+# Mergeable distinct-count sketches stored next to the daily aggregates.
+# A sketch with precision p keeps m = 2^p one-byte registers; the
+# relative standard error of count() is 1.04 / sqrt(m)
+# (p=12: 4 KB, ~1.6%; p=14: 16 KB, ~0.8%).
+#
+# Adding the same value twice is a no-op and merge() is a register-wise
+# max, so sketches can be updated from a delta and unioned over any set
+# of days/segments without touching the facts again.
+
+DEFAULT_PRECISION = 12
+SERIAL_VERSION = 1
+
+
+def hash64(values):
+    return np.fromiter(
+        (
+            int.from_bytes(
+                hashlib.blake2b(str(v).encode("utf-8"), digest_size=8).digest(),
+                "big"
+            )
+            for v in values
+        ),
+        dtype=np.uint64
+    )
+
+
+def leading_zeros64(x):
+    # Branch-free count of leading zeros for a uint64 array
+    x = x.copy()
+    n = np.zeros(x.shape, dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        top_empty = (x >> np.uint64(64 - shift)) == 0
+        n[top_empty] += shift
+        x[top_empty] <<= np.uint64(shift)
+    n[x == 0] += 1
+    return n
+
+
+class HyperLogLog:
+    def __init__(self, precision=DEFAULT_PRECISION, registers=None):
+        if not 4 <= precision <= 18:
+            raise ValueError(f"HLL precision must be between 4 and 18, got {precision}")
+
+        self.precision = precision
+        self.m = 1 << precision
+
+        if registers is None:
+            registers = np.zeros(self.m, dtype=np.uint8)
+        elif len(registers) != self.m:
+            raise ValueError(f"Expected {self.m} registers, got {len(registers)}")
+
+        self.registers = registers
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(self.m)
+
+    def update(self, values):
+        hashes = hash64(values)
+        if not len(hashes):
+            return self
+
+        p = np.uint64(self.precision)
+        index = (hashes >> (np.uint64(64) - p)).astype(np.int64)
+        rank = np.minimum(
+            leading_zeros64(hashes << p) + 1,
+            64 - self.precision + 1
+        ).astype(np.uint8)
+
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def add(self, value):
+        return self.update([value])
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError(
+                f"Cannot merge HLL sketches of precision {self.precision} and {other.precision}"
+            )
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int32)))
+
+        # Small-range correction (linear counting). With a 64-bit hash
+        # the large-range correction of the original paper is not needed.
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+
+        return int(round(estimate))
+
+    def to_bytes(self):
+        return bytes([SERIAL_VERSION, self.precision]) + self.registers.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        data = bytes(data)
+        if len(data) < 2 or data[0] != SERIAL_VERSION:
+            raise ValueError("Unsupported HLL serialization")
+
+        registers = np.frombuffer(data, dtype=np.uint8, offset=2).copy()
+        return cls(precision=data[1], registers=registers)
+
+
+def merge_all(sketches, precision=DEFAULT_PRECISION):
+    """Union of serialized or in-memory sketches; None entries are skipped."""
+    result = HyperLogLog(precision)
+    for sketch in sketches:
+        if sketch is None:
+            continue
+        if not isinstance(sketch, HyperLogLog):
+            sketch = HyperLogLog.from_bytes(sketch)
+        result.merge(sketch)
+    return result
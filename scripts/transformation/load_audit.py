@@ -0,0 +1,49 @@
+import os
+from datetime import datetime
+
+from pipeline_metrics import REGISTRY
+
+# --------------------------------------------------
+# LOAD AUDIT
+# --------------------------------------------------
+# Loaders call record_load() in the transaction that writes their rows,
+# so an audit.load_audit entry exists exactly when the rows are
+# committed. loaded_at / created_at default to the transaction's NOW(),
+# which makes NOW() the table's newest timestamp whenever rows were
+# added; a load that added none carries the previous max_timestamp.
+#
+# The orchestrator exports PIPELINE_ID to every step, so all entries of
+# one pipeline run share a batch ID; standalone runs get their own.
+BATCH_ID = os.environ.get("PIPELINE_ID") or f"MANUAL_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+RECORD_LOAD_SQL = """
+    INSERT INTO audit.load_audit (layer, table_name, batch_id, max_timestamp, row_count)
+    SELECT
+        %(layer)s,
+        %(table)s,
+        %(batch_id)s,
+        CASE
+            WHEN %(row_count)s > 0 THEN NOW()
+            ELSE (
+                SELECT max_timestamp
+                FROM audit.load_audit
+                WHERE layer = %(layer)s
+                  AND table_name = %(table)s
+                ORDER BY audit_id DESC
+                LIMIT 1
+            )
+        END,
+        %(row_count)s
+"""
+
+
+def record_load(cur, layer, table, row_count, batch_id=BATCH_ID):
+    """Audit row_count rows loaded into layer.table by the current transaction."""
+    row_count = int(row_count or 0)
+    cur.execute(RECORD_LOAD_SQL, {
+        "layer": layer,
+        "table": table,
+        "batch_id": batch_id,
+        "row_count": row_count
+    })
+    REGISTRY.inc("pipeline_rows_processed_total", row_count, layer=layer, table=table)
@@ -1,17 +1,44 @@
 import os
+import csv
+import sys
+import json
 import psycopg2
 import yaml
-from datetime import date, timedelta
+from datetime import datetime, timedelta
+
+from hll import merge_all
+from load_audit import record_load
+from pipeline_metrics import TimedCursor, step_metrics
+from table_dag import TIMEOUT_EXIT_CODE, DagTimeout, get_pool, run_dag
+from volume_baselines import DEFAULT_ALPHA, Baseline
 
 # --------------------------------------------------
 # CONFIG
 # --------------------------------------------------
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+REPORT_DIR = os.path.join(BASE_DIR, "data", "transform_reports")
+os.makedirs(REPORT_DIR, exist_ok=True)
 
 with open(os.path.join(BASE_DIR, "config", "config.yaml")) as f:
     config = yaml.safe_load(f)
 
 db = config["database"]
+PARALLEL_WORKERS = int(config.get("pipeline", {}).get("parallel_workers", 4))
+STEP_TIMEOUT_SECONDS = config.get("pipeline", {}).get("step_timeout_seconds")
+warehouse_cfg = config.get("warehouse", {})
+
+CALENDAR_HORIZON_DAYS = int(warehouse_cfg.get("calendar_horizon_days", 365))
+HOLIDAY_CALENDAR = os.path.join(
+    BASE_DIR, warehouse_cfg.get("holiday_calendar", "config/holidays.csv")
+)
+# incremental: only production rows past the stored watermark
+# reconcile:   anti-join against all of fact_sales (full reconciliation)
+FACT_LOAD_MODE = warehouse_cfg.get("fact_load_mode", "incremental")
+# Incremental loads re-read this far behind the watermark (see FACT WATERMARK)
+WATERMARK_OVERLAP = timedelta(seconds=int(warehouse_cfg.get("watermark_overlap_seconds", 300)))
+HLL_PRECISION = warehouse_cfg.get("hll_precision", 12)
+RFM_REFRESH_DAYS = warehouse_cfg.get("rfm_boundary_refresh_days", 7)
+VOLUME_EWMA_ALPHA = config.get("monitoring", {}).get("volume_ewma_alpha", DEFAULT_ALPHA)
 
 def get_connection():
     return psycopg2.connect(
@@ -19,39 +46,75 @@ def get_connection():
         port=db["port"],
         dbname=db["name"],
         user=db["user"],
-        password=db["password"]
+        password=db["password"],
+        cursor_factory=TimedCursor
     )
 
 # --------------------------------------------------
 # DIM DATE
 # --------------------------------------------------
-def load_dim_date(cur):
-    print("➡ Loading dim_date")
+def load_holidays():
+    if not os.path.exists(HOLIDAY_CALENDAR):
+        print(f"⚠ Holiday calendar not found at {HOLIDAY_CALENDAR}")
+        return []
 
-    cur.execute("DELETE FROM warehouse.dim_date")
+    with open(HOLIDAY_CALENDAR, newline="") as f:
+        return [row["date"] for row in csv.DictReader(f)]
 
-    start = date(2024, 1, 1)
-    end = date(2024, 12, 31)
+def load_dim_date(cur):
+    print("➡ Loading dim_date (incremental calendar)")
 
-    d = start
-    while d <= end:
-        cur.execute("""
-            INSERT INTO warehouse.dim_date (
-                date_key,
-                date,
-                year,
-                month,
-                week
-            )
-            VALUES (%s, %s, %s, %s, %s)
-        """, (
-            int(d.strftime("%Y%m%d")),
+    # One statement: every day from the first fact date to the last fact
+    # date plus the horizon. Existing days are kept; only holiday flags
+    # that changed in the calendar file are rewritten.
+    cur.execute("""
+        WITH bounds AS (
+            SELECT
+                MIN(transaction_date) AS start_date,
+                MAX(transaction_date) + %(horizon)s AS end_date
+            FROM production.transactions
+        ),
+        days AS (
+            SELECT gs::DATE AS d
+            FROM bounds,
+                 generate_series(bounds.start_date, bounds.end_date, INTERVAL '1 day') gs
+        )
+        INSERT INTO warehouse.dim_date (
+            date_key,
+            full_date,
+            year,
+            quarter,
+            month,
+            day,
+            month_name,
+            day_name,
+            week_of_year,
+            is_weekend,
+            is_holiday
+        )
+        SELECT
+            TO_CHAR(d, 'YYYYMMDD')::INTEGER,
             d,
-            d.year,
-            d.month,
-            int(d.strftime("%W"))
-        ))
-        d += timedelta(days=1)
+            EXTRACT(YEAR FROM d)::INTEGER,
+            EXTRACT(QUARTER FROM d)::INTEGER,
+            EXTRACT(MONTH FROM d)::INTEGER,
+            EXTRACT(DAY FROM d)::INTEGER,
+            TO_CHAR(d, 'FMMonth'),
+            TO_CHAR(d, 'FMDay'),
+            EXTRACT(WEEK FROM d)::INTEGER,
+            EXTRACT(ISODOW FROM d) IN (6, 7),
+            d = ANY(%(holidays)s::DATE[])
+        FROM days
+        ON CONFLICT (date_key) DO UPDATE
+            SET is_holiday = EXCLUDED.is_holiday
+            WHERE warehouse.dim_date.is_holiday IS DISTINCT FROM EXCLUDED.is_holiday
+    """, {
+        "horizon": CALENDAR_HORIZON_DAYS,
+        "holidays": load_holidays()
+    })
+
+    print(f"   dim_date rows added or updated: {cur.rowcount}")
+    record_load(cur, "warehouse", "dim_date", cur.rowcount)
 
 # --------------------------------------------------
 # DIM PAYMENT METHOD
@@ -59,240 +122,1191 @@ def load_dim_date(cur):
 def load_dim_payment_method(cur):
     print("➡ Loading dim_payment_method")
 
-    cur.execute("DELETE FROM warehouse.dim_payment_method")
-
+    # Append-only: facts hold payment_method_key, so existing keys must
+    # survive every run.
     cur.execute("""
         INSERT INTO warehouse.dim_payment_method (
             payment_method_name,
             payment_type
         )
         SELECT DISTINCT
-            payment_method,
+            t.payment_method,
             CASE
-                WHEN payment_method IN ('Credit Card','Debit Card','UPI','Net Banking')
+                WHEN t.payment_method IN ('Credit Card','Debit Card','UPI','Net Banking')
                 THEN 'Online'
                 ELSE 'Offline'
             END
-        FROM production.transactions
+        FROM production.transactions t
+        WHERE NOT EXISTS (
+            SELECT 1
+            FROM warehouse.dim_payment_method d
+            WHERE d.payment_method_name = t.payment_method
+        )
     """)
+    record_load(cur, "warehouse", "dim_payment_method", cur.rowcount)
 
 # --------------------------------------------------
-# DIM CUSTOMERS (SCD TYPE 2)
+# SCD TYPE 2 ENGINE (SET-BASED, HASH COMPARISON)
 # --------------------------------------------------
-def load_dim_customers(cur):
-    print("➡ Loading dim_customers (SCD2)")
+# One statement per dimension: hash the tracked attributes of every
+# source row, expire current rows whose hash changed, and insert a new
+# current version for changed and brand-new keys. The partial unique
+# index on (natural key) WHERE is_current guarantees one current row.
+SCD2_DIMENSIONS = {
+    "dim_customers": {
+        "natural_key": "customer_id",
+        "tracked": [
+            "full_name",
+            "email",
+            "city",
+            "state",
+            "country",
+            "age_group",
+            "registration_date"
+        ],
+        # Not versioned: written on insert only
+        "static": {"customer_segment": "'New'"},
+        "source": """
+            SELECT
+                c.customer_id,
+                c.first_name || ' ' || c.last_name AS full_name,
+                c.email,
+                c.city,
+                c.state,
+                'USA' AS country,
+                'Adult' AS age_group,
+                c.registration_date
+            FROM production.customers c
+        """
+    },
+    "dim_products": {
+        "natural_key": "product_id",
+        "tracked": [
+            "product_name",
+            "category",
+            "sub_category",
+            "brand",
+            "price_range"
+        ],
+        "static": {},
+        "source": """
+            SELECT
+                p.product_id,
+                p.product_name,
+                p.category,
+                p.sub_category,
+                p.brand,
+                CASE
+                    WHEN p.price < 50 THEN 'Budget'
+                    WHEN p.price < 200 THEN 'Mid-range'
+                    ELSE 'Premium'
+                END AS price_range
+            FROM production.products p
+        """
+    }
+}
 
-    cur.execute("""
-        INSERT INTO warehouse.dim_customers (
-            customer_id,
-            full_name,
-            email,
-            city,
-            state,
-            country,
-            age_group,
-            customer_segment,
-            registration_date,
+SCD2_SQL = """
+    WITH src AS (
+        SELECT src.*, MD5(ROW({src_attrs})::TEXT) AS row_hash
+        FROM ({source}) src
+    ),
+    changed AS (
+        SELECT s.*
+        FROM src s
+        LEFT JOIN warehouse.{table} d
+          ON d.{key} = s.{key}
+         AND d.is_current
+        WHERE d.{key} IS NULL
+           OR COALESCE(d.row_hash, MD5(ROW({dim_attrs})::TEXT)) <> s.row_hash
+    ),
+    expired AS (
+        UPDATE warehouse.{table} d
+        SET end_date = CURRENT_DATE,
+            is_current = FALSE
+        FROM changed c
+        WHERE d.{key} = c.{key}
+          AND d.is_current
+        RETURNING 1
+    ),
+    inserted AS (
+        INSERT INTO warehouse.{table} (
+            {key},
+            {columns},
+            row_hash,
             effective_date,
             end_date,
             is_current
         )
         SELECT
-            c.customer_id,
-            c.first_name || ' ' || c.last_name,
-            c.email,
-            c.city,
-            c.state,
-            'USA',
-            'Adult',
-            'New',
-            c.registration_date,
+            {key},
+            {values},
+            row_hash,
             CURRENT_DATE,
             NULL,
             TRUE
-        FROM production.customers c
-        WHERE NOT EXISTS (
-            SELECT 1
-            FROM warehouse.dim_customers d
-            WHERE d.customer_id = c.customer_id
-              AND d.is_current = TRUE
-        )
-    """)
+        FROM changed
+        -- InitPlan: the expiry finishes before any new current row
+        -- reaches the partial unique index
+        WHERE (SELECT COUNT(*) FROM expired) >= 0
+        RETURNING 1
+    )
+    SELECT
+        (SELECT COUNT(*) FROM expired) AS expired,
+        (SELECT COUNT(*) FROM inserted) AS inserted
+"""
+
+def scd2_statement(dimension):
+    spec = SCD2_DIMENSIONS[dimension]
+    tracked = spec["tracked"]
+    static = spec["static"]
+
+    return SCD2_SQL.format(
+        table=dimension,
+        key=spec["natural_key"],
+        source=spec["source"],
+        src_attrs=", ".join(f"src.{col}" for col in tracked),
+        dim_attrs=", ".join(f"d.{col}" for col in tracked),
+        columns=",\n            ".join(tracked + list(static)),
+        values=",\n            ".join(tracked + list(static.values()))
+    )
+
+def apply_scd2(cur, dimension):
+    cur.execute(scd2_statement(dimension))
+    expired, inserted = cur.fetchone()
+    print(f"   {dimension}: {expired} versions expired, {inserted} rows inserted")
+    record_load(cur, "warehouse", dimension, inserted)
+    return {"expired": expired, "inserted": inserted}
+
+# --------------------------------------------------
+# DIM CUSTOMERS (SCD TYPE 2)
+# --------------------------------------------------
+def load_dim_customers(cur):
+    print("➡ Loading dim_customers (SCD2)")
+    return apply_scd2(cur, "dim_customers")
 
 # --------------------------------------------------
 # DIM PRODUCTS (SCD TYPE 2)
 # --------------------------------------------------
 def load_dim_products(cur):
     print("➡ Loading dim_products (SCD2)")
+    return apply_scd2(cur, "dim_products")
 
-    cur.execute("""
-        INSERT INTO warehouse.dim_products (
-            product_id,
-            product_name,
-            category,
-            sub_category,
-            brand,
-            price_range,
-            effective_date,
-            end_date,
-            is_current
-        )
-        SELECT
-            p.product_id,
-            p.product_name,
-            p.category,
-            p.sub_category,
-            p.brand,
-            CASE
-                WHEN p.price < 50 THEN 'Budget'
-                WHEN p.price < 200 THEN 'Mid-range'
-                ELSE 'Premium'
-            END,
-            CURRENT_DATE,
-            NULL,
-            TRUE
-        FROM production.products p
-        WHERE NOT EXISTS (
-            SELECT 1
-            FROM warehouse.dim_products d
-            WHERE d.product_id = p.product_id
-              AND d.is_current = TRUE
-        )
-    """)
+# --------------------------------------------------
+# SURROGATE KEY RESOLUTION
+# --------------------------------------------------
+# Lookup maps are built once per run as indexed temp tables (dropped at
+# commit); fact rows then resolve each key with one hash join per
+# dimension instead of probing the dimension tables row by row.
+KEY_MAPS = {
+    "key_dates": (
+        "full_date",
+        "SELECT full_date, date_key FROM warehouse.dim_date"
+    ),
+    "key_customers": (
+        "customer_id",
+        "SELECT customer_id, customer_key FROM warehouse.dim_customers WHERE is_current"
+    ),
+    "key_products": (
+        "product_id",
+        "SELECT product_id, product_key FROM warehouse.dim_products WHERE is_current"
+    ),
+    "key_payment_methods": (
+        "payment_method_name",
+        "SELECT payment_method_name, payment_method_key FROM warehouse.dim_payment_method"
+    )
+}
+
+def build_key_maps(cur):
+    sizes = {}
+
+    for name, (natural_key, sql) in KEY_MAPS.items():
+        cur.execute(f"DROP TABLE IF EXISTS {name}")
+        cur.execute(f"CREATE TEMP TABLE {name} ON COMMIT DROP AS {sql}")
+        sizes[name] = cur.rowcount
+        cur.execute(f"CREATE UNIQUE INDEX ON {name} ({natural_key})")
+        cur.execute(f"ANALYZE {name}")
+
+    return sizes
 
 # --------------------------------------------------
 # FACT SALES
 # --------------------------------------------------
-def load_fact_sales(cur):
-    print("➡ Loading fact_sales")
-
-    cur.execute("""
-        INSERT INTO warehouse.fact_sales (
-            transaction_id,
-            customer_id,
-            product_id,
-            date,
-            quantity,
-            revenue,
-            cost
-        )
+FACT_SALES_SQL = """
+    WITH resolved AS (
         SELECT
+            ti.item_id,
             t.transaction_id,
-            t.customer_id,
-            ti.product_id,
-            t.transaction_date,
+            kd.date_key,
+            kc.customer_key,
+            kp.product_key,
+            kpm.payment_method_key,
             ti.quantity,
+            ti.unit_price,
+            ROUND(
+                ti.quantity * ti.unit_price * COALESCE(ti.discount_percentage, 0) / 100.0,
+                2
+            ) AS discount_amount,
             ti.line_total,
-            (p.cost * ti.quantity)
+            ti.line_total - (p.cost * ti.quantity) AS profit
         FROM production.transaction_items ti
         JOIN production.transactions t
             ON ti.transaction_id = t.transaction_id
+           AND ti.transaction_date = t.transaction_date
         JOIN production.products p
             ON ti.product_id = p.product_id
-        WHERE NOT EXISTS (
+        LEFT JOIN key_dates kd
+            ON kd.full_date = t.transaction_date
+        LEFT JOIN key_customers kc
+            ON kc.customer_id = t.customer_id
+        LEFT JOIN key_products kp
+            ON kp.product_id = ti.product_id
+        LEFT JOIN key_payment_methods kpm
+            ON kpm.payment_method_name = t.payment_method
+        WHERE {source_filter}
+    ),
+    inserted AS (
+        INSERT INTO warehouse.fact_sales (
+            date_key,
+            customer_key,
+            product_key,
+            payment_method_key,
+            transaction_id,
+            item_id,
+            quantity,
+            unit_price,
+            discount_amount,
+            line_total,
+            profit
+        )
+        SELECT
+            date_key,
+            customer_key,
+            product_key,
+            payment_method_key,
+            transaction_id,
+            item_id,
+            quantity,
+            unit_price,
+            discount_amount,
+            line_total,
+            profit
+        FROM resolved
+        WHERE date_key IS NOT NULL
+          AND customer_key IS NOT NULL
+          AND product_key IS NOT NULL
+          AND payment_method_key IS NOT NULL
+        ON CONFLICT (item_id, date_key) DO NOTHING
+        RETURNING 1
+    )
+    SELECT
+        COUNT(*) AS candidates,
+        (SELECT COUNT(*) FROM inserted) AS inserted,
+        COUNT(*) FILTER (
+            WHERE date_key IS NOT NULL
+              AND customer_key IS NOT NULL
+              AND product_key IS NOT NULL
+              AND payment_method_key IS NOT NULL
+        ) - (SELECT COUNT(*) FROM inserted) AS already_loaded,
+        COUNT(*) FILTER (WHERE date_key IS NULL) AS unresolved_date_key,
+        COUNT(*) FILTER (WHERE customer_key IS NULL) AS unresolved_customer_key,
+        COUNT(*) FILTER (WHERE product_key IS NULL) AS unresolved_product_key,
+        COUNT(*) FILTER (WHERE payment_method_key IS NULL) AS unresolved_payment_method_key
+    FROM resolved
+"""
+
+# --------------------------------------------------
+# FACT WATERMARK
+# --------------------------------------------------
+# production.transaction_items.created_at is the time an item was first
+# loaded into production. staging_to_production.py reloads production in
+# full on every run but carries created_at over from
+# production.item_first_loads, so only new items get a new stamp and the
+# watermark keeps advancing across production loads.
+#
+# A new item is stamped with the writing transaction's NOW(), i.e. its
+# start time, not its commit time. A load still open when we read
+# MAX(created_at) can later commit rows stamped below it. The high
+# watermark is therefore capped just below the start of the oldest open
+# transaction that holds a write lock on transaction_items (or one of
+# its partitions): every row stamped before that is already committed
+# and visible to the load statement. Readers and unrelated idle sessions
+# do not hold the watermark back. Sessions of other roles hide their
+# xact_start from non-superusers, so incremental loads also re-read
+# WATERMARK_OVERLAP behind the stored watermark. Re-read rows hit
+# ON CONFLICT (item_id, date_key) DO NOTHING and are reported as
+# already_loaded. reconcile mode ignores the watermark and anti-joins
+# every production item against fact_sales.
+HIGH_WATERMARK_SQL = """
+    SELECT LEAST(
+        (SELECT MAX(created_at) FROM production.transaction_items),
+        (
+            SELECT MIN(a.xact_start)::TIMESTAMP - INTERVAL '1 microsecond'
+            FROM pg_stat_activity a
+            WHERE a.datname = CURRENT_DATABASE()
+              AND a.pid <> pg_backend_pid()
+              AND a.xact_start IS NOT NULL
+              AND EXISTS (
+                  SELECT 1
+                  FROM pg_locks l
+                  JOIN pg_class c ON c.oid = l.relation
+                  JOIN pg_namespace n ON n.oid = c.relnamespace
+                  WHERE l.pid = a.pid
+                    AND l.database = (
+                        SELECT oid FROM pg_database WHERE datname = CURRENT_DATABASE()
+                    )
+                    AND n.nspname = 'production'
+                    AND c.relname LIKE 'transaction\\_items%'
+                    AND l.mode <> 'AccessShareLock'
+              )
+        )
+    )
+"""
+
+FACT_SOURCE_FILTERS = {
+    "incremental": """
+        ti.created_at > %(watermark)s - %(overlap)s
+        AND ti.created_at <= %(high_watermark)s
+    """,
+    "reconcile": """
+        NOT EXISTS (
             SELECT 1
             FROM warehouse.fact_sales f
-            WHERE f.transaction_id = t.transaction_id
-              AND f.product_id = ti.product_id
+            WHERE f.item_id = ti.item_id
+              AND f.date_key = kd.date_key
         )
-    """)
+    """
+}
 
 # --------------------------------------------------
-# AGGREGATES (ALL FIXED)
+# FACT PARTITIONS
 # --------------------------------------------------
-def load_aggregates(cur):
-    print("➡ Loading aggregates")
+def next_month(month_start):
+    if month_start.month == 12:
+        return month_start.replace(year=month_start.year + 1, month=1)
+    return month_start.replace(month=month_start.month + 1)
+
+def month_key(month_start):
+    return int(month_start.strftime("%Y%m%d"))
 
-    # DAILY SALES
-    cur.execute("DELETE FROM warehouse.agg_daily_sales")
+def ensure_fact_partitions(cur, watermark, high_watermark):
+    """Create the monthly fact_sales partitions the incoming rows need."""
     cur.execute("""
-        INSERT INTO warehouse.agg_daily_sales (
-            date_key,
-            total_transactions,
-            total_revenue,
-            total_profit,
-            unique_customers
+        SELECT 1
+        FROM pg_partitioned_table pt
+        JOIN pg_class c ON c.oid = pt.partrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'warehouse'
+          AND c.relname = 'fact_sales'
+    """)
+    if not cur.fetchone():
+        # The BRIN indexes and per-month pruning assume partitions;
+        # create_warehouse_schema.sql migrates an existing heap table
+        raise RuntimeError(
+            "warehouse.fact_sales is not partitioned; "
+            "apply sql/ddl/create_warehouse_schema.sql to migrate it"
         )
-        SELECT
-            TO_CHAR(date, 'YYYYMMDD')::INTEGER,
-            COUNT(DISTINCT transaction_id),
-            SUM(revenue),
-            SUM(revenue - cost),
-            COUNT(DISTINCT customer_id)
-        FROM warehouse.fact_sales
-        GROUP BY date
+
+    cur.execute("""
+        SELECT child.relname
+        FROM pg_inherits i
+        JOIN pg_class child ON child.oid = i.inhrelid
+        WHERE i.inhparent = 'warehouse.fact_sales'::REGCLASS
     """)
+    existing = {row[0] for row in cur.fetchall()}
 
-    
+    window = (
+        "WHERE created_at > %(watermark)s - %(overlap)s AND created_at <= %(high_watermark)s"
+        if FACT_LOAD_MODE == "incremental" else ""
+    )
+    cur.execute(
+        f"""
+        SELECT DISTINCT DATE_TRUNC('month', transaction_date)::DATE
+        FROM production.transaction_items
+        {window}
+        ORDER BY 1
+        """,
+        {"watermark": watermark, "high_watermark": high_watermark, "overlap": WATERMARK_OVERLAP}
+    )
+    months = [row[0] for row in cur.fetchall()]
 
-        # PRODUCT PERFORMANCE (SUBQUERY FIX)
-    # PRODUCT PERFORMANCE (ROW_NUMBER FIX)
-    cur.execute("DELETE FROM warehouse.agg_product_performance")
+    targets, created = [], []
+    for month_start in months:
+        partition = f"fact_sales_{month_start.strftime('%Y_%m')}"
+        targets.append(partition)
+        if partition in existing:
+            continue
+
+        cur.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS warehouse.{partition}
+            PARTITION OF warehouse.fact_sales
+            FOR VALUES FROM (%s) TO (%s)
+            """,
+            (month_key(month_start), month_key(next_month(month_start)))
+        )
+        created.append(partition)
+
+    if created:
+        print(f"➡ Created {len(created)} fact_sales partitions: {', '.join(created)}")
+
+    return targets, created
+
+# --------------------------------------------------
+# LOAD WATERMARKS
+# --------------------------------------------------
+def get_watermark(cur, table):
     cur.execute("""
-        INSERT INTO warehouse.agg_product_performance (
-            product_key,
-            total_quantity_sold,
-            total_revenue,
-            total_profit,
-            avg_discount_percentage
+        SELECT watermark_ts
+        FROM warehouse.load_watermarks
+        WHERE table_name = %s
+    """, (table,))
+    row = cur.fetchone()
+    return row[0] if row and row[0] else datetime.min
+
+def save_watermark(cur, table, watermark_ts, rows_loaded):
+    cur.execute("""
+        INSERT INTO warehouse.load_watermarks (
+            table_name, watermark_ts, rows_loaded, updated_at
         )
-        SELECT
-            ROW_NUMBER() OVER (ORDER BY product_id) AS product_key,
-            SUM(quantity),
-            SUM(revenue),
-            SUM(revenue - cost),
+        VALUES (%s, %s, %s, NOW())
+        ON CONFLICT (table_name) DO UPDATE SET
+            watermark_ts = EXCLUDED.watermark_ts,
+            rows_loaded = EXCLUDED.rows_loaded,
+            updated_at = EXCLUDED.updated_at
+    """, (table, watermark_ts, rows_loaded))
+
+def load_fact_sales(cur):
+    print(f"➡ Loading fact_sales ({FACT_LOAD_MODE})")
+
+    if FACT_LOAD_MODE not in FACT_SOURCE_FILTERS:
+        raise ValueError(f"Unknown warehouse.fact_load_mode: {FACT_LOAD_MODE!r}")
+
+    watermark = get_watermark(cur, "fact_sales")
+
+    # Fix the upper bound first so rows committed while we load are
+    # picked up by the next run instead of being skipped.
+    cur.execute(HIGH_WATERMARK_SQL)
+    high_watermark = cur.fetchone()[0] or watermark
+
+    target_partitions, partitions_created = ensure_fact_partitions(
+        cur, watermark, high_watermark
+    )
+    key_map_sizes = build_key_maps(cur)
+
+    cur.execute(
+        FACT_SALES_SQL.format(source_filter=FACT_SOURCE_FILTERS[FACT_LOAD_MODE]),
+        {"watermark": watermark, "high_watermark": high_watermark, "overlap": WATERMARK_OVERLAP}
+    )
+    columns = [col[0] for col in cur.description]
+    stats = dict(zip(columns, cur.fetchone()))
+
+    # Same transaction as the insert: facts and watermark move together
+    save_watermark(cur, "fact_sales", max(watermark, high_watermark), stats["inserted"])
+    record_load(cur, "warehouse", "fact_sales", stats["inserted"])
+
+    unresolved = {k: v for k, v in stats.items() if k.startswith("unresolved_")}
+    if any(unresolved.values()):
+        print(f"⚠ fact_sales rows skipped with unresolved keys: {unresolved}")
+
+    print(f"   fact_sales rows inserted: {stats['inserted']}")
+    return {
+        **stats,
+        "mode": FACT_LOAD_MODE,
+        "watermark_from": None if watermark == datetime.min else watermark.isoformat(),
+        "watermark_to": None if high_watermark == datetime.min else high_watermark.isoformat(),
+        "target_partitions": target_partitions,
+        "partitions_created": partitions_created,
+        "key_map_sizes": key_map_sizes
+    }
+
+# --------------------------------------------------
+# AGGREGATES (ALL FIXED)
+# --------------------------------------------------
+# Aggregates are maintained from the facts inserted since the last
+# aggregate run (fact_sales.created_at past the "aggregates" watermark).
+# Sums are added to the existing rows; distinct counts only count
+# transactions/customers that were not already in older facts, so every
+# statement touches the delta plus index lookups, never all of fact_sales.
+AGG_DELTA_SQL = """
+    CREATE TEMP TABLE agg_delta ON COMMIT DROP AS
+    SELECT
+        date_key,
+        customer_key,
+        product_key,
+        payment_method_key,
+        transaction_id,
+        item_id,
+        quantity,
+        unit_price,
+        discount_amount,
+        line_total,
+        profit
+    FROM warehouse.fact_sales
+    WHERE created_at > %(watermark)s
+      AND created_at <= %(high_watermark)s
+"""
+
+AGG_DAILY_SALES_SQL = """
+    INSERT INTO warehouse.agg_daily_sales (
+        date_key,
+        total_transactions,
+        total_revenue,
+        total_profit,
+        unique_customers,
+        total_quantity,
+        line_count
+    )
+    SELECT
+        d.date_key,
+        COUNT(DISTINCT d.transaction_id) FILTER (
+            WHERE NOT EXISTS (
+                SELECT 1 FROM warehouse.fact_sales f
+                WHERE f.transaction_id = d.transaction_id
+                  AND f.date_key = d.date_key
+                  AND f.created_at <= %(watermark)s
+            )
+        ),
+        SUM(d.line_total),
+        SUM(d.profit),
+        COUNT(DISTINCT d.customer_key) FILTER (
+            WHERE NOT EXISTS (
+                SELECT 1 FROM warehouse.fact_sales f
+                WHERE f.customer_key = d.customer_key
+                  AND f.date_key = d.date_key
+                  AND f.created_at <= %(watermark)s
+            )
+        ),
+        SUM(d.quantity),
+        COUNT(*)
+    FROM agg_delta d
+    GROUP BY d.date_key
+    ON CONFLICT (date_key) DO UPDATE SET
+        total_transactions = agg_daily_sales.total_transactions + EXCLUDED.total_transactions,
+        total_revenue = agg_daily_sales.total_revenue + EXCLUDED.total_revenue,
+        total_profit = agg_daily_sales.total_profit + EXCLUDED.total_profit,
+        unique_customers = agg_daily_sales.unique_customers + EXCLUDED.unique_customers,
+        total_quantity = agg_daily_sales.total_quantity + EXCLUDED.total_quantity,
+        line_count = agg_daily_sales.line_count + EXCLUDED.line_count
+"""
+
+AGG_PRODUCT_PERFORMANCE_SQL = """
+    INSERT INTO warehouse.agg_product_performance (
+        product_key,
+        total_quantity_sold,
+        total_revenue,
+        total_profit,
+        total_discount_amount,
+        avg_discount_percentage
+    )
+    SELECT
+        product_key,
+        SUM(quantity),
+        SUM(line_total),
+        SUM(profit),
+        SUM(discount_amount),
+        COALESCE(
+            ROUND(100 * SUM(discount_amount) / NULLIF(SUM(line_total) + SUM(discount_amount), 0), 2),
             0
-        FROM warehouse.fact_sales
-        GROUP BY product_id
+        )
+    FROM agg_delta
+    GROUP BY product_key
+    ON CONFLICT (product_key) DO UPDATE SET
+        total_quantity_sold = agg_product_performance.total_quantity_sold + EXCLUDED.total_quantity_sold,
+        total_revenue = agg_product_performance.total_revenue + EXCLUDED.total_revenue,
+        total_profit = agg_product_performance.total_profit + EXCLUDED.total_profit,
+        total_discount_amount = agg_product_performance.total_discount_amount + EXCLUDED.total_discount_amount,
+        avg_discount_percentage = COALESCE(ROUND(
+            100 * (agg_product_performance.total_discount_amount + EXCLUDED.total_discount_amount)
+            / NULLIF(
+                agg_product_performance.total_revenue + EXCLUDED.total_revenue
+                + agg_product_performance.total_discount_amount + EXCLUDED.total_discount_amount,
+                0
+            ),
+            2
+        ), 0)
+"""
+
+AGG_CUSTOMER_METRICS_SQL = """
+    INSERT INTO warehouse.agg_customer_metrics (
+        customer_key,
+        total_transactions,
+        total_spent,
+        avg_order_value,
+        last_purchase_date
+    )
+    SELECT
+        d.customer_key,
+        COUNT(DISTINCT d.transaction_id) FILTER (
+            WHERE NOT EXISTS (
+                SELECT 1 FROM warehouse.fact_sales f
+                WHERE f.transaction_id = d.transaction_id
+                  AND f.date_key = d.date_key
+                  AND f.created_at <= %(watermark)s
+            )
+        ) AS new_transactions,
+        SUM(d.line_total),
+        ROUND(SUM(d.line_total) / NULLIF(COUNT(DISTINCT d.transaction_id), 0), 2),
+        TO_DATE(MAX(d.date_key)::TEXT, 'YYYYMMDD')
+    FROM agg_delta d
+    GROUP BY d.customer_key
+    ON CONFLICT (customer_key) DO UPDATE SET
+        total_transactions = agg_customer_metrics.total_transactions + EXCLUDED.total_transactions,
+        total_spent = agg_customer_metrics.total_spent + EXCLUDED.total_spent,
+        avg_order_value = ROUND(
+            (agg_customer_metrics.total_spent + EXCLUDED.total_spent)
+            / NULLIF(agg_customer_metrics.total_transactions + EXCLUDED.total_transactions, 0),
+            2
+        ),
+        last_purchase_date = GREATEST(
+            agg_customer_metrics.last_purchase_date, EXCLUDED.last_purchase_date
+        )
+"""
+
+# Sales cube at (month, category, state, payment method, product) grain.
+# Revenue/profit/quantity/lines are plain sums. A transaction spans
+# several products, so transaction_count credits each new transaction
+# to exactly one cell (the one holding its lowest item_id); summing it is
+# exact for any grouping that does not split by product or category.
+AGG_SALES_CUBE_SQL = """
+    INSERT INTO warehouse.agg_sales_cube (
+        month_key,
+        product_key,
+        state,
+        payment_method_key,
+        category,
+        total_revenue,
+        total_profit,
+        total_quantity,
+        line_count,
+        transaction_count
+    )
+    SELECT
+        d.date_key / 100,
+        d.product_key,
+        COALESCE(c.state, 'Unknown'),
+        d.payment_method_key,
+        p.category,
+        SUM(d.line_total),
+        SUM(d.profit),
+        SUM(d.quantity),
+        COUNT(*),
+        COUNT(*) FILTER (WHERE d.opens_transaction)
+    FROM (
+        SELECT
+            d.*,
+            d.item_id = MIN(d.item_id) OVER (PARTITION BY d.transaction_id)
+            AND NOT EXISTS (
+                SELECT 1 FROM warehouse.fact_sales f
+                WHERE f.transaction_id = d.transaction_id
+                  AND f.date_key = d.date_key
+                  AND f.created_at <= %(watermark)s
+            ) AS opens_transaction
+        FROM agg_delta d
+    ) d
+    JOIN warehouse.dim_products p
+        ON d.product_key = p.product_key
+    JOIN warehouse.dim_customers c
+        ON d.customer_key = c.customer_key
+    GROUP BY 1, 2, 3, 4, 5
+    ON CONFLICT (month_key, product_key, state, payment_method_key) DO UPDATE SET
+        total_revenue = agg_sales_cube.total_revenue + EXCLUDED.total_revenue,
+        total_profit = agg_sales_cube.total_profit + EXCLUDED.total_profit,
+        total_quantity = agg_sales_cube.total_quantity + EXCLUDED.total_quantity,
+        line_count = agg_sales_cube.line_count + EXCLUDED.line_count,
+        transaction_count = agg_sales_cube.transaction_count + EXCLUDED.transaction_count
+"""
+
+# Per-customer RFM inputs, keyed by the natural customer_id so every SCD2
+# version of a customer feeds one row. updated_at = NOW() marks the rows
+# touched by this transaction for rescoring.
+AGG_CUSTOMER_RFM_SQL = """
+    INSERT INTO warehouse.customer_rfm (
+        customer_id,
+        last_purchase_date,
+        frequency,
+        monetary,
+        updated_at
+    )
+    SELECT
+        c.customer_id,
+        TO_DATE(MAX(d.date_key)::TEXT, 'YYYYMMDD'),
+        COUNT(DISTINCT d.transaction_id) FILTER (
+            WHERE NOT EXISTS (
+                SELECT 1 FROM warehouse.fact_sales f
+                WHERE f.transaction_id = d.transaction_id
+                  AND f.date_key = d.date_key
+                  AND f.created_at <= %(watermark)s
+            )
+        ),
+        SUM(d.line_total),
+        NOW()
+    FROM agg_delta d
+    JOIN warehouse.dim_customers c
+        ON d.customer_key = c.customer_key
+    GROUP BY c.customer_id
+    ON CONFLICT (customer_id) DO UPDATE SET
+        last_purchase_date = GREATEST(
+            customer_rfm.last_purchase_date, EXCLUDED.last_purchase_date
+        ),
+        frequency = customer_rfm.frequency + EXCLUDED.frequency,
+        monetary = customer_rfm.monetary + EXCLUDED.monetary,
+        updated_at = EXCLUDED.updated_at
+"""
+
+AGGREGATE_TABLES = {
+    "agg_daily_sales": AGG_DAILY_SALES_SQL,
+    "agg_product_performance": AGG_PRODUCT_PERFORMANCE_SQL,
+    "agg_customer_metrics": AGG_CUSTOMER_METRICS_SQL,
+    "agg_sales_cube": AGG_SALES_CUBE_SQL,
+    "customer_rfm": AGG_CUSTOMER_RFM_SQL
+}
+
+# --------------------------------------------------
+# RFM SEGMENTS
+# --------------------------------------------------
+# Quintile boundaries per metric are recomputed over all customers every
+# RFM_REFRESH_DAYS (one pass over customer_rfm, not the facts). Between
+# refreshes only customers with new facts are rescored against the
+# stored boundaries. Recency is scored on last_purchase_date itself so
+# scores do not drift just because time passes.
+RFM_METRICS = {
+    "recency": "(last_purchase_date - DATE '1970-01-01')",
+    "frequency": "frequency",
+    "monetary": "monetary"
+}
+
+RFM_SCORE_SQL = """
+    UPDATE warehouse.customer_rfm r
+    SET r_score = 1 + (
+            SELECT COUNT(*) FROM warehouse.rfm_boundaries b
+            WHERE b.metric = 'recency'
+              AND (r.last_purchase_date - DATE '1970-01-01') > b.upper_bound
+        ),
+        f_score = 1 + (
+            SELECT COUNT(*) FROM warehouse.rfm_boundaries b
+            WHERE b.metric = 'frequency' AND r.frequency > b.upper_bound
+        ),
+        m_score = 1 + (
+            SELECT COUNT(*) FROM warehouse.rfm_boundaries b
+            WHERE b.metric = 'monetary' AND r.monetary > b.upper_bound
+        )
+    {where}
+"""
+
+RFM_SEGMENT_SQL = """
+    UPDATE warehouse.customer_rfm r
+    SET rfm_segment = CASE
+        WHEN r_score >= 4 AND f_score >= 4 AND m_score >= 4 THEN 'Champions'
+        WHEN r_score >= 3 AND f_score >= 3 THEN 'Loyal'
+        WHEN r_score >= 4 AND f_score <= 2 THEN 'New'
+        WHEN r_score <= 2 AND f_score >= 3 THEN 'At Risk'
+        WHEN r_score <= 1 THEN 'Lost'
+        ELSE 'Need Attention'
+    END
+    {where}
+"""
+
+def rfm_boundaries_stale(cur):
+    cur.execute("SELECT MAX(computed_at) FROM warehouse.rfm_boundaries")
+    computed_at = cur.fetchone()[0]
+    return computed_at is None or (datetime.now() - computed_at).days >= RFM_REFRESH_DAYS
+
+def refresh_rfm_boundaries(cur):
+    cur.execute("DELETE FROM warehouse.rfm_boundaries")
+    for metric, expr in RFM_METRICS.items():
+        cur.execute(f"""
+            INSERT INTO warehouse.rfm_boundaries (metric, quintile, upper_bound, computed_at)
+            SELECT %s, q.quintile, q.upper_bound, NOW()
+            FROM (
+                SELECT PERCENTILE_CONT(ARRAY[0.2, 0.4, 0.6, 0.8])
+                    WITHIN GROUP (ORDER BY {expr}) AS bounds
+                FROM warehouse.customer_rfm
+            ) p,
+            UNNEST(p.bounds) WITH ORDINALITY AS q(upper_bound, quintile)
+            WHERE p.bounds IS NOT NULL
+        """, (metric,))
+
+def update_rfm_segments(cur, force_refresh=False):
+    refreshed = force_refresh or rfm_boundaries_stale(cur)
+    if refreshed:
+        refresh_rfm_boundaries(cur)
+
+    # All customers after a boundary refresh, otherwise only this run's
+    # upserts (NOW() is fixed for the transaction)
+    where = "" if refreshed else "WHERE r.updated_at = NOW()"
+    cur.execute(RFM_SCORE_SQL.format(where=where))
+    rescored = cur.rowcount
+    cur.execute(RFM_SEGMENT_SQL.format(where=where))
+
+    # customer_segment is not SCD2-tracked, so this never opens a version
+    cur.execute(f"""
+        UPDATE warehouse.dim_customers d
+        SET customer_segment = r.rfm_segment
+        FROM warehouse.customer_rfm r
+        WHERE d.customer_id = r.customer_id
+          AND d.is_current
+          AND d.customer_segment IS DISTINCT FROM r.rfm_segment
+          {"" if refreshed else "AND r.updated_at = NOW()"}
     """)
 
+    return {"boundaries_refreshed": refreshed, "customers_rescored": rescored}
 
-    # CUSTOMER METRICS (ROW_NUMBER FIX)
-    cur.execute("DELETE FROM warehouse.agg_customer_metrics")
+# --------------------------------------------------
+# DISTINCT-COUNT SKETCHES
+# --------------------------------------------------
+def update_daily_sketches(cur):
+    """Fold the delta's customers/transactions into the per-day HLL sketches."""
     cur.execute("""
-        INSERT INTO warehouse.agg_customer_metrics (
-            customer_key,
-            total_transactions,
-            total_spent,
-            avg_order_value,
-            last_purchase_date
+        SELECT d.date_key, c.customer_segment, c.customer_id, d.transaction_id
+        FROM agg_delta d
+        JOIN warehouse.dim_customers c
+            ON d.customer_key = c.customer_key
+    """)
+
+    delta = {}
+    for date_key, segment, customer_id, transaction_id in cur.fetchall():
+        day = delta.setdefault(date_key, {"customers": set(), "transactions": set(), "segments": {}})
+        day["customers"].add(customer_id)
+        day["transactions"].add(transaction_id)
+        day["segments"].setdefault(segment or "Unknown", set()).add(customer_id)
+
+    if not delta:
+        return 0
+
+    cur.execute("""
+        SELECT date_key, customers_hll, transactions_hll
+        FROM warehouse.agg_daily_sales
+        WHERE date_key = ANY(%s)
+    """, (list(delta),))
+    existing = {row[0]: row[1:] for row in cur.fetchall()}
+
+    cur.execute("""
+        SELECT date_key, customer_segment, customers_hll
+        FROM warehouse.agg_daily_segment_customers
+        WHERE date_key = ANY(%s)
+    """, (list(delta),))
+    existing_segments = {(row[0], row[1]): row[2] for row in cur.fetchall()}
+
+    for date_key, day in delta.items():
+        customers_hll, transactions_hll = existing.get(date_key, (None, None))
+        customers = merge_all([customers_hll], HLL_PRECISION).update(day["customers"])
+        transactions = merge_all([transactions_hll], HLL_PRECISION).update(day["transactions"])
+
+        cur.execute("""
+            UPDATE warehouse.agg_daily_sales
+            SET customers_hll = %s,
+                transactions_hll = %s
+            WHERE date_key = %s
+        """, (
+            psycopg2.Binary(customers.to_bytes()),
+            psycopg2.Binary(transactions.to_bytes()),
+            date_key
+        ))
+
+        for segment, segment_customers in day["segments"].items():
+            sketch = merge_all(
+                [existing_segments.get((date_key, segment))], HLL_PRECISION
+            ).update(segment_customers)
+
+            cur.execute("""
+                INSERT INTO warehouse.agg_daily_segment_customers (
+                    date_key, customer_segment, customers_hll
+                )
+                VALUES (%s, %s, %s)
+                ON CONFLICT (date_key, customer_segment) DO UPDATE SET
+                    customers_hll = EXCLUDED.customers_hll
+            """, (date_key, segment, psycopg2.Binary(sketch.to_bytes())))
+
+    return len(delta)
+
+# --------------------------------------------------
+# DAILY VOLUME METRICS
+# --------------------------------------------------
+# audit.daily_volume_metrics counts fact rows per sale date overall, per
+# category and per payment method; the delta's rows are added to the
+# days they fall on. Closed days (every day before the newest one, which
+# later loads may still add to) are then folded once, in date order,
+# into the weekday baselines; the "volume_baselines" watermark holds the
+# last folded day. Both steps touch only the delta and the new days.
+# A warehouse loaded before the metrics existed is backfilled once from
+# the facts the aggregates already cover.
+VOLUME_METRICS_SQL = """
+    INSERT INTO audit.daily_volume_metrics (dimension, member, metric_date, row_count)
+    SELECT
+        v.dimension,
+        v.member,
+        d.full_date,
+        COUNT(*)
+    FROM {source} f
+    JOIN warehouse.dim_date d
+        ON f.date_key = d.date_key
+    JOIN warehouse.dim_products p
+        ON f.product_key = p.product_key
+    JOIN warehouse.dim_payment_method pm
+        ON f.payment_method_key = pm.payment_method_key
+    CROSS JOIN LATERAL (
+        VALUES
+            ('table', 'fact_sales'),
+            ('category', p.category),
+            ('payment_method', pm.payment_method_name)
+    ) AS v(dimension, member)
+    GROUP BY v.dimension, v.member, d.full_date
+    ON CONFLICT (dimension, member, metric_date) DO UPDATE SET
+        row_count = audit.daily_volume_metrics.row_count + EXCLUDED.row_count,
+        updated_at = NOW()
+"""
+
+# Days without rows count as zero for every series seen so far
+CLOSED_DAYS_SQL = """
+    SELECT g.day::DATE, s.dimension, s.member, COALESCE(m.row_count, 0)
+    FROM generate_series(%(start)s::DATE, %(end)s::DATE, INTERVAL '1 day') AS g(day)
+    CROSS JOIN (
+        SELECT dimension, member FROM audit.volume_baselines
+        UNION
+        SELECT dimension, member
+        FROM audit.daily_volume_metrics
+        WHERE metric_date BETWEEN %(start)s AND %(end)s
+    ) s
+    LEFT JOIN audit.daily_volume_metrics m
+        ON m.dimension = s.dimension
+       AND m.member = s.member
+       AND m.metric_date = g.day
+    ORDER BY g.day
+"""
+
+def update_volume_baselines(cur):
+    """Fold closed days past the watermark into the weekday baselines; returns days folded."""
+    cur.execute("""
+        SELECT MIN(metric_date), MAX(metric_date)
+        FROM audit.daily_volume_metrics
+        WHERE dimension = 'table' AND member = 'fact_sales'
+    """)
+    first, newest = cur.fetchone()
+    if newest is None:
+        return 0
+
+    folded = get_watermark(cur, "volume_baselines")
+    start = first if folded == datetime.min else folded.date() + timedelta(days=1)
+    end = newest - timedelta(days=1)
+    if start > end:
+        return 0
+
+    cur.execute("""
+        SELECT dimension, member, day_of_week, observations, mean, variance
+        FROM audit.volume_baselines
+    """)
+    baselines = {
+        (dimension, member, dow): Baseline(observations, mean, variance)
+        for dimension, member, dow, observations, mean, variance in cur.fetchall()
+    }
+
+    cur.execute(CLOSED_DAYS_SQL, {"start": start, "end": end})
+    for day, dimension, member, row_count in cur.fetchall():
+        key = (dimension, member, day.isoweekday())
+        baselines.setdefault(key, Baseline()).update(row_count, VOLUME_EWMA_ALPHA)
+
+    keys = list(baselines)
+    cur.execute("""
+        INSERT INTO audit.volume_baselines (
+            dimension, member, day_of_week, observations, mean, variance, updated_at
         )
-        SELECT
-            ROW_NUMBER() OVER (ORDER BY customer_id) AS customer_key,
-            COUNT(DISTINCT transaction_id),
-            SUM(revenue),
-            AVG(revenue),
-            MAX(date)
-        FROM warehouse.fact_sales
-        GROUP BY customer_id
+        SELECT *, NOW()
+        FROM UNNEST(
+            %(dimensions)s::TEXT[], %(members)s::TEXT[], %(days)s::SMALLINT[],
+            %(observations)s::BIGINT[], %(means)s::DOUBLE PRECISION[], %(variances)s::DOUBLE PRECISION[]
+        )
+        ON CONFLICT (dimension, member, day_of_week) DO UPDATE SET
+            observations = EXCLUDED.observations,
+            mean = EXCLUDED.mean,
+            variance = EXCLUDED.variance,
+            updated_at = EXCLUDED.updated_at
+    """, {
+        "dimensions": [k[0] for k in keys],
+        "members": [k[1] for k in keys],
+        "days": [k[2] for k in keys],
+        "observations": [baselines[k].observations for k in keys],
+        "means": [baselines[k].mean for k in keys],
+        "variances": [baselines[k].variance for k in keys]
+    })
+
+    days = (end - start).days + 1
+    save_watermark(cur, "volume_baselines", datetime.combine(end, datetime.min.time()), days)
+    return days
+
+def backfill_volume_metrics(cur, watermark):
+    cur.execute("SELECT EXISTS (SELECT 1 FROM audit.daily_volume_metrics)")
+    if cur.fetchone()[0]:
+        return
+    cur.execute(
+        VOLUME_METRICS_SQL.format(
+            source="(SELECT * FROM warehouse.fact_sales WHERE created_at <= %(watermark)s)"
+        ),
+        {"watermark": watermark}
+    )
+    print(f"   daily volume metrics backfilled: {cur.rowcount} rows")
+
+def reset_volume_metrics(cur):
+    cur.execute("DELETE FROM audit.daily_volume_metrics")
+    cur.execute("DELETE FROM audit.volume_baselines")
+    cur.execute("DELETE FROM warehouse.load_watermarks WHERE table_name = 'volume_baselines'")
+
+def load_aggregates(cur):
+    print("➡ Loading aggregates")
+
+    watermark = get_watermark(cur, "aggregates")
+
+    cur.execute("SELECT MAX(created_at) FROM warehouse.fact_sales")
+    high_watermark = cur.fetchone()[0] or watermark
+
+    # No watermark yet: whatever is in the tables predates delta
+    # maintenance, so start from empty and treat every fact as new.
+    if watermark == datetime.min:
+        for table in [*AGGREGATE_TABLES, "agg_daily_segment_customers"]:
+            cur.execute(f"DELETE FROM warehouse.{table}")
+        reset_volume_metrics(cur)
+    else:
+        backfill_volume_metrics(cur, watermark)
+
+    params = {"watermark": watermark, "high_watermark": high_watermark}
+
+    cur.execute(AGG_DELTA_SQL, params)
+    cur.execute("SELECT COUNT(*) FROM agg_delta")
+    delta_rows = cur.fetchone()[0]
+
+    rows_upserted = {}
+    if delta_rows:
+        cur.execute("ANALYZE agg_delta")
+        for table, sql in AGGREGATE_TABLES.items():
+            cur.execute(sql, params)
+            rows_upserted[table] = cur.rowcount
+        rfm = update_rfm_segments(cur, force_refresh=watermark == datetime.min)
+        rows_upserted["daily_sketches"] = update_daily_sketches(cur)
+        cur.execute(VOLUME_METRICS_SQL.format(source="agg_delta"))
+        rows_upserted["daily_volume_metrics"] = cur.rowcount
+    else:
+        rfm = {"boundaries_refreshed": False, "customers_rescored": 0}
+
+    volume_days_folded = update_volume_baselines(cur)
+
+    save_watermark(cur, "aggregates", max(watermark, high_watermark), delta_rows)
+
+    print(f"   aggregate delta facts: {delta_rows}")
+
+    return {
+        "delta_facts": delta_rows,
+        "rows_upserted": rows_upserted,
+        "rfm": rfm,
+        "volume_days_folded": volume_days_folded,
+        "full_rebuild": watermark == datetime.min
+    }
+
+# --------------------------------------------------
+# TABLE DATA VERSIONS
+# --------------------------------------------------
+# warehouse.table_versions is bumped in the same transaction as the data,
+# and only for tables this transaction actually inserted into, updated or
+# deleted from (pg_stat_xact_user_tables). Partition writes count for the
+# partitioned parent. Result caches key on these versions.
+def bump_table_versions(cur):
+    cur.execute("""
+        INSERT INTO warehouse.table_versions (table_name, version, updated_at)
+        SELECT DISTINCT
+            COALESCE(parent.relname, s.relname),
+            1,
+            NOW()
+        FROM pg_stat_xact_user_tables s
+        LEFT JOIN pg_inherits i
+            ON i.inhrelid = s.relid
+        LEFT JOIN pg_class parent
+            ON parent.oid = i.inhparent
+        WHERE s.schemaname = 'warehouse'
+          AND s.relname NOT IN ('table_versions', 'load_watermarks')
+          AND s.n_tup_ins + s.n_tup_upd + s.n_tup_del > 0
+        ON CONFLICT (table_name) DO UPDATE SET
+            version = table_versions.version + 1,
+            updated_at = EXCLUDED.updated_at
+        RETURNING table_name
     """)
+    return sorted(row[0] for row in cur.fetchall())
+
+def versioned(fn):
+    def run(cur):
+        result = fn(cur)
+        bump_table_versions(cur)
+        return result
+    return run
 
 # --------------------------------------------------
 # MAIN
 # --------------------------------------------------
+# Dimensions are independent of each other; facts need every
+# dimension, aggregates need the facts.
+WAREHOUSE_DAG = {
+    "dim_date": (versioned(load_dim_date), []),
+    "dim_payment_method": (versioned(load_dim_payment_method), []),
+    "dim_customers": (versioned(load_dim_customers), []),
+    "dim_products": (versioned(load_dim_products), []),
+    "fact_sales": (
+        versioned(load_fact_sales),
+        ["dim_date", "dim_payment_method", "dim_customers", "dim_products"]
+    ),
+    "aggregates": (versioned(load_aggregates), ["fact_sales"])
+}
+
 def main():
-    conn = get_connection()
-    cur = conn.cursor()
-    conn.autocommit = False
+    pg_pool = get_pool(db, PARALLEL_WORKERS)
 
     try:
-        load_dim_date(cur)
-        load_dim_payment_method(cur)
-        load_dim_customers(cur)
-        load_dim_products(cur)
-        load_fact_sales(cur)
-        load_aggregates(cur)
-
-        conn.commit()
+        results, table_timings = run_dag(
+            WAREHOUSE_DAG, pg_pool, PARALLEL_WORKERS, task_timeout=STEP_TIMEOUT_SECONDS
+        )
+
+        report = {
+            "load_timestamp": datetime.now().isoformat(),
+            "table_timings": table_timings,
+            "scd2_changes": {
+                dim: results[dim] for dim in SCD2_DIMENSIONS
+            },
+            "fact_sales": results["fact_sales"],
+            "aggregates": results["aggregates"]
+        }
+
+        report_path = os.path.join(
+            REPORT_DIR,
+            f"warehouse_load_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        )
+
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=4)
+
         print("✅ Warehouse load completed successfully")
+        print(f" Report saved at: {report_path}")
+
+    except DagTimeout as e:
+        report_path = os.path.join(
+            REPORT_DIR,
+            f"warehouse_load_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        )
+        with open(report_path, "w") as f:
+            json.dump({
+                "load_timestamp": datetime.now().isoformat(),
+                "status": "timeout",
+                "table_timings": e.timings
+            }, f, indent=4)
+
+        print("⏱ Warehouse load timed out:", e)
+        sys.exit(TIMEOUT_EXIT_CODE)
 
     except Exception as e:
-        conn.rollback()
+        # Each task commits on its own, so earlier tables may already be
+        # loaded: fail the step instead of reporting a half-loaded warehouse
         print("❌ Warehouse load failed:", e)
+        sys.exit(1)
 
     finally:
-        cur.close()
-        conn.close()
+        pg_pool.closeall()
 
 if __name__ == "__main__":
-    main()
+    with step_metrics("warehouse_load"):
+        main()
@@ -0,0 +1,259 @@
+import os
+import re
+import json
+import shutil
+import time
+from datetime import date, datetime
+
+import psycopg2
+import pyarrow as pa
+import pyarrow.parquet as pq
+import yaml
+
+from pipeline_metrics import TimedCursor, step_metrics
+
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+with open(os.path.join(BASE_DIR, "config", "config.yaml")) as f:
+    config = yaml.safe_load(f)
+
+db = config["database"]
+bi_cfg = config.get("bi", {})
+PARQUET_DIR = os.path.join(BASE_DIR, bi_cfg.get("parquet_dir", "data/processed/parquet"))
+BATCH_ROWS = bi_cfg.get("parquet_batch_rows", 50000)
+
+SNAPSHOT_DIMENSIONS = ["dim_date", "dim_payment_method", "dim_customers", "dim_products"]
+
+# --------------------------------------------------
+# PARQUET EXPORT
+# --------------------------------------------------
+# Rows are read through a server-side cursor and written BATCH_ROWS at a
+# time as Parquet row groups, so memory stays flat for the full fact
+# table. Column types come from the PostgreSQL result (NUMERIC(p, s)
+# stays decimal, dates stay dates) and text columns are dictionary
+# encoded, which keeps repeated values such as category, state or
+# payment method small. Every file is written next to its target and
+# renamed into place, so BI refreshes never read a partial file.
+#
+# Layout under PARQUET_DIR:
+#   analytics/run_date=YYYY-MM-DD/<result>.parquet
+#   warehouse/<dimension>/snapshot_date=YYYY-MM-DD/part-0.parquet
+#   warehouse/fact_sales/sale_month=YYYY-MM/part-0.parquet
+
+# PostgreSQL type OID -> Arrow type; anything else is exported as text
+ARROW_TYPES = {
+    16: pa.bool_(),
+    20: pa.int64(),
+    21: pa.int16(),
+    23: pa.int32(),
+    700: pa.float32(),
+    701: pa.float64(),
+    1082: pa.date32(),
+    1114: pa.timestamp("us"),
+    1184: pa.timestamp("us", tz="UTC"),
+    17: pa.binary()
+}
+NUMERIC_OID = 1700
+TEXT_TYPES = {25, 1042, 1043}
+# NUMERIC without a declared precision (e.g. ROUND() or SUM() results)
+UNCONSTRAINED = (None, 65535)
+
+PARTITION_MONTH = re.compile(r"_(\d{4})_(\d{2})$")
+
+
+def get_connection():
+    return psycopg2.connect(
+        host=db["host"],
+        port=db["port"],
+        dbname=db["name"],
+        user=db["user"],
+        password=db["password"],
+        cursor_factory=TimedCursor
+    )
+
+
+def arrow_field(column):
+    if column.type_code == NUMERIC_OID:
+        if column.precision in UNCONSTRAINED:
+            return pa.field(column.name, pa.float64()), float
+        return pa.field(column.name, pa.decimal128(column.precision, column.scale)), None
+    if column.type_code in ARROW_TYPES:
+        return pa.field(column.name, ARROW_TYPES[column.type_code]), None
+    if column.type_code in TEXT_TYPES:
+        return pa.field(column.name, pa.string()), None
+    return pa.field(column.name, pa.string()), str
+
+
+def string_columns(schema):
+    return [
+        f.name for f in schema
+        if pa.types.is_string(f.type) or pa.types.is_large_string(f.type)
+    ]
+
+
+def record_batch(rows, schema, converters):
+    columns = list(zip(*rows))
+    arrays = []
+    for values, field, convert in zip(columns, schema, converters):
+        if convert:
+            values = [None if v is None else convert(v) for v in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def stream_to_parquet(conn, sql, path, params=None, batch_rows=BATCH_ROWS):
+    """Write the result of sql to path in record batches; returns rows and columns."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    writer, rows = None, 0
+
+    try:
+        with conn.cursor(name="parquet_export") as cur:
+            cur.itersize = batch_rows
+            cur.execute(sql, params)
+
+            while True:
+                batch = cur.fetchmany(batch_rows)
+                if writer is None:
+                    fields = [arrow_field(column) for column in cur.description]
+                    schema = pa.schema([field for field, _ in fields])
+                    converters = [convert for _, convert in fields]
+                    writer = pq.ParquetWriter(
+                        tmp_path,
+                        schema,
+                        compression="snappy",
+                        use_dictionary=string_columns(schema)
+                    )
+                if not batch:
+                    break
+                writer.write_batch(record_batch(batch, schema, converters))
+                rows += len(batch)
+
+        writer.close()
+    except Exception:
+        if writer:
+            writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    os.replace(tmp_path, path)
+    return {"rows": rows, "columns": len(schema)}
+
+
+def write_dataframe(df, path):
+    """Parquet for results computed in Python (sketch rollups, merged windows)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp_path = f"{path}.tmp"
+    pq.write_table(
+        table,
+        tmp_path,
+        compression="snappy",
+        use_dictionary=string_columns(table.schema)
+    )
+    os.replace(tmp_path, path)
+
+
+def analytics_dir(run_date=None):
+    run_date = run_date or date.today()
+    return os.path.join(PARQUET_DIR, "analytics", f"run_date={run_date.isoformat()}")
+
+
+def analytics_path(name, run_date=None):
+    return os.path.join(analytics_dir(run_date), f"{name}.parquet")
+
+
+# --------------------------------------------------
+# WAREHOUSE SNAPSHOTS
+# --------------------------------------------------
+def fact_partitions(cur):
+    cur.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'warehouse.fact_sales'::REGCLASS
+        ORDER BY c.relname
+    """)
+    return [row[0] for row in cur.fetchall()]
+
+
+def export_fact_sales(conn, root):
+    """One directory per monthly partition, read partition by partition (no sort)."""
+    with conn.cursor() as cur:
+        partitions = fact_partitions(cur)
+
+    # Rebuild beside the live directory, then swap it in
+    target = os.path.join(root, "fact_sales")
+    staging = f"{target}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+
+    stats = {}
+    for partition in partitions:
+        match = PARTITION_MONTH.search(partition)
+        month = f"{match.group(1)}-{match.group(2)}" if match else partition
+        stats[month] = stream_to_parquet(
+            conn,
+            f"SELECT * FROM warehouse.{partition}",
+            os.path.join(staging, f"sale_month={month}", "part-0.parquet")
+        )
+
+    os.makedirs(staging, exist_ok=True)
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(staging, target)
+    return stats
+
+
+def export_dimension(conn, table, root, snapshot_date):
+    return stream_to_parquet(
+        conn,
+        f"SELECT * FROM warehouse.{table}",
+        os.path.join(root, table, f"snapshot_date={snapshot_date.isoformat()}", "part-0.parquet")
+    )
+
+
+def main():
+    if not bi_cfg.get("parquet_export", False):
+        print("➡ Parquet export disabled (bi.parquet_export)")
+        return
+
+    root = os.path.join(PARQUET_DIR, "warehouse")
+    snapshot_date = date.today()
+    conn = get_connection()
+
+    report = {"export_timestamp": datetime.now().isoformat(), "tables": {}}
+    try:
+        # One REPEATABLE READ transaction: facts and dimensions match
+        conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+
+        for table in SNAPSHOT_DIMENSIONS:
+            start = time.time()
+            stats = export_dimension(conn, table, root, snapshot_date)
+            report["tables"][table] = {**stats, "duration_seconds": round(time.time() - start, 2)}
+            print(f"➡ Exported {table} ({stats['rows']} rows)")
+
+        start = time.time()
+        partitions = export_fact_sales(conn, root)
+        report["tables"]["fact_sales"] = {
+            "rows": sum(p["rows"] for p in partitions.values()),
+            "partitions": partitions,
+            "duration_seconds": round(time.time() - start, 2)
+        }
+        print(f"➡ Exported fact_sales ({report['tables']['fact_sales']['rows']} rows)")
+    finally:
+        conn.rollback()
+        conn.close()
+
+    report_path = os.path.join(root, "export_report.json")
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=4)
+
+    print(f" Parquet snapshot saved at: {root}")
+
+
+if __name__ == "__main__":
+    with step_metrics("bi_snapshot_export"):
+        main()
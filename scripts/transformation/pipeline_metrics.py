@@ -0,0 +1,357 @@
+import os
+import re
+import json
+import math
+import time
+import threading
+from contextlib import contextmanager
+
+from psycopg2 import extensions, pool
+
+# --------------------------------------------------
+# PIPELINE METRICS
+# --------------------------------------------------
+# One registry per process, rendered in the Prometheus text exposition
+# format. Every step runs as its own process, so a step's metrics are
+# persisted when it finishes: step_metrics() times the step and merges
+# its counters and histograms into METRICS_DIR/<step>.json (gauges keep
+# their last value). The /metrics endpoints (analytics_api.py,
+# scripts/monitoring/metrics_exporter.py) serve those files plus their
+# own live metrics, so totals keep growing across runs and Prometheus can
+# derive throughput with rate().
+#
+# Statements are timed by TimedCursor (pass it as cursor_factory) and
+# labelled "<verb> <first schema.table>", which keeps the label set as
+# small as the set of tables. MeteredPool tracks connections in use.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+METRICS_DIR = os.path.join(BASE_DIR, "data", "metrics")
+
+# Exposition-format histogram buckets (seconds)
+STATEMENT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+COPY_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+STEP_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+# name -> (type, help, buckets)
+METRICS = {
+    "pipeline_rows_processed_total": (
+        "counter", "Rows loaded or produced, per table", None),
+    "pipeline_step_duration_seconds": (
+        "histogram", "Wall time of a pipeline step", STEP_BUCKETS),
+    "pipeline_statement_duration_seconds": (
+        "histogram", "Database statement duration", STATEMENT_BUCKETS),
+    "pipeline_copy_duration_seconds": (
+        "histogram", "COPY duration, per table", COPY_BUCKETS),
+    "pipeline_db_pool_connections": (
+        "gauge", "Connections of a step's pool, by state", None),
+    "pipeline_db_pool_peak_in_use": (
+        "gauge", "Most pooled connections in use at once", None),
+    "pipeline_load_lag_seconds": (
+        "gauge", "Seconds since the newest row of each audited table", None),
+    "pipeline_step_last_run_timestamp_seconds": (
+        "gauge", "Unix time a step last finished, by exit status", None),
+    "analytics_api_requests_total": (
+        "counter", "Analytics API query requests, by cache outcome", None)
+}
+
+QUALIFIED_TABLE = re.compile(r"\b(staging|production|warehouse|audit)\.(\w+)", re.IGNORECASE)
+SQL_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+# Monthly partitions (transactions_2024_01) are labelled as their parent
+PARTITION_SUFFIX = re.compile(r"_\d{4}_\d{2}$")
+
+
+class Registry:
+    def __init__(self, step=None):
+        self.step = step
+        self.lock = threading.Lock()
+        # name -> {sorted label items: value, or [bucket counts, sum, count]}
+        self.samples = {name: {} for name in METRICS}
+
+    def labels(self, labels):
+        if self.step and "step" not in labels:
+            labels = {"step": self.step, **labels}
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self.labels(labels)
+        with self.lock:
+            series = self.samples[name]
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        key = self.labels(labels)
+        with self.lock:
+            self.samples[name][key] = value
+
+    def observe(self, name, seconds, **labels):
+        key = self.labels(labels)
+        buckets = METRICS[name][2]
+        with self.lock:
+            state = self.samples[name].setdefault(key, [[0] * len(buckets), 0.0, 0])
+            for i, bound in enumerate(buckets):
+                if seconds <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += seconds
+            state[2] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    # ---------- persistence ----------
+    def snapshot(self):
+        with self.lock:
+            return {
+                name: [[dict(key), value] for key, value in series.items()]
+                for name, series in self.samples.items() if series
+            }
+
+    def merge(self, snapshot):
+        """Add a persisted snapshot: counters and histograms sum, gauges keep ours."""
+        with self.lock:
+            for name, series in snapshot.items():
+                if name not in METRICS:
+                    continue
+                kind = METRICS[name][0]
+                for labels, value in series:
+                    key = tuple(sorted(labels.items()))
+                    current = self.samples[name].get(key)
+                    if current is None:
+                        self.samples[name][key] = (
+                            [list(value[0]), value[1], value[2]] if kind == "histogram" else value
+                        )
+                    elif kind == "counter":
+                        self.samples[name][key] = current + value
+                    elif kind == "histogram":
+                        current[0] = [a + b for a, b in zip(current[0], value[0])]
+                        current[1] += value[1]
+                        current[2] += value[2]
+
+    def drain(self):
+        """Snapshot, then start counters and histograms over (they are persisted)."""
+        with self.lock:
+            snapshot = {
+                name: [[dict(key), value] for key, value in series.items()]
+                for name, series in self.samples.items() if series
+            }
+            for name, (kind, _, _) in METRICS.items():
+                if kind != "gauge":
+                    self.samples[name] = {}
+            return snapshot
+
+
+REGISTRY = Registry()
+
+
+def metrics_path(step):
+    return os.path.join(METRICS_DIR, f"{step}.json")
+
+
+def flush(registry=None):
+    """Merge this process's metrics into the step's file (atomically)."""
+    registry = registry or REGISTRY
+    if registry.step is None:
+        return
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = metrics_path(registry.step)
+
+    totals = Registry(registry.step)
+    totals.merge(registry.drain())
+    try:
+        with open(path) as f:
+            totals.merge(json.load(f))
+    except (OSError, ValueError):
+        pass
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(totals.snapshot(), f)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def step_metrics(step):
+    """Label this process's metrics with step; time it and persist on exit."""
+    REGISTRY.step = step
+    status = "success"
+    start = time.perf_counter()
+    try:
+        yield REGISTRY
+    except SystemExit as e:
+        # table_dag imports this module, so import its constant late
+        from table_dag import TIMEOUT_EXIT_CODE
+        status = "success" if not e.code else ("timeout" if e.code == TIMEOUT_EXIT_CODE else "failed")
+        raise
+    except BaseException:
+        status = "failed"
+        raise
+    finally:
+        record_step(step, time.perf_counter() - start, status)
+
+
+def record_step(step, seconds, status="success"):
+    """Observe a finished step and persist this process's metrics."""
+    REGISTRY.step = step
+    REGISTRY.observe("pipeline_step_duration_seconds", seconds, status=status)
+    REGISTRY.set("pipeline_step_last_run_timestamp_seconds", time.time(), status=status)
+    try:
+        flush()
+    except OSError as e:
+        print(f"⚠ Could not persist metrics for {step}: {e}")
+
+
+# --------------------------------------------------
+# DATABASE INSTRUMENTATION
+# --------------------------------------------------
+def statement_label(query):
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+    # The verb and target are near the start; skip inlined VALUES pages
+    query = SQL_COMMENT.sub(" ", query[:1000]).strip()
+    verb = query.split(None, 1)[0].lower() if query else "unknown"
+    table = table_label(query)
+    return f"{verb} {table}" if table else verb
+
+
+def table_label(query):
+    table = QUALIFIED_TABLE.search(query)
+    return PARTITION_SUFFIX.sub("", table.group(0).lower()) if table else None
+
+
+def copy_table(query):
+    return table_label(SQL_COMMENT.sub(" ", query)) or "query"
+
+
+class TimedCursor(extensions.cursor):
+    def execute(self, query, vars=None):
+        label = statement_label(query if isinstance(query, (str, bytes)) else query.as_string(self))
+        with REGISTRY.timer("pipeline_statement_duration_seconds", statement=label):
+            return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        label = statement_label(query if isinstance(query, (str, bytes)) else query.as_string(self))
+        with REGISTRY.timer("pipeline_statement_duration_seconds", statement=label):
+            return super().executemany(query, vars_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        sql_text = sql if isinstance(sql, str) else sql.as_string(self)
+        with REGISTRY.timer("pipeline_copy_duration_seconds", table=copy_table(sql_text)):
+            return super().copy_expert(sql, file, size)
+
+
+class MeteredPool(pool.ThreadedConnectionPool):
+    def __init__(self, minconn, maxconn, *args, **kwargs):
+        super().__init__(minconn, maxconn, *args, **kwargs)
+        self.peak = 0
+        self.report_usage()
+
+    def report_usage(self):
+        in_use = len(self._used)
+        self.peak = max(self.peak, in_use)
+        REGISTRY.set("pipeline_db_pool_connections", in_use, state="in_use")
+        REGISTRY.set("pipeline_db_pool_connections", len(self._pool), state="idle")
+        REGISTRY.set("pipeline_db_pool_connections", self.maxconn, state="max")
+        REGISTRY.set("pipeline_db_pool_peak_in_use", self.peak)
+
+    def getconn(self, key=None):
+        conn = super().getconn(key)
+        with self._lock:
+            self.report_usage()
+        return conn
+
+    def putconn(self, conn=None, key=None, close=False):
+        super().putconn(conn, key, close)
+        with self._lock:
+            self.report_usage()
+
+
+# Newest audit entry per table: an index probe per (layer, table)
+LOAD_LAG_SQL = """
+    SELECT DISTINCT ON (layer, table_name)
+        layer,
+        table_name,
+        EXTRACT(EPOCH FROM LOCALTIMESTAMP - max_timestamp)
+    FROM audit.load_audit
+    WHERE max_timestamp IS NOT NULL
+    ORDER BY layer, table_name, audit_id DESC
+"""
+
+
+def record_load_lag(conn, registry):
+    with conn.cursor() as cur:
+        cur.execute(LOAD_LAG_SQL)
+        for layer, table, lag in cur.fetchall():
+            registry.set("pipeline_load_lag_seconds", round(float(lag), 3), layer=layer, table=table)
+    conn.rollback()
+
+
+# --------------------------------------------------
+# EXPOSITION
+# --------------------------------------------------
+def escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in items) + "}"
+
+
+def format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(registry):
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        series = registry.samples[name]
+        if not series:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+        for key in sorted(series):
+            value = series[key]
+            if kind != "histogram":
+                lines.append(f"{name}{format_labels(key)} {format_value(value)}")
+                continue
+
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{format_labels(key, [('le', format_value(float(bound)))])} {cumulative}")
+            lines.append(f"{name}_bucket{format_labels(key, [('le', '+Inf')])} {count}")
+            lines.append(f"{name}_sum{format_labels(key)} {format_value(float(total))}")
+            lines.append(f"{name}_count{format_labels(key)} {count}")
+
+    return "\n".join(lines) + "\n"
+
+
+def collect(*live):
+    """Every persisted step plus the live registries of the serving process."""
+    combined = Registry()
+    if os.path.isdir(METRICS_DIR):
+        for name in sorted(os.listdir(METRICS_DIR)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(METRICS_DIR, name)) as f:
+                    combined.merge(json.load(f))
+            except (OSError, ValueError):
+                continue
+    for registry in live:
+        combined.merge(registry.snapshot())
+    return render(combined)
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
@@ -0,0 +1,234 @@
+import os
+import re
+import json
+import hashlib
+from collections import Counter
+from datetime import datetime
+
+import psycopg2
+import yaml
+
+from pipeline_metrics import TimedCursor
+from sql_params import FULL_HISTORY, bind_named, statement_body
+
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ANALYTICS_SQL = os.path.join(BASE_DIR, "sql", "queries", "analytical_queries.sql")
+QUALITY_SQL = os.path.join(BASE_DIR, "sql", "queries", "data_quality_checks.sql")
+OUTPUT_DIR = os.path.join(BASE_DIR, "data", "processed", "analytics")
+PROFILE_FILE = os.path.join(OUTPUT_DIR, "query_profiles.json")
+BASELINE_FILE = os.path.join(OUTPUT_DIR, "query_profile_baseline.json")
+
+with open(os.path.join(BASE_DIR, "config", "config.yaml")) as f:
+    config = yaml.safe_load(f)
+
+db = config["database"]
+profiling_cfg = config.get("analytics", {}).get("profiling", {})
+RUNTIME_REGRESSION_FACTOR = profiling_cfg.get("runtime_regression_factor", 1.5)
+# Ignore slowdowns smaller than this; sub-millisecond plans are noisy
+RUNTIME_REGRESSION_MIN_MS = profiling_cfg.get("runtime_regression_min_ms", 10)
+WATCHED_TABLES = profiling_cfg.get("seq_scan_watch", ["fact_sales"])
+STATEMENT_TIMEOUT_SECONDS = config.get("pipeline", {}).get("timeout_seconds")
+
+# --------------------------------------------------
+# QUERY PROFILER
+# --------------------------------------------------
+# Runs EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) for every analytical and
+# data quality query, reduces each plan to a shape fingerprint (node
+# types, join types and relations; monthly partitions folded into their
+# table) and compares it with a stored baseline. A query is flagged when
+# its plan shape changes, when it seq-scans a watched table, or when it
+# runs RUNTIME_REGRESSION_FACTOR times slower than its baseline.
+
+PARTITION_SUFFIX = re.compile(r"_\d{4}_\d{2}$")
+
+
+def get_connection():
+    return psycopg2.connect(
+        host=db["host"],
+        port=db["port"],
+        dbname=db["name"],
+        user=db["user"],
+        password=db["password"],
+        options=f"-c statement_timeout={int(STATEMENT_TIMEOUT_SECONDS * 1000)}"
+        if STATEMENT_TIMEOUT_SECONDS else None,
+        cursor_factory=TimedCursor
+    )
+
+
+def load_quality_queries():
+    with open(QUALITY_SQL) as f:
+        statements = [statement_body(q) for q in f.read().split(";")]
+
+    queries = {}
+    for i, sql in enumerate(s for s in statements if s):
+        match = re.search(r"'([^']+)'\s+AS\s+check_name", sql, re.IGNORECASE)
+        queries[f"quality.{match.group(1) if match else i + 1}"] = sql
+    return queries
+
+
+def plan_shape(node):
+    label = node["Node Type"]
+    if node.get("Join Type"):
+        label += f"[{node['Join Type']}]"
+    if node.get("Relation Name"):
+        label += f":{PARTITION_SUFFIX.sub('', node['Relation Name'])}"
+
+    children = [plan_shape(child) for child in node.get("Plans", [])]
+    # One entry per distinct child so a new monthly partition under an
+    # Append does not count as a different plan
+    if node["Node Type"] in ("Append", "Merge Append"):
+        children = list(dict.fromkeys(children))
+
+    return f"{label}({','.join(children)})" if children else label
+
+
+def node_types(node):
+    counts = Counter([node["Node Type"] + (f"[{node['Join Type']}]" if node.get("Join Type") else "")])
+    for child in node.get("Plans", []):
+        counts.update(node_types(child))
+    return counts
+
+
+def seq_scans(node):
+    found = set()
+    if node["Node Type"] == "Seq Scan":
+        table = PARTITION_SUFFIX.sub("", node.get("Relation Name", ""))
+        if table in WATCHED_TABLES:
+            found.add(table)
+    for child in node.get("Plans", []):
+        found |= seq_scans(child)
+    return found
+
+
+def profile_query(cur, sql, params=None):
+    body, bound = bind_named(statement_body(sql), params)
+    cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {body}", bound)
+    explain = cur.fetchone()[0][0]
+    plan = explain["Plan"]
+    shape = plan_shape(plan)
+
+    return {
+        "fingerprint": hashlib.sha1(shape.encode("utf-8")).hexdigest()[:16],
+        "plan_shape": shape,
+        "node_types": dict(node_types(plan)),
+        "planning_time_ms": round(explain.get("Planning Time", 0), 3),
+        "execution_time_ms": round(explain.get("Execution Time", 0), 3),
+        "buffers": {
+            "shared_hit": plan.get("Shared Hit Blocks", 0),
+            "shared_read": plan.get("Shared Read Blocks", 0),
+            "temp_read": plan.get("Temp Read Blocks", 0),
+            "temp_written": plan.get("Temp Written Blocks", 0)
+        },
+        "seq_scans_on": sorted(seq_scans(plan))
+    }
+
+
+def regressions(profile, baseline):
+    flags = []
+
+    if profile["seq_scans_on"]:
+        flags.append(f"seq scan on {', '.join(profile['seq_scans_on'])}")
+
+    if not baseline:
+        return flags
+
+    if profile["fingerprint"] != baseline["fingerprint"]:
+        # e.g. "+Nested Loop[Inner], -Hash Join[Inner]" for a lost hash join
+        before, after = Counter(baseline["node_types"]), Counter(profile["node_types"])
+        changes = [f"+{t}" for t in sorted(after - before)] + [f"-{t}" for t in sorted(before - after)]
+        flags.append(f"plan shape changed ({', '.join(changes) or 'same nodes, new order'})")
+
+    slower_than = baseline["execution_time_ms"] * RUNTIME_REGRESSION_FACTOR
+    if (
+        profile["execution_time_ms"] > slower_than
+        and profile["execution_time_ms"] - baseline["execution_time_ms"] > RUNTIME_REGRESSION_MIN_MS
+    ):
+        flags.append(
+            f"runtime {profile['execution_time_ms']} ms > "
+            f"{RUNTIME_REGRESSION_FACTOR}x baseline {baseline['execution_time_ms']} ms"
+        )
+
+    return flags
+
+
+def profile_queries(conn, queries, baseline, params=None):
+    results = {}
+    with conn.cursor() as cur:
+        for name, sql in queries.items():
+            try:
+                profile = profile_query(cur, sql, params)
+            except psycopg2.errors.QueryCanceled as e:
+                results[name] = {"status": "timeout", "error": str(e).strip()}
+                continue
+            except psycopg2.Error as e:
+                results[name] = {"status": "error", "error": str(e).strip()}
+                continue
+            finally:
+                # EXPLAIN ANALYZE executes the query; never keep its effects
+                conn.rollback()
+
+            profile["regressions"] = regressions(profile, baseline.get(name))
+            profile["status"] = "regressed" if profile["regressions"] else "ok"
+            results[name] = profile
+    return results
+
+
+def load_baseline():
+    try:
+        with open(BASELINE_FILE) as f:
+            return json.load(f)["queries"]
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def save_baseline(results):
+    with open(BASELINE_FILE, "w") as f:
+        json.dump({
+            "created_at": datetime.now().isoformat(),
+            "queries": {
+                name: {
+                    "fingerprint": p["fingerprint"],
+                    "plan_shape": p["plan_shape"],
+                    "node_types": p["node_types"],
+                    "execution_time_ms": p["execution_time_ms"]
+                }
+                for name, p in results.items() if "fingerprint" in p
+            }
+        }, f, indent=4)
+
+
+def run_profiling(analytics_queries, update_baseline=False, params=None):
+    """Profile the analytical queries plus every data quality check."""
+    queries = {**analytics_queries, **load_quality_queries()}
+    params = params or FULL_HISTORY
+    baseline = load_baseline()
+
+    conn = get_connection()
+    try:
+        results = profile_queries(conn, queries, baseline, params)
+    finally:
+        conn.close()
+
+    if update_baseline or not baseline:
+        save_baseline(results)
+
+    report = {
+        "profile_timestamp": datetime.now().isoformat(),
+        "baseline": "updated" if update_baseline or not baseline else "compared",
+        "regressed_queries": sorted(n for n, p in results.items() if p["status"] == "regressed"),
+        "timed_out_queries": sorted(n for n, p in results.items() if p["status"] == "timeout"),
+        "queries": results
+    }
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    with open(PROFILE_FILE, "w") as f:
+        json.dump(report, f, indent=4)
+
+    for name in report["regressed_queries"]:
+        print(f"⚠ {name}: {'; '.join(results[name]['regressions'])}")
+    print(f" Query profiles saved at: {PROFILE_FILE}")
+
+    return report
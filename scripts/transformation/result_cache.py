@@ -0,0 +1,120 @@
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import threading
+from datetime import date
+
+# --------------------------------------------------
+# ANALYTICS RESULT CACHE
+# --------------------------------------------------
+# Result files are cached under a key built from the normalized SQL text
+# plus the data version of every warehouse table it references
+# (warehouse.table_versions, bumped by load_warehouse.py only when a load
+# actually changed the table). An unchanged warehouse therefore serves
+# every result from the cache. A result written in several formats (CSV,
+# Parquet) has one entry per file, all under the same key. Entries are
+# evicted least recently used first once the cache grows past max_bytes.
+
+TABLE_REFERENCE = re.compile(r"\bwarehouse\.(\w+)", re.IGNORECASE)
+# Results that depend on the clock are only valid for the day they ran
+CLOCK_FUNCTIONS = re.compile(r"\b(current_date|current_timestamp|now\s*\()", re.IGNORECASE)
+
+
+def normalize_sql(sql):
+    sql = re.sub(r"--[^\n]*", " ", sql)
+    return " ".join(sql.split()).rstrip(";")
+
+
+def referenced_tables(sql):
+    return sorted({name.lower() for name in TABLE_REFERENCE.findall(sql)})
+
+
+def cache_key(sql, versions, params=None):
+    tables = referenced_tables(sql)
+    version_tag = ",".join(f"{t}:{versions.get(t, 0)}" for t in tables)
+    if CLOCK_FUNCTIONS.search(sql):
+        version_tag += f"|{date.today().isoformat()}"
+    if params:
+        version_tag += "|" + ",".join(f"{k}={v}" for k, v in sorted(params.items()))
+    return hashlib.sha256(f"{normalize_sql(sql)}|{version_tag}".encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    INDEX_FILE = "index.json"
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+        try:
+            with open(os.path.join(cache_dir, self.INDEX_FILE)) as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {"entries": {}, "outputs": {}}
+
+        # Entries are named after their file; drop those removed behind our back
+        self.index["entries"] = {
+            name: entry for name, entry in self.index["entries"].items()
+            if os.path.exists(os.path.join(cache_dir, name))
+        }
+
+    def path(self, key, suffix):
+        return os.path.join(self.cache_dir, f"{key}{suffix}")
+
+    def get(self, key, suffix=".csv"):
+        with self.lock:
+            entry = self.index["entries"].get(f"{key}{suffix}")
+            if entry:
+                entry["last_used"] = time.time()
+            return entry
+
+    def serve(self, key, output_path):
+        """Make output_path hold the cached result; skip the copy if it already does."""
+        suffix = os.path.splitext(output_path)[1]
+        entry = self.get(key, suffix)
+        if self.index["outputs"].get(output_path) == key and os.path.exists(output_path):
+            return entry
+
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        shutil.copyfile(self.path(key, suffix), output_path)
+        with self.lock:
+            self.index["outputs"][output_path] = key
+        return entry
+
+    def put(self, key, output_path, **metadata):
+        suffix = os.path.splitext(output_path)[1]
+        cached = self.path(key, suffix)
+        shutil.copyfile(output_path, cached)
+
+        with self.lock:
+            self.index["entries"][f"{key}{suffix}"] = {
+                "suffix": suffix,
+                "size": os.path.getsize(cached),
+                "last_used": time.time(),
+                **metadata
+            }
+            self.index["outputs"][output_path] = key
+            self.evict()
+
+    def evict(self):
+        entries = self.index["entries"]
+        total = sum(entry["size"] for entry in entries.values())
+
+        for name in sorted(entries, key=lambda n: entries[n]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            total -= entries.pop(name)["size"]
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+
+    def save(self):
+        with self.lock:
+            with open(os.path.join(self.cache_dir, self.INDEX_FILE), "w") as f:
+                json.dump(self.index, f, indent=4)
@@ -0,0 +1,37 @@
+import re
+from datetime import date
+
+# --------------------------------------------------
+# NAMED QUERY PARAMETERS
+# --------------------------------------------------
+# The analytical SQL files use :name placeholders (:start_date,
+# :end_date). They are rewritten to psycopg2's %(name)s style and bound
+# by the driver, never formatted into the SQL text. Shared by the
+# analytics export, the query profiler, the benchmarks and the API.
+
+# :name placeholders; "::" casts and times like '10:30' do not match
+NAMED_PARAM = re.compile(r"(?<![:\w]):([A-Za-z_]\w*)")
+# Opens every :start_date/:end_date window to all of history
+FULL_HISTORY = {"start_date": date.min, "end_date": date.max}
+
+
+def statement_body(sql):
+    """Drop comment lines and the trailing semicolon so the SQL can be wrapped."""
+    body = "\n".join(
+        line for line in sql.splitlines() if not line.strip().startswith("--")
+    )
+    return body.strip().rstrip(";")
+
+
+def bind_named(sql, params):
+    """Rewrite :name placeholders for psycopg2; returns (sql, params or None)."""
+    names = set(NAMED_PARAM.findall(sql))
+    if not names:
+        return sql, None
+
+    missing = names - set(params or {})
+    if missing:
+        raise ValueError(f"Missing query parameters: {', '.join(sorted(missing))}")
+
+    # Once params are passed, a literal % must be doubled
+    return NAMED_PARAM.sub(r"%(\1)s", sql.replace("%", "%%")), params
@@ -0,0 +1,175 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from psycopg2 import errors
+
+from pipeline_metrics import MeteredPool, TimedCursor
+
+# --------------------------------------------------
+# TABLE-LEVEL DAG EXECUTOR
+# --------------------------------------------------
+# Runs table loads as a dependency graph. Each task is
+#     name -> (fn, [dependency names])
+# and fn(cursor) runs on its own pooled connection, committed on
+# success and rolled back on failure. Independent tasks run
+# concurrently; a task only starts once all its dependencies have
+# committed, so FK load order is preserved.
+#
+# Timeouts: a pool created with statement_timeout makes the server cancel
+# any single statement running longer than that. run_dag's task_timeout
+# bounds a whole task (all of its statements): a timer calls
+# connection.cancel() on the task's connection once the budget is spent.
+# Either way the task ends with QueryCanceled and is reported as "timeout"
+# rather than "failed".
+
+# Exit status for a step that stopped on a timeout (as coreutils timeout)
+TIMEOUT_EXIT_CODE = 124
+
+
+class TaskTimeout(Exception):
+    pass
+
+
+class DagTimeout(RuntimeError):
+    def __init__(self, message, timings):
+        super().__init__(message)
+        self.timings = timings
+
+
+def statement_timeout_option(seconds):
+    if not seconds:
+        return None
+    return f"-c statement_timeout={int(seconds * 1000)}"
+
+
+def get_pool(db, max_workers, statement_timeout=None):
+    return MeteredPool(
+        1,
+        max_workers,
+        host=db["host"],
+        port=db["port"],
+        dbname=db["name"],
+        user=db["user"],
+        password=db["password"],
+        options=statement_timeout_option(statement_timeout),
+        cursor_factory=TimedCursor
+    )
+
+
+def validate_dag(tasks):
+    for name, (_, deps) in tasks.items():
+        for dep in deps:
+            if dep not in tasks:
+                raise ValueError(f"Task {name!r} depends on unknown task {dep!r}")
+
+    visiting, done = set(), set()
+
+    def visit(name):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"Dependency cycle detected at task {name!r}")
+        visiting.add(name)
+        for dep in tasks[name][1]:
+            visit(dep)
+        visiting.discard(name)
+        done.add(name)
+
+    for name in tasks:
+        visit(name)
+
+
+def run_task(pg_pool, fn, timeout=None):
+    conn = pg_pool.getconn()
+    cur = conn.cursor()
+    start = time.time()
+    timer = threading.Timer(timeout, conn.cancel) if timeout else None
+
+    try:
+        if timer:
+            timer.start()
+        result = fn(cur)
+        # A cancel that fired between statements had nothing to cancel:
+        # the task still ran past its budget, so it must not commit
+        if timer and (timer.finished.is_set() or time.time() - start > timeout):
+            raise TaskTimeout(f"ran past its {timeout}s budget")
+        conn.commit()
+        return result, start, time.time()
+    except errors.QueryCanceled as e:
+        conn.rollback()
+        if timer and timer.finished.is_set():
+            raise TaskTimeout(f"cancelled after {timeout}s") from e
+        raise TaskTimeout(str(e).strip()) from e
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if timer:
+            timer.cancel()
+        cur.close()
+        pg_pool.putconn(conn)
+
+
+def run_dag(tasks, pg_pool, max_workers, task_timeout=None):
+    validate_dag(tasks)
+
+    dag_start = time.time()
+    results, timings = {}, {}
+    pending = dict(tasks)
+    running = {}
+    failed = []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            if not failed:
+                ready = [
+                    name for name, (_, deps) in pending.items()
+                    if all(timings.get(d, {}).get("status") == "success" for d in deps)
+                ]
+                for name in ready:
+                    fn, _ = pending.pop(name)
+                    print(f"➡ [dag] starting {name}")
+                    running[executor.submit(run_task, pg_pool, fn, task_timeout)] = name
+
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    result, start, end = future.result()
+                    results[name] = result
+                    timings[name] = {
+                        "status": "success",
+                        "start_offset_seconds": round(start - dag_start, 4),
+                        "duration_seconds": round(end - start, 4)
+                    }
+                except TaskTimeout as e:
+                    failed.append(name)
+                    timings[name] = {
+                        "status": "timeout",
+                        "error": str(e)
+                    }
+                except Exception as e:
+                    failed.append(name)
+                    timings[name] = {
+                        "status": "failed",
+                        "error": str(e)
+                    }
+
+    for name in pending:
+        timings[name] = {"status": "skipped"}
+
+    if failed:
+        message = (
+            f"Load DAG failed at {', '.join(failed)}: "
+            + "; ".join(timings[name]["error"] for name in failed)
+        )
+        if any(timings[name]["status"] == "timeout" for name in failed):
+            raise DagTimeout(message, timings)
+        raise RuntimeError(message)
+
+    return results, timings
@@ -0,0 +1,52 @@
+import math
+
+# --------------------------------------------------
+# SEASONAL VOLUME BASELINES
+# --------------------------------------------------
+# Every daily volume series (fact rows overall, per category, per payment
+# method) keeps one baseline per ISO weekday, so a Monday is compared
+# with earlier Mondays. A baseline is an exponentially weighted mean and
+# variance, updated one day at a time with the EW form of Welford's
+# recurrence:
+#
+#   diff = x - mean
+#   mean = mean + alpha * diff
+#   var  = (1 - alpha) * (var + alpha * diff^2)
+#
+# Updating or scoring costs the same however long the history is, and
+# the baseline follows gradual trends (alpha 0.2 weights roughly the last
+# ten same-weekday observations). Daily counts are close to Poisson, so
+# the spread used for scoring never drops below sqrt(mean); a series that
+# happened to be flat would otherwise flag every small wobble.
+
+DEFAULT_ALPHA = 0.2
+
+
+class Baseline:
+    __slots__ = ("observations", "mean", "variance")
+
+    def __init__(self, observations=0, mean=0.0, variance=0.0):
+        self.observations = observations
+        self.mean = mean
+        self.variance = variance
+
+    def update(self, value, alpha=DEFAULT_ALPHA):
+        value = float(value)
+        if self.observations == 0:
+            self.mean, self.variance = value, 0.0
+        else:
+            diff = value - self.mean
+            self.mean += alpha * diff
+            self.variance = (1 - alpha) * (self.variance + alpha * diff * diff)
+        self.observations += 1
+        return self
+
+    def std(self):
+        return max(math.sqrt(self.variance), math.sqrt(max(self.mean, 1.0)))
+
+    def zscore(self, value):
+        return (value - self.mean) / self.std()
+
+    def expected_range(self, threshold):
+        spread = threshold * self.std()
+        return max(self.mean - spread, 0.0), self.mean + spread
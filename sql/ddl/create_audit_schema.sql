@@ -0,0 +1,52 @@
+CREATE SCHEMA IF NOT EXISTS audit;
+
+--------------------------------------------------
+-- LOAD AUDIT
+--------------------------------------------------
+-- One row per table per load commit, written in the same transaction as
+-- the data (scripts/transformation/load_audit.py). layer is the schema
+-- the table lives in; max_timestamp is the table's newest loaded_at /
+-- created_at after the commit. pipeline_monitor.py reads freshness and
+-- volume from the latest rows instead of scanning the tables.
+CREATE TABLE IF NOT EXISTS audit.load_audit (
+    audit_id BIGSERIAL PRIMARY KEY,
+    layer VARCHAR(20) NOT NULL,
+    table_name VARCHAR(100) NOT NULL,
+    batch_id VARCHAR(100) NOT NULL,
+    max_timestamp TIMESTAMP,
+    row_count BIGINT NOT NULL DEFAULT 0,
+    committed_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- Latest entries per table are an index probe, however long the history
+CREATE INDEX IF NOT EXISTS idx_load_audit_table
+    ON audit.load_audit (layer, table_name, audit_id DESC);
+
+--------------------------------------------------
+-- DAILY VOLUME METRICS
+--------------------------------------------------
+-- Fact rows per sale date for each volume series: dimension 'table'
+-- (member fact_sales), 'category' and 'payment_method'. Maintained from
+-- the aggregate delta by load_warehouse.py, so a load adds its own rows
+-- to the days it touched.
+CREATE TABLE IF NOT EXISTS audit.daily_volume_metrics (
+    dimension VARCHAR(20) NOT NULL,
+    member VARCHAR(100) NOT NULL,
+    metric_date DATE NOT NULL,
+    row_count BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (dimension, member, metric_date)
+);
+
+-- Per series and ISO weekday: exponentially weighted mean/variance of
+-- the closed days (scripts/transformation/volume_baselines.py)
+CREATE TABLE IF NOT EXISTS audit.volume_baselines (
+    dimension VARCHAR(20) NOT NULL,
+    member VARCHAR(100) NOT NULL,
+    day_of_week SMALLINT NOT NULL,
+    observations BIGINT NOT NULL DEFAULT 0,
+    mean DOUBLE PRECISION NOT NULL DEFAULT 0,
+    variance DOUBLE PRECISION NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (dimension, member, day_of_week)
+);
@@ -1,5 +1,41 @@
 -- ================= PRODUCTION TABLES =================
 
+CREATE SCHEMA IF NOT EXISTS production;
+
+-- MIGRATION FROM UNPARTITIONED FACT TABLES
+-- Databases created before partitioning have heap transactions /
+-- transaction_items (and no transaction_date on items). They are moved
+-- aside here, with their indexes, so the partitioned tables below are
+-- created; their rows are copied over at the end of this file.
+DO $$
+DECLARE
+    idx RECORD;
+BEGIN
+    IF EXISTS (
+        SELECT 1
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'production'
+          AND c.relname = 'transactions'
+          AND c.relkind = 'r'
+    ) THEN
+        FOR idx IN
+            SELECT indexname
+            FROM pg_indexes
+            WHERE schemaname = 'production'
+              AND tablename IN ('transactions', 'transaction_items')
+        LOOP
+            EXECUTE format(
+                'ALTER INDEX production.%I RENAME TO %I',
+                idx.indexname, idx.indexname || '_heap'
+            );
+        END LOOP;
+
+        ALTER TABLE production.transaction_items RENAME TO transaction_items_heap;
+        ALTER TABLE production.transactions RENAME TO transactions_heap;
+    END IF;
+END $$;
+
 -- CUSTOMERS
 CREATE TABLE IF NOT EXISTS production.customers (
     customer_id VARCHAR(20) PRIMARY KEY,
@@ -31,9 +67,11 @@ CREATE TABLE IF NOT EXISTS production.products (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
--- TRANSACTIONS
+-- TRANSACTIONS (RANGE PARTITIONED BY transaction_date)
+-- Monthly partitions are created by staging_to_production.py
+-- for every month present in the incoming staging batch.
 CREATE TABLE IF NOT EXISTS production.transactions (
-    transaction_id VARCHAR(20) PRIMARY KEY,
+    transaction_id VARCHAR(20) NOT NULL,
     customer_id VARCHAR(20) NOT NULL,
     transaction_date DATE NOT NULL,
     transaction_time TIME NOT NULL,
@@ -42,15 +80,17 @@ CREATE TABLE IF NOT EXISTS production.transactions (
     total_amount DECIMAL(12,2) NOT NULL CHECK (total_amount >= 0),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (transaction_id, transaction_date),
     CONSTRAINT fk_transactions_customer
         FOREIGN KEY (customer_id)
         REFERENCES production.customers(customer_id)
-);
+) PARTITION BY RANGE (transaction_date);
 
--- TRANSACTION ITEMS
+-- TRANSACTION ITEMS (CO-PARTITIONED THROUGH DENORMALIZED transaction_date)
 CREATE TABLE IF NOT EXISTS production.transaction_items (
-    item_id VARCHAR(20) PRIMARY KEY,
+    item_id VARCHAR(20) NOT NULL,
     transaction_id VARCHAR(20) NOT NULL,
+    transaction_date DATE NOT NULL,
     product_id VARCHAR(20) NOT NULL,
     quantity INTEGER NOT NULL CHECK (quantity > 0),
     unit_price DECIMAL(10,2) NOT NULL CHECK (unit_price >= 0),
@@ -58,12 +98,31 @@ CREATE TABLE IF NOT EXISTS production.transaction_items (
     line_total DECIMAL(12,2) NOT NULL CHECK (line_total >= 0),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (item_id, transaction_date),
     CONSTRAINT fk_items_transaction
-        FOREIGN KEY (transaction_id)
-        REFERENCES production.transactions(transaction_id),
+        FOREIGN KEY (transaction_id, transaction_date)
+        REFERENCES production.transactions(transaction_id, transaction_date),
     CONSTRAINT fk_items_product
         FOREIGN KEY (product_id)
         REFERENCES production.products(product_id)
+) PARTITION BY RANGE (transaction_date);
+
+-- LOAD CHECKPOINTS (BATCHED FACT LOAD PROGRESS)
+CREATE TABLE IF NOT EXISTS production.load_checkpoints (
+    table_name VARCHAR(100) PRIMARY KEY,
+    last_key VARCHAR(50) NOT NULL DEFAULT '',
+    rows_loaded BIGINT NOT NULL DEFAULT 0,
+    status VARCHAR(20) NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- ITEM FIRST LOADS (created_at KEPT ACROSS FULL RELOADS)
+-- staging_to_production.py rebuilds transaction_items on every run and
+-- restamps only items that are not listed here, so created_at stays a
+-- watermark for the incremental warehouse load.
+CREATE TABLE IF NOT EXISTS production.item_first_loads (
+    item_id VARCHAR(20) PRIMARY KEY,
+    first_loaded_at TIMESTAMP NOT NULL
 );
 
 -- ================= INDEXES =================
@@ -78,3 +137,66 @@ CREATE INDEX IF NOT EXISTS idx_items_transaction
 
 CREATE INDEX IF NOT EXISTS idx_items_product
     ON production.transaction_items(product_id);
+
+-- Incremental warehouse load reads items past its created_at watermark
+CREATE INDEX IF NOT EXISTS idx_items_created_at
+    ON production.transaction_items(created_at);
+
+-- ================= MIGRATION (CONTINUED) =================
+-- Copy the moved-aside heap rows into monthly partitions; items take
+-- their transaction_date from their transaction.
+DO $$
+DECLARE
+    month_start DATE;
+BEGIN
+    IF to_regclass('production.transactions_heap') IS NULL THEN
+        RETURN;
+    END IF;
+
+    FOR month_start IN
+        SELECT DISTINCT DATE_TRUNC('month', transaction_date)::DATE
+        FROM production.transactions_heap
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS production.%I PARTITION OF production.transactions FOR VALUES FROM (%L) TO (%L)',
+            'transactions_' || TO_CHAR(month_start, 'YYYY_MM'),
+            month_start, (month_start + INTERVAL '1 month')::DATE
+        );
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS production.%I PARTITION OF production.transaction_items FOR VALUES FROM (%L) TO (%L)',
+            'transaction_items_' || TO_CHAR(month_start, 'YYYY_MM'),
+            month_start, (month_start + INTERVAL '1 month')::DATE
+        );
+    END LOOP;
+
+    INSERT INTO production.transactions (
+        transaction_id, customer_id, transaction_date, transaction_time,
+        payment_method, shipping_address, total_amount, created_at, updated_at
+    )
+    SELECT
+        transaction_id, customer_id, transaction_date, transaction_time,
+        payment_method, shipping_address, total_amount, created_at, updated_at
+    FROM production.transactions_heap;
+
+    INSERT INTO production.transaction_items (
+        item_id, transaction_id, transaction_date, product_id, quantity,
+        unit_price, discount_percentage, line_total, created_at, updated_at
+    )
+    SELECT
+        ti.item_id, ti.transaction_id, t.transaction_date, ti.product_id, ti.quantity,
+        ti.unit_price, ti.discount_percentage, ti.line_total, ti.created_at, ti.updated_at
+    FROM production.transaction_items_heap ti
+    JOIN production.transactions_heap t
+      ON t.transaction_id = ti.transaction_id;
+
+    DROP TABLE production.transaction_items_heap;
+    DROP TABLE production.transactions_heap;
+END $$;
+
+-- Items loaded before item_first_loads existed keep their current stamp
+INSERT INTO production.item_first_loads (item_id, first_loaded_at)
+SELECT item_id, MIN(created_at)
+FROM production.transaction_items
+WHERE created_at IS NOT NULL
+GROUP BY item_id
+ON CONFLICT (item_id) DO NOTHING;
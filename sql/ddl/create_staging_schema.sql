@@ -48,3 +48,10 @@ CREATE TABLE staging.transaction_items (
     line_total DECIMAL(12,2),
     loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
+
+-- Keyset pagination for the batched fact load
+CREATE INDEX IF NOT EXISTS idx_stg_transactions_id
+    ON staging.transactions(transaction_id);
+
+CREATE INDEX IF NOT EXISTS idx_stg_items_id
+    ON staging.transaction_items(item_id);
@@ -14,6 +14,7 @@ CREATE TABLE IF NOT EXISTS warehouse.dim_customers (
     age_group VARCHAR(50),
     customer_segment VARCHAR(50),
     registration_date DATE,
+    row_hash CHAR(32),
     effective_date DATE NOT NULL,
     end_date DATE,
     is_current BOOLEAN NOT NULL
@@ -30,11 +31,16 @@ CREATE TABLE IF NOT EXISTS warehouse.dim_products (
     sub_category VARCHAR(100),
     brand VARCHAR(100),
     price_range VARCHAR(50),
+    row_hash CHAR(32),
     effective_date DATE NOT NULL,
     end_date DATE,
     is_current BOOLEAN NOT NULL
 );
 
+-- Hash of the tracked SCD2 attributes (added for existing databases)
+ALTER TABLE warehouse.dim_customers ADD COLUMN IF NOT EXISTS row_hash CHAR(32);
+ALTER TABLE warehouse.dim_products ADD COLUMN IF NOT EXISTS row_hash CHAR(32);
+
 --------------------------------------------------
 -- DIM DATE
 --------------------------------------------------
@@ -62,15 +68,66 @@ CREATE TABLE IF NOT EXISTS warehouse.dim_payment_method (
 );
 
 --------------------------------------------------
--- FACT SALES
+-- MIGRATION: HEAP fact_sales -> PARTITIONED
+--------------------------------------------------
+-- Databases created before partitioning have a plain fact_sales table
+-- with B-tree indexes. It is moved aside here, with its indexes and key
+-- sequence, so the partitioned table below is created; its rows are
+-- copied over at the end of this file.
+DO $$
+DECLARE
+    idx RECORD;
+    fk RECORD;
+BEGIN
+    IF EXISTS (
+        SELECT 1
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'warehouse'
+          AND c.relname = 'fact_sales'
+          AND c.relkind = 'r'
+    ) THEN
+        FOR idx IN
+            SELECT indexname
+            FROM pg_indexes
+            WHERE schemaname = 'warehouse'
+              AND tablename = 'fact_sales'
+        LOOP
+            EXECUTE format(
+                'ALTER INDEX warehouse.%I RENAME TO %I',
+                idx.indexname, idx.indexname || '_heap'
+            );
+        END LOOP;
+
+        -- Only a copy source from here on; frees the constraint names
+        FOR fk IN
+            SELECT conname
+            FROM pg_constraint
+            WHERE conrelid = 'warehouse.fact_sales'::REGCLASS
+              AND contype = 'f'
+        LOOP
+            EXECUTE format('ALTER TABLE warehouse.fact_sales DROP CONSTRAINT %I', fk.conname);
+        END LOOP;
+
+        ALTER SEQUENCE warehouse.fact_sales_sales_key_seq RENAME TO fact_sales_heap_sales_key_seq;
+        ALTER TABLE warehouse.fact_sales ADD COLUMN IF NOT EXISTS item_id VARCHAR(20);
+        ALTER TABLE warehouse.fact_sales RENAME TO fact_sales_heap;
+    END IF;
+END $$;
+
+--------------------------------------------------
+-- FACT SALES (RANGE PARTITIONED BY date_key, ONE PARTITION PER MONTH)
+-- Partitions are created by load_warehouse.py for the months present
+-- in each incoming batch.
 --------------------------------------------------
 CREATE TABLE IF NOT EXISTS warehouse.fact_sales (
-    sales_key BIGSERIAL PRIMARY KEY,
+    sales_key BIGSERIAL NOT NULL,
     date_key INTEGER NOT NULL,
     customer_key INTEGER NOT NULL,
     product_key INTEGER NOT NULL,
     payment_method_key INTEGER NOT NULL,
     transaction_id VARCHAR(20),
+    item_id VARCHAR(20),
     quantity INTEGER,
     unit_price DECIMAL(10,2),
     discount_amount DECIMAL(10,2),
@@ -78,10 +135,32 @@ CREATE TABLE IF NOT EXISTS warehouse.fact_sales (
     profit DECIMAL(10,2),
     created_at TIMESTAMP DEFAULT NOW(),
 
+    PRIMARY KEY (sales_key, date_key),
     FOREIGN KEY (date_key) REFERENCES warehouse.dim_date(date_key),
     FOREIGN KEY (customer_key) REFERENCES warehouse.dim_customers(customer_key),
     FOREIGN KEY (product_key) REFERENCES warehouse.dim_products(product_key),
     FOREIGN KEY (payment_method_key) REFERENCES warehouse.dim_payment_method(payment_method_key)
+) PARTITION BY RANGE (date_key);
+
+-- Degenerate item key: identifies the fact grain across SCD2 versions
+ALTER TABLE warehouse.fact_sales ADD COLUMN IF NOT EXISTS item_id VARCHAR(20);
+
+--------------------------------------------------
+-- LOAD WATERMARKS (INCREMENTAL WAREHOUSE LOADS)
+--------------------------------------------------
+CREATE TABLE IF NOT EXISTS warehouse.load_watermarks (
+    table_name VARCHAR(100) PRIMARY KEY,
+    watermark_ts TIMESTAMP NOT NULL,
+    rows_loaded BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Per-table data version, bumped by every load that changes the table;
+-- analytics result caches key on it
+CREATE TABLE IF NOT EXISTS warehouse.table_versions (
+    table_name VARCHAR(100) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 --------------------------------------------------
@@ -92,7 +171,26 @@ CREATE TABLE IF NOT EXISTS warehouse.agg_daily_sales (
     total_transactions INTEGER,
     total_revenue DECIMAL(12,2),
     total_profit DECIMAL(12,2),
-    unique_customers INTEGER
+    unique_customers INTEGER,
+    customers_hll BYTEA,
+    transactions_hll BYTEA,
+    total_quantity BIGINT DEFAULT 0,
+    line_count BIGINT DEFAULT 0
+);
+
+-- Serialized HyperLogLog sketches (scripts/transformation/hll.py) so
+-- monthly/quarterly distinct counts can be merged from the daily rows
+ALTER TABLE warehouse.agg_daily_sales
+    ADD COLUMN IF NOT EXISTS customers_hll BYTEA,
+    ADD COLUMN IF NOT EXISTS transactions_hll BYTEA,
+    ADD COLUMN IF NOT EXISTS total_quantity BIGINT DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS line_count BIGINT DEFAULT 0;
+
+CREATE TABLE IF NOT EXISTS warehouse.agg_daily_segment_customers (
+    date_key INTEGER NOT NULL,
+    customer_segment VARCHAR(50) NOT NULL,
+    customers_hll BYTEA NOT NULL,
+    PRIMARY KEY (date_key, customer_segment)
 );
 
 CREATE TABLE IF NOT EXISTS warehouse.agg_product_performance (
@@ -100,9 +198,13 @@ CREATE TABLE IF NOT EXISTS warehouse.agg_product_performance (
     total_quantity_sold INTEGER,
     total_revenue DECIMAL(12,2),
     total_profit DECIMAL(12,2),
+    total_discount_amount DECIMAL(12,2) DEFAULT 0,
     avg_discount_percentage DECIMAL(5,2)
 );
 
+ALTER TABLE warehouse.agg_product_performance
+    ADD COLUMN IF NOT EXISTS total_discount_amount DECIMAL(12,2) DEFAULT 0;
+
 CREATE TABLE IF NOT EXISTS warehouse.agg_customer_metrics (
     customer_key INTEGER PRIMARY KEY,
     total_transactions INTEGER,
@@ -111,10 +213,116 @@ CREATE TABLE IF NOT EXISTS warehouse.agg_customer_metrics (
     last_purchase_date DATE
 );
 
+-- Rollup cube read by analytical_queries.sql; maintained from the fact
+-- delta by load_warehouse.py. month_key is YYYYMM (date_key / 100).
+CREATE TABLE IF NOT EXISTS warehouse.agg_sales_cube (
+    month_key INTEGER NOT NULL,
+    product_key INTEGER NOT NULL,
+    state VARCHAR(100) NOT NULL,
+    payment_method_key INTEGER NOT NULL,
+    category VARCHAR(100),
+    total_revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    total_profit DECIMAL(14,2) NOT NULL DEFAULT 0,
+    total_quantity BIGINT NOT NULL DEFAULT 0,
+    line_count BIGINT NOT NULL DEFAULT 0,
+    transaction_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (month_key, product_key, state, payment_method_key)
+);
+
+-- RFM (recency, frequency, monetary) per customer; feeds
+-- dim_customers.customer_segment and analytical query 3
+CREATE TABLE IF NOT EXISTS warehouse.customer_rfm (
+    customer_id VARCHAR(20) PRIMARY KEY,
+    last_purchase_date DATE NOT NULL,
+    frequency INTEGER NOT NULL DEFAULT 0,
+    monetary DECIMAL(14,2) NOT NULL DEFAULT 0,
+    r_score SMALLINT,
+    f_score SMALLINT,
+    m_score SMALLINT,
+    rfm_segment VARCHAR(50),
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Quintile cut points (quintile 1..4 upper bounds) used to score RFM
+CREATE TABLE IF NOT EXISTS warehouse.rfm_boundaries (
+    metric VARCHAR(20) NOT NULL,
+    quintile SMALLINT NOT NULL,
+    upper_bound NUMERIC NOT NULL,
+    computed_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (metric, quintile)
+);
+
 --------------------------------------------------
 -- INDEXES
 --------------------------------------------------
-CREATE INDEX IF NOT EXISTS idx_fact_date ON warehouse.fact_sales(date_key);
+-- Facts arrive roughly in date/created_at order, so BRIN summaries stay
+-- tight inside each monthly partition at a fraction of a B-tree's size
+CREATE INDEX IF NOT EXISTS idx_fact_date ON warehouse.fact_sales USING BRIN (date_key);
 CREATE INDEX IF NOT EXISTS idx_fact_customer ON warehouse.fact_sales(customer_key);
 CREATE INDEX IF NOT EXISTS idx_fact_product ON warehouse.fact_sales(product_key);
 CREATE INDEX IF NOT EXISTS idx_fact_payment ON warehouse.fact_sales(payment_method_key);
+-- Incremental aggregate maintenance: delta scan and "seen before" lookups
+CREATE INDEX IF NOT EXISTS idx_fact_created_at ON warehouse.fact_sales USING BRIN (created_at);
+CREATE INDEX IF NOT EXISTS idx_fact_transaction ON warehouse.fact_sales(transaction_id);
+-- Top-N line lookups (analytical query 10) without a full fact scan
+CREATE INDEX IF NOT EXISTS idx_fact_line_total ON warehouse.fact_sales(line_total DESC);
+
+-- One current version per natural key; also serves the SCD2 lookups
+CREATE UNIQUE INDEX IF NOT EXISTS ux_dim_customers_current
+    ON warehouse.dim_customers(customer_id) WHERE is_current;
+CREATE UNIQUE INDEX IF NOT EXISTS ux_dim_products_current
+    ON warehouse.dim_products(product_id) WHERE is_current;
+
+-- Fact grain; lets the incremental load skip rows already present.
+-- Unique indexes on a partitioned table must include the partition key;
+-- an item's date_key never changes, so this is still one row per item.
+CREATE UNIQUE INDEX IF NOT EXISTS ux_fact_sales_item
+    ON warehouse.fact_sales(item_id, date_key);
+
+-- Payment methods are append-only and looked up by name
+CREATE UNIQUE INDEX IF NOT EXISTS ux_dim_payment_method_name
+    ON warehouse.dim_payment_method(payment_method_name);
+
+--------------------------------------------------
+-- MIGRATION (CONTINUED)
+--------------------------------------------------
+-- Copy the moved-aside heap rows into monthly partitions. The indexes
+-- above are already defined on the parent, so each partition gets its
+-- BRIN and B-tree indexes built as the rows arrive.
+DO $$
+DECLARE
+    month_start DATE;
+BEGIN
+    IF to_regclass('warehouse.fact_sales_heap') IS NULL THEN
+        RETURN;
+    END IF;
+
+    FOR month_start IN
+        SELECT DISTINCT TO_DATE((date_key / 100)::TEXT || '01', 'YYYYMMDD')
+        FROM warehouse.fact_sales_heap
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS warehouse.%I PARTITION OF warehouse.fact_sales FOR VALUES FROM (%s) TO (%s)',
+            'fact_sales_' || TO_CHAR(month_start, 'YYYY_MM'),
+            TO_CHAR(month_start, 'YYYYMMDD'),
+            TO_CHAR(month_start + INTERVAL '1 month', 'YYYYMMDD')
+        );
+    END LOOP;
+
+    INSERT INTO warehouse.fact_sales (
+        sales_key, date_key, customer_key, product_key, payment_method_key,
+        transaction_id, item_id, quantity, unit_price, discount_amount,
+        line_total, profit, created_at
+    )
+    SELECT
+        sales_key, date_key, customer_key, product_key, payment_method_key,
+        transaction_id, item_id, quantity, unit_price, discount_amount,
+        line_total, profit, created_at
+    FROM warehouse.fact_sales_heap;
+
+    -- New facts continue after the copied keys
+    PERFORM setval(pg_get_serial_sequence('warehouse.fact_sales', 'sales_key'), MAX(sales_key))
+    FROM warehouse.fact_sales;
+
+    DROP TABLE warehouse.fact_sales_heap;
+END $$;
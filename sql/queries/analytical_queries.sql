@@ -7,13 +7,12 @@
 SELECT
     p.product_name,
     p.category,
-    SUM(f.revenue) AS total_revenue,
-    SUM(f.quantity) AS units_sold,
-    ROUND(SUM(f.revenue) / NULLIF(SUM(f.quantity), 0), 2) AS avg_price
-FROM warehouse.fact_sales f
+    SUM(k.total_revenue) AS total_revenue,
+    SUM(k.total_quantity) AS units_sold,
+    ROUND(SUM(k.total_revenue) / NULLIF(SUM(k.total_quantity), 0), 2) AS avg_price
+FROM warehouse.agg_sales_cube k
 JOIN warehouse.dim_products p
-    ON f.product_id = p.product_id
-WHERE p.is_current = TRUE
+    ON k.product_key = p.product_key
 GROUP BY
     p.product_name,
     p.category
@@ -29,18 +28,23 @@ LIMIT 10;
 -- Business Question: How do sales perform month over month?
 -- =========================================================
 
+-- Reads the daily aggregates; total_transactions is additive across days
+-- (a transaction has one date). unique_customers is not, so it is merged
+-- from the daily HLL sketches by generate_analytics.py.
+-- :start_date/:end_date bound the months; incremental runs pass the
+-- trailing window and merge it into the previous query2.csv.
 SELECT
     CONCAT(d.year, '-', LPAD(d.month::TEXT, 2, '0')) AS year_month,
-    SUM(f.revenue) AS total_revenue,
-    COUNT(DISTINCT f.transaction_id) AS total_transactions,
+    SUM(a.total_revenue) AS total_revenue,
+    SUM(a.total_transactions) AS total_transactions,
     ROUND(
-        SUM(f.revenue) / NULLIF(COUNT(DISTINCT f.transaction_id), 0),
+        SUM(a.total_revenue) / NULLIF(SUM(a.total_transactions), 0),
         2
-    ) AS average_order_value,
-    COUNT(DISTINCT f.customer_id) AS unique_customers
-FROM warehouse.fact_sales f
+    ) AS average_order_value
+FROM warehouse.agg_daily_sales a
 JOIN warehouse.dim_date d
-    ON f.date = d.date
+    ON a.date_key = d.date_key
+WHERE d.full_date BETWEEN :start_date AND :end_date
 GROUP BY
     d.year,
     d.month
@@ -52,40 +56,24 @@ ORDER BY
 
 -- =========================================================
 -- QUERY 3: Customer Segmentation Analysis
--- Objective: Segment customers based on total spending
--- Business Question: How many customers fall into each
--- spending bucket and how valuable are they?
+-- Objective: Segment customers by recency, frequency and monetary value
+-- Business Question: How many customers fall into each RFM
+-- segment and how valuable are they?
 -- =========================================================
-WITH customer_totals AS (
-    SELECT
-        c.customer_id,
-        SUM(f.revenue) AS total_spent,
-        COUNT(DISTINCT f.transaction_id) AS transaction_count
-    FROM warehouse.fact_sales f
-    JOIN warehouse.dim_customers c
-        ON f.customer_id = c.customer_id
-    WHERE c.is_current = TRUE
-    GROUP BY
-        c.customer_id
-)
-
+-- Reads the incrementally maintained RFM table (one row per customer).
 SELECT
-    CASE
-        WHEN total_spent < 1000 THEN '$0-$1,000'
-        WHEN total_spent BETWEEN 1000 AND 4999.99 THEN '$1,000-$5,000'
-        WHEN total_spent BETWEEN 5000 AND 9999.99 THEN '$5,000-$10,000'
-        ELSE '$10,000+'
-    END AS spending_segment,
+    rfm_segment AS customer_segment,
     COUNT(*) AS customer_count,
-    ROUND(SUM(total_spent), 2) AS total_revenue,
+    ROUND(SUM(monetary), 2) AS total_revenue,
     ROUND(
-        AVG(total_spent / NULLIF(transaction_count, 0)),
+        AVG(monetary / NULLIF(frequency, 0)),
         2
-    ) AS avg_transaction_value
-FROM customer_totals
-GROUP BY spending_segment
-ORDER BY
-    MIN(total_spent);
+    ) AS avg_transaction_value,
+    ROUND(AVG(frequency), 2) AS avg_frequency,
+    ROUND(AVG(CURRENT_DATE - last_purchase_date), 0) AS avg_days_since_purchase
+FROM warehouse.customer_rfm
+GROUP BY rfm_segment
+ORDER BY total_revenue DESC;
 
 -- =========================================================
 -- QUERY 4: Category Performance
@@ -93,19 +81,16 @@ ORDER BY
 -- =========================================================
 
 SELECT
-    p.category,
-    ROUND(SUM(f.revenue), 2) AS total_revenue,
-    ROUND(SUM(f.revenue - f.cost), 2) AS total_profit,
+    k.category,
+    ROUND(SUM(k.total_revenue), 2) AS total_revenue,
+    ROUND(SUM(k.total_profit), 2) AS total_profit,
     ROUND(
-        (SUM(f.revenue - f.cost) / NULLIF(SUM(f.revenue), 0)) * 100,
+        (SUM(k.total_profit) / NULLIF(SUM(k.total_revenue), 0)) * 100,
         2
     ) AS profit_margin_pct,
-    SUM(f.quantity) AS units_sold
-FROM warehouse.fact_sales f
-JOIN warehouse.dim_products p
-    ON f.product_id = p.product_id
-WHERE p.is_current = TRUE
-GROUP BY p.category
+    SUM(k.total_quantity) AS units_sold
+FROM warehouse.agg_sales_cube k
+GROUP BY k.category
 ORDER BY total_revenue DESC;
 
 
@@ -116,23 +101,21 @@ ORDER BY total_revenue DESC;
 
 SELECT
     pm.payment_method_name AS payment_method,
-    COUNT(DISTINCT f.transaction_id) AS transaction_count,
-    ROUND(SUM(f.revenue), 2) AS total_revenue,
+    SUM(k.transaction_count) AS transaction_count,
+    ROUND(SUM(k.total_revenue), 2) AS total_revenue,
     ROUND(
-        COUNT(DISTINCT f.transaction_id) * 100.0 /
-        SUM(COUNT(DISTINCT f.transaction_id)) OVER (),
+        SUM(k.transaction_count) * 100.0 /
+        SUM(SUM(k.transaction_count)) OVER (),
         2
     ) AS pct_of_transactions,
     ROUND(
-        SUM(f.revenue) * 100.0 /
-        SUM(SUM(f.revenue)) OVER (),
+        SUM(k.total_revenue) * 100.0 /
+        SUM(SUM(k.total_revenue)) OVER (),
         2
     ) AS pct_of_revenue
-FROM warehouse.fact_sales f
-JOIN production.transactions t
-    ON f.transaction_id = t.transaction_id
+FROM warehouse.agg_sales_cube k
 JOIN warehouse.dim_payment_method pm
-    ON t.payment_method = pm.payment_method_name
+    ON k.payment_method_key = pm.payment_method_key
 GROUP BY pm.payment_method_name
 ORDER BY transaction_count DESC;
 
@@ -142,18 +125,19 @@ ORDER BY transaction_count DESC;
 -- Objective: Identify high-revenue states
 -- =========================================================
 
+-- Distinct customers do not add up across cube cells; the per-customer
+-- aggregate has one row per customer version and carries the state.
 SELECT
     c.state,
-    ROUND(SUM(f.revenue), 2) AS total_revenue,
+    ROUND(SUM(m.total_spent), 2) AS total_revenue,
     COUNT(DISTINCT c.customer_id) AS total_customers,
     ROUND(
-        SUM(f.revenue) / NULLIF(COUNT(DISTINCT c.customer_id), 0),
+        SUM(m.total_spent) / NULLIF(COUNT(DISTINCT c.customer_id), 0),
         2
     ) AS avg_revenue_per_customer
-FROM warehouse.fact_sales f
+FROM warehouse.agg_customer_metrics m
 JOIN warehouse.dim_customers c
-    ON f.customer_id = c.customer_id
-WHERE c.is_current = TRUE
+    ON m.customer_key = c.customer_key
 GROUP BY c.state
 ORDER BY total_revenue DESC;
 
@@ -164,24 +148,31 @@ ORDER BY total_revenue DESC;
 -- Objective: Analyze customer value and tenure
 -- =========================================================
 
+-- agg_customer_metrics has one row per customer version; sum every
+-- version of a customer and report the current version's attributes.
 SELECT
     c.customer_id,
     c.full_name,
-    ROUND(SUM(f.revenue), 2) AS total_spent,
-    COUNT(DISTINCT f.transaction_id) AS transaction_count,
+    ROUND(m.total_spent, 2) AS total_spent,
+    m.transaction_count,
     (CURRENT_DATE - c.registration_date) AS days_since_registration,
     ROUND(
-        SUM(f.revenue) / NULLIF(COUNT(DISTINCT f.transaction_id), 0),
+        m.total_spent / NULLIF(m.transaction_count, 0),
         2
     ) AS avg_order_value
-FROM warehouse.fact_sales f
+FROM (
+    SELECT
+        v.customer_id,
+        SUM(a.total_spent) AS total_spent,
+        SUM(a.total_transactions) AS transaction_count
+    FROM warehouse.agg_customer_metrics a
+    JOIN warehouse.dim_customers v
+        ON a.customer_key = v.customer_key
+    GROUP BY v.customer_id
+) m
 JOIN warehouse.dim_customers c
-    ON f.customer_id = c.customer_id
-WHERE c.is_current = TRUE
-GROUP BY
-    c.customer_id,
-    c.full_name,
-    c.registration_date
+    ON c.customer_id = m.customer_id
+   AND c.is_current = TRUE
 ORDER BY total_spent DESC;
 
 -- =========================================================
@@ -192,17 +183,16 @@ ORDER BY total_spent DESC;
 SELECT
     p.product_name,
     p.category,
-    ROUND(SUM(f.revenue - f.cost), 2) AS total_profit,
+    ROUND(SUM(k.total_profit), 2) AS total_profit,
     ROUND(
-        (SUM(f.revenue - f.cost) / NULLIF(SUM(f.revenue), 0)) * 100,
+        (SUM(k.total_profit) / NULLIF(SUM(k.total_revenue), 0)) * 100,
         2
     ) AS profit_margin,
-    ROUND(SUM(f.revenue), 2) AS revenue,
-    SUM(f.quantity) AS units_sold
-FROM warehouse.fact_sales f
+    ROUND(SUM(k.total_revenue), 2) AS revenue,
+    SUM(k.total_quantity) AS units_sold
+FROM warehouse.agg_sales_cube k
 JOIN warehouse.dim_products p
-    ON f.product_id = p.product_id
-WHERE p.is_current = TRUE
+    ON k.product_key = p.product_key
 GROUP BY
     p.product_name,
     p.category
@@ -215,14 +205,18 @@ LIMIT 10;
 -- Objective: Identify temporal sales patterns
 -- =========================================================
 
+-- The cube is monthly; day-of-week comes from the daily aggregates,
+-- which carry line counts so the per-line averages stay exact.
 SELECT
-    TO_CHAR(f.date, 'Day') AS day_name,
-    ROUND(AVG(f.revenue), 2) AS avg_daily_revenue,
-    ROUND(AVG(f.quantity), 2) AS avg_daily_quantity,
-    ROUND(SUM(f.revenue), 2) AS total_revenue
-FROM warehouse.fact_sales f
+    d.day_name,
+    ROUND(SUM(a.total_revenue) / NULLIF(SUM(a.line_count), 0), 2) AS avg_daily_revenue,
+    ROUND(SUM(a.total_quantity)::NUMERIC / NULLIF(SUM(a.line_count), 0), 2) AS avg_daily_quantity,
+    ROUND(SUM(a.total_revenue), 2) AS total_revenue
+FROM warehouse.agg_daily_sales a
+JOIN warehouse.dim_date d
+    ON a.date_key = d.date_key
 GROUP BY
-    TO_CHAR(f.date, 'Day')
+    d.day_name
 ORDER BY total_revenue DESC;
 
 
@@ -230,17 +224,24 @@ ORDER BY total_revenue DESC;
 -- QUERY 10: Discount Impact Analysis
 -- Objective: Analyze discount effectiveness
 -- =========================================================
+-- Line-level top 10; served by idx_fact_line_total rather than the cube.
 
 SELECT
     f.transaction_id,
-    f.customer_id,
-    f.product_id,
-    f.date,
+    c.customer_id,
+    p.product_id,
+    d.full_date AS date,
     f.quantity,
-    ROUND(f.revenue, 2) AS revenue,
-    ROUND(f.revenue - f.cost, 2) AS profit
+    ROUND(f.line_total, 2) AS revenue,
+    ROUND(f.profit, 2) AS profit
 FROM warehouse.fact_sales f
-ORDER BY f.revenue DESC
+JOIN warehouse.dim_customers c
+    ON f.customer_key = c.customer_key
+JOIN warehouse.dim_products p
+    ON f.product_key = p.product_key
+JOIN warehouse.dim_date d
+    ON f.date_key = d.date_key
+ORDER BY f.line_total DESC
 LIMIT 10;
 
 
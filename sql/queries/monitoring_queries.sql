@@ -1,21 +1,41 @@
 -- ==============================
 -- Query 1: Data Freshness
 -- ==============================
+-- Latest audited load per layer (audit.load_audit, written by each
+-- step at commit); pipeline_monitor.py --deep-verify compares these
+-- with MAX(loaded_at / created_at) scans.
 SELECT
-    MAX(created_at) AS warehouse_latest
-FROM warehouse.fact_sales;
+    t.layer,
+    t.table_name,
+    a.batch_id,
+    a.max_timestamp AS latest_record
+FROM (VALUES
+    ('staging', 'customers'),
+    ('production', 'transactions'),
+    ('warehouse', 'fact_sales')
+) AS t(layer, table_name)
+LEFT JOIN LATERAL (
+    SELECT batch_id, max_timestamp
+    FROM audit.load_audit a
+    WHERE a.layer = t.layer
+      AND a.table_name = t.table_name
+    ORDER BY a.audit_id DESC
+    LIMIT 1
+) a ON TRUE;
 
 
 -- ==============================
--- Query 2: Volume Trend (30 Days)
+-- Query 2: Volume Trend (Last 30 Loads)
 -- ==============================
 SELECT
-    DATE(created_at) AS sale_date,
-    COUNT(*) AS daily_transactions
-FROM warehouse.fact_sales
-WHERE created_at >= CURRENT_DATE - INTERVAL '30 days'
-GROUP BY DATE(created_at)
-ORDER BY sale_date;
+    batch_id,
+    committed_at,
+    row_count
+FROM audit.load_audit
+WHERE layer = 'warehouse'
+  AND table_name = 'fact_sales'
+ORDER BY audit_id DESC
+LIMIT 30;
 
 
 -- ==============================
@@ -24,9 +44,9 @@ ORDER BY sale_date;
 SELECT
     COUNT(*) AS null_violations
 FROM warehouse.fact_sales
-WHERE customer_id IS NULL
-   OR product_id IS NULL
-   OR revenue IS NULL;
+WHERE customer_key IS NULL
+   OR product_key IS NULL
+   OR line_total IS NULL;
 
 
 -- ==============================
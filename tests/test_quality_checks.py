@@ -22,3 +22,57 @@ def test_null_detection():
 def test_referential_integrity_check():
     report = json.load(open(REPORT))
     assert report["checks"]["data_quality"]["orphan_records"] == 0
+
+
+def test_watch_mode_times_out_slow_checks_and_keeps_others_running(monkeypatch):
+    import asyncio
+    import pipeline_monitor as pm
+    from sqlalchemy import text
+
+    def slow_check(conn):
+        conn.execute(text("SELECT pg_sleep(2)"))
+        return {"status": "ok"}, []
+
+    reports = []
+    monkeypatch.setattr(pm, "write_report", reports.append)
+    monkeypatch.setitem(pm.CHECKS, "data_quality", (slow_check, True))
+    monkeypatch.setattr(pm, "WATCH_SCHEDULE", {
+        name: {"interval_seconds": 0.5, "timeout_seconds": 0.2} for name in pm.CHECKS
+    })
+
+    asyncio.run(pm.watch(duration=1.8))
+    final = reports[-1]
+
+    runs = final["check_runs"]
+    assert runs["data_quality"]["last_run"]["status"] == "timed out"
+    assert runs["data_quality"]["last_run"]["duration_ms"] < 1000
+    assert "data_quality" not in final["checks"]
+    assert runs["database_connectivity"]["window"] >= 3
+    assert runs["database_connectivity"]["consecutive_failures"] == 0
+    assert any(a["check"] == "data_quality" for a in final["alerts"])
+
+
+def test_volume_check_scores_newest_closed_day_not_partial_one():
+    import pipeline_monitor as pm
+    from sqlalchemy import text
+
+    with pm.engine.connect() as conn:
+        try:
+            closed = conn.execute(text("""
+                SELECT watermark_ts::DATE
+                FROM warehouse.load_watermarks
+                WHERE table_name = 'volume_baselines'
+            """)).scalar()
+            # Rolled back below: a day still being loaded, far below baseline
+            conn.execute(text("""
+                INSERT INTO audit.daily_volume_metrics (dimension, member, metric_date, row_count)
+                SELECT 'table', 'fact_sales', MAX(metric_date) + 1, 1
+                FROM audit.daily_volume_metrics
+            """))
+
+            result, alerts = pm.check_data_volume(conn)
+        finally:
+            conn.rollback()
+
+    assert result["metric_date"] == closed.isoformat()
+    assert result["actual_count"] > 1